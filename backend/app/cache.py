@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    LRU-кэш со сроком жизни записей. Умеет хранить отрицательный результат
+    («такого ключа нет в БД») с отдельным, обычно более коротким, сроком.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Возвращает (найдено, значение). Для закэшированного отсутствия -
+        (True, None), для промаха - (False, None).
+        """
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+        self._data.move_to_end(key)
+        if entry[1] is self._MISSING:
+            self.negative_hits += 1
+            return True, None
+
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._put(key, value, self._ttl)
+
+    def set_missing(self, key: Hashable) -> None:
+        self._put(key, self._MISSING, self._negative_ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self._maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+    def _put(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,58 @@
+import os
+from dotenv import load_dotenv
+
+# Загружаем .env
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Адрес sensor-adapter и параметры пула соединений к нему
+SENSOR_ADAPTER_URL = os.getenv("SENSOR_ADAPTER_URL", "http://sensor-adapter:8002")
+ADAPTER_MAX_CONNECTIONS = int(os.getenv("ADAPTER_MAX_CONNECTIONS", "100"))
+ADAPTER_MAX_KEEPALIVE = int(os.getenv("ADAPTER_MAX_KEEPALIVE", "20"))
+ADAPTER_KEEPALIVE_EXPIRY = float(os.getenv("ADAPTER_KEEPALIVE_EXPIRY", "30"))
+ADAPTER_TIMEOUT = float(os.getenv("ADAPTER_TIMEOUT", "10"))
+ADAPTER_CONNECT_TIMEOUT = float(os.getenv("ADAPTER_CONNECT_TIMEOUT", "3"))
+# HTTP/2 требует пакета h2 и поддержки на стороне адаптера
+ADAPTER_HTTP2 = _env_bool("ADAPTER_HTTP2", False)
+
+# Повторы с экспоненциальной задержкой и случайным разбросом
+ADAPTER_RETRIES = int(os.getenv("ADAPTER_RETRIES", "2"))
+ADAPTER_RETRY_BACKOFF = float(os.getenv("ADAPTER_RETRY_BACKOFF", "0.1"))
+
+# Размыкатель: после стольких ошибок подряд запросы к адаптеру
+# не отправляются ADAPTER_BREAKER_RESET секунд
+ADAPTER_BREAKER_THRESHOLD = int(os.getenv("ADAPTER_BREAKER_THRESHOLD", "5"))
+ADAPTER_BREAKER_RESET = float(os.getenv("ADAPTER_BREAKER_RESET", "30"))
+
+# Кэш ответов адаптера с ETag: ответы на запросы с date_to в прошлом
+# ADAPTER_CACHE_MAX_AGE секунд отдаются без обращения к адаптеру, дальше -
+# после проверки через If-None-Match (повторно тело не передаётся)
+ADAPTER_CACHE_SIZE = int(os.getenv("ADAPTER_CACHE_SIZE", "1024"))
+ADAPTER_CACHE_TTL = float(os.getenv("ADAPTER_CACHE_TTL", "3600"))
+ADAPTER_CACHE_MAX_AGE = float(os.getenv("ADAPTER_CACHE_MAX_AGE", "30"))
+
+# Сколько сенсоров передавать в одном пакетном запросе к адаптеру
+# (/sensors/batch/*), не больше BATCH_MAX_DEVICES адаптера
+ADAPTER_BATCH_DEVICES = int(os.getenv("ADAPTER_BATCH_DEVICES", "500"))
+
+# Пул соединений к собственной БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+# Массовая загрузка данных сенсоров
+SENSOR_DATA_BATCH_MAX = int(os.getenv("SENSOR_DATA_BATCH_MAX", "50000"))
+BULK_COPY_MIN_ROWS = int(os.getenv("BULK_COPY_MIN_ROWS", "500"))
+NDJSON_FLUSH_ROWS = int(os.getenv("NDJSON_FLUSH_ROWS", "10000"))
+
+# Кэш справочников сенсоров и версий: размер, срок жизни найденных
+# и отсутствующих записей, секунды
+REGISTRY_CACHE_SIZE = int(os.getenv("REGISTRY_CACHE_SIZE", "10000"))
+REGISTRY_CACHE_TTL = float(os.getenv("REGISTRY_CACHE_TTL", "300"))
+REGISTRY_NEGATIVE_TTL = float(os.getenv("REGISTRY_NEGATIVE_TTL", "30"))
@@ -0,0 +1,154 @@
+"""
+Колоночные форматы обмена координатами с sensor-adapter и клиентами:
+Arrow IPC, Parquet и msgpack. Библиотеки необязательны, при их отсутствии
+используется JSON.
+"""
+import io
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+COLUMNS = ("latitude", "longitude", "timestamp", "light")
+
+# Колонки: latitude/longitude float64, timestamp float64 (секунды UTC),
+# light float64 с NaN на месте отсутствующих значений
+Columns = Dict[str, np.ndarray]
+
+
+def available_media_types() -> List[str]:
+    types = []
+    if pa is not None:
+        types += [ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE]
+    if msgpack is not None:
+        types.append(MSGPACK_MEDIA_TYPE)
+    return types
+
+
+def accept_header() -> str:
+    # Самый компактный доступный формат первым, JSON - запасной вариант
+    preferred = [t for t in (ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE) if t in available_media_types()]
+    return ", ".join(preferred + [f"{JSON_MEDIA_TYPE};q=0.1"])
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Компактный формат из заголовка Accept с учётом q-весов, None - JSON."""
+    if not accept:
+        return None
+
+    supported = available_media_types()
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in supported and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def empty_columns() -> Columns:
+    return {name: np.empty(0, dtype=np.float64) for name in COLUMNS}
+
+
+def decode_columns(content: bytes, media_type: str) -> Columns:
+    media_type = media_type.split(";")[0].strip()
+
+    if media_type in (ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE):
+        if media_type == ARROW_MEDIA_TYPE:
+            table = pa.ipc.open_stream(content).read_all()
+        else:
+            table = pq.read_table(io.BytesIO(content))
+        if table.num_rows == 0:
+            return empty_columns()
+        # Колонки без пропусков забираются из буферов Arrow без копирования
+        lat = table.column("latitude").combine_chunks().to_numpy(zero_copy_only=True)
+        lon = table.column("longitude").combine_chunks().to_numpy(zero_copy_only=True)
+        ts = table.column("timestamp").combine_chunks().to_numpy(zero_copy_only=True)
+        light = table.column("light").combine_chunks().to_numpy(zero_copy_only=False)
+        return {
+            "latitude": lat,
+            "longitude": lon,
+            "timestamp": ts.astype(np.float64),
+            "light": light.astype(np.float64),
+        }
+
+    if media_type == MSGPACK_MEDIA_TYPE:
+        data = msgpack.unpackb(content)
+        return {
+            "latitude": np.asarray(data["latitude"], dtype=np.float64),
+            "longitude": np.asarray(data["longitude"], dtype=np.float64),
+            "timestamp": np.asarray(data["timestamp"], dtype=np.float64),
+            "light": np.array([np.nan if v is None else v for v in data["light"]], dtype=np.float64),
+        }
+
+    raise ValueError(f"Unsupported media type {media_type}")
+
+
+def json_to_columns(items: List[dict]) -> Columns:
+    return {
+        "latitude": np.fromiter((i["latitude"] for i in items), dtype=np.float64, count=len(items)),
+        "longitude": np.fromiter((i["longitude"] for i in items), dtype=np.float64, count=len(items)),
+        "timestamp": np.fromiter(
+            (datetime.fromisoformat(i["timestamp"].replace("Z", "+00:00")).timestamp() for i in items),
+            dtype=np.float64,
+            count=len(items),
+        ),
+        "light": np.fromiter(
+            (np.nan if i.get("light") is None else i["light"] for i in items),
+            dtype=np.float64,
+            count=len(items),
+        ),
+    }
+
+
+def encode_columns(columns: Columns, media_type: str) -> bytes:
+    if media_type in (ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE):
+        light = columns["light"]
+        table = pa.table({
+            "latitude": pa.array(columns["latitude"], type=pa.float64()),
+            "longitude": pa.array(columns["longitude"], type=pa.float64()),
+            "timestamp": pa.array(columns["timestamp"].astype(np.int64), type=pa.int64()),
+            "light": pa.array(light, type=pa.float64(), mask=np.isnan(light)),
+        })
+        if media_type == PARQUET_MEDIA_TYPE:
+            sink = io.BytesIO()
+            pq.write_table(table, sink)
+            return sink.getvalue()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if media_type == MSGPACK_MEDIA_TYPE:
+        light = columns["light"]
+        return msgpack.packb({
+            "latitude": columns["latitude"].tolist(),
+            "longitude": columns["longitude"].tolist(),
+            "timestamp": columns["timestamp"].astype(np.int64).tolist(),
+            "light": [None if np.isnan(v) else v for v in light.tolist()],
+        })
+
+    raise ValueError(f"Unsupported media type {media_type}")
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import config
+from app.models import SensorData
+
+# Порядок полей в строках для массовой вставки
+COLUMNS = ("timestamp", "is_light", "latitude", "longitude", "sensor_id")
+
+Row = Tuple[datetime, bool, float, float, int]
+
+# Колонка timestamp без часового пояса: храним наивное UTC-время
+def naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def bulk_insert_sensor_data(db: AsyncSession, rows: Sequence[Row]) -> int:
+    """
+    Пишет строки одной операцией в обход ORM: через COPY, если драйвер
+    asyncpg и строк достаточно много, иначе одним многострочным INSERT.
+    """
+    if not rows:
+        return 0
+
+    conn = await db.connection()
+    if conn.dialect.driver == "asyncpg" and len(rows) >= config.BULK_COPY_MIN_ROWS:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        # SQLAlchemy открывает транзакцию asyncpg лениво, на первом запросе.
+        # Если сессия ещё ничего не выполняла (сенсоры нашлись в кэше), COPY
+        # прошёл бы в отдельной транзакции и не откатился бы вместе с сессией
+        if not driver.is_in_transaction():
+            await conn.exec_driver_sql("SELECT 1")
+        await driver.copy_records_to_table(
+            SensorData.__tablename__, records=rows, columns=COLUMNS
+        )
+    else:
+        await db.execute(insert(SensorData.__table__), [dict(zip(COLUMNS, r)) for r in rows])
+
+    return len(rows)
+
+
+def rows_for_sensor(sensor_id: int, entries: Iterable) -> List[Row]:
+    return [
+        (naive_utc(e.timestamp), e.is_light, e.latitude, e.longitude, sensor_id)
+        for e in entries
+    ]
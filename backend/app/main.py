@@ -1,10 +1,29 @@
-from app.database import Base, engine
+from contextlib import asynccontextmanager
+
+from app.database import create_tables, engine
 from app.init_data import init_birds
-from app.routers import birds, sensor_data, sensor_versions, sensors
-from fastapi import FastAPI
+from app.routers import birds, metrics, sensor_data, sensor_versions, sensors
+from app.sensor_data import AdapterUnavailableError, adapter_client
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Создание таблиц при первом запуске
+    await create_tables()
+    # Инициализация таблицы птиц
+    await init_birds()
+    # Один пул соединений к sensor-adapter на всё время жизни приложения
+    await adapter_client.start()
 
-app = FastAPI(title="Bird Tracking Service")
+    yield
+
+    await adapter_client.close()
+    await engine.dispose()
+
+app = FastAPI(title="Bird Tracking Service", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -15,16 +34,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Создание таблиц при первом запуске
-Base.metadata.create_all(bind=engine)
-
-# Инициализация таблицы птиц
-@app.on_event("startup")
-def on_startup():
-    init_birds()
+@app.exception_handler(AdapterUnavailableError)
+async def adapter_unavailable_handler(request: Request, exc: AdapterUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": "Sensor adapter is unavailable"})
 
 # Регистрация роутеров
 app.include_router(sensor_versions.router)
 app.include_router(sensors.router)
 app.include_router(birds.router)
 app.include_router(sensor_data.router)
+app.include_router(metrics.router)
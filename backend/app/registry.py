@@ -0,0 +1,66 @@
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import config
+from app.cache import TTLCache
+from app.models import Sensor, SensorVersion
+
+# internal_id -> sensors.id и version -> sensor_versions.id
+sensor_cache = TTLCache(config.REGISTRY_CACHE_SIZE, config.REGISTRY_CACHE_TTL, config.REGISTRY_NEGATIVE_TTL)
+version_cache = TTLCache(config.REGISTRY_CACHE_SIZE, config.REGISTRY_CACHE_TTL, config.REGISTRY_NEGATIVE_TTL)
+
+
+async def resolve_sensor_ids(db: AsyncSession, internal_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    Сопоставляет internal_id с id сенсоров. В БД уходит один запрос на все
+    идентификаторы, которых нет в кэше; неизвестные в ответ не попадают
+    и запоминаются как отсутствующие.
+    """
+    resolved: Dict[str, int] = {}
+    missing = []
+
+    for internal_id in set(internal_ids):
+        found, sensor_id = sensor_cache.get(internal_id)
+        if not found:
+            missing.append(internal_id)
+        elif sensor_id is not None:
+            resolved[internal_id] = sensor_id
+
+    if missing:
+        result = await db.execute(
+            select(Sensor.internal_id, Sensor.id).where(Sensor.internal_id.in_(missing))
+        )
+        loaded = dict(result.all())
+        for internal_id in missing:
+            if internal_id in loaded:
+                sensor_cache.set(internal_id, loaded[internal_id])
+            else:
+                sensor_cache.set_missing(internal_id)
+        resolved.update(loaded)
+
+    return resolved
+
+
+async def resolve_sensor_id(db: AsyncSession, internal_id: str) -> Optional[int]:
+    return (await resolve_sensor_ids(db, [internal_id])).get(internal_id)
+
+
+async def resolve_version_id(db: AsyncSession, version: str) -> Optional[int]:
+    found, version_id = version_cache.get(version)
+    if found:
+        return version_id
+
+    version_id = (
+        await db.execute(select(SensorVersion.id).filter_by(version=version))
+    ).scalar()
+    if version_id is None:
+        version_cache.set_missing(version)
+    else:
+        version_cache.set(version, version_id)
+    return version_id
+
+
+def registry_stats() -> dict:
+    return {"sensors": sensor_cache.stats(), "sensor_versions": version_cache.stats()}
@@ -0,0 +1,68 @@
+from app.database import engine, ENGINE_STATS, pool_stats
+from app.registry import registry_stats, sensor_cache, version_cache
+from app.sensor_data import adapter_client
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+_CACHES = {"sensors": sensor_cache, "sensor_versions": version_cache, "adapter_responses": adapter_client.cache}
+
+
+class _SampledMetrics(Collector):
+    """Пул соединений, счётчики запросов к БД и кэши читаются в момент опроса."""
+
+    def collect(self):
+        pool = GaugeMetricFamily("backend_db_pool_connections", "Database pool connections by state", labels=["state"])
+        pool.add_metric(["checked_in"], engine.pool.checkedin())
+        pool.add_metric(["checked_out"], engine.pool.checkedout())
+        pool.add_metric(["overflow"], max(engine.pool.overflow(), 0))
+        yield pool
+
+        yield CounterMetricFamily(
+            "backend_db_queries", "Executed database statements", value=ENGINE_STATS["queries"]
+        )
+        yield CounterMetricFamily(
+            "backend_db_query_seconds", "Time spent executing database statements", value=ENGINE_STATS["query_time_s"]
+        )
+        yield CounterMetricFamily(
+            "backend_db_connections_opened", "Opened database connections", value=ENGINE_STATS["connections_opened"]
+        )
+
+        stats = {cache: c.stats() for cache, c in _CACHES.items()}
+        families = (
+            GaugeMetricFamily("backend_cache_entries", "Cached entries", labels=["cache"]),
+            CounterMetricFamily("backend_cache_hits", "Cache hits", labels=["cache"]),
+            CounterMetricFamily("backend_cache_misses", "Cache misses", labels=["cache"]),
+            CounterMetricFamily("backend_cache_evictions", "Entries evicted from a full cache", labels=["cache"]),
+        )
+        for family, name in zip(families, ("size", "hits", "misses", "evictions")):
+            for cache, values in stats.items():
+                family.add_metric([cache], values[name])
+            yield family
+
+        yield GaugeMetricFamily(
+            "backend_adapter_breaker_open", "1 while the sensor adapter circuit breaker is open",
+            value=adapter_client.breaker.state == "open",
+        )
+
+
+REGISTRY.register(_SampledMetrics())
+
+
+@router.get("", include_in_schema=False)
+async def get_metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/db")
+async def get_db_metrics():
+    return pool_stats()
+
+
+@router.get("/cache")
+async def get_cache_metrics():
+    return {**registry_stats(), "adapter_responses": adapter_client.cache.stats()}
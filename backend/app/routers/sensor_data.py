@@ -1,55 +1,127 @@
+import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from app.database import get_db
 from app.models import Sensor, SensorData
-from app.schemas import CoordinateResponse, SensorDataCreate, SensorDataBatchCreate
-from app.utils import calculate_avg_distance, calculate_avg_speed
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
-from app.sensor_data import fetch_sensor_data
-
-SENSOR_ADAPTER_URL = "http://sensor-adapter:8002"
+from app.schemas import (CoordinateResponse, NearbySensorResponse, SensorDataBatchCreate,
+                         SensorDataCreate, SensorDataMultiBatchCreate, SensorPositionResponse,
+                         TrajectorySummaryResponse)
+from app.ingest import bulk_insert_sensor_data, naive_utc, rows_for_sensor
+from app.registry import resolve_sensor_id, resolve_sensor_ids
+from app import config
+from app.utils import summarize_trajectory
+from app.formats import encode_columns, negotiate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.sensor_data import (SensorStatsResponse, fetch_flock_data, fetch_flock_stats,
+                             fetch_last_positions, fetch_nearby_devices, fetch_sensor_columns,
+                             fetch_sensor_stats)
+from pydantic import ValidationError
 
 router = APIRouter(prefix="/sensor-data", tags=["Sensor Data"])
 
 @router.post("/")
-def add_sensor_data(data: SensorDataCreate, db: Session = Depends(get_db)):
-    sensor = db.query(Sensor).filter_by(internal_id=data.internal_id).first()
-    if not sensor:
+async def add_sensor_data(data: SensorDataCreate, db: AsyncSession = Depends(get_db)):
+    sensor_id = await resolve_sensor_id(db, data.internal_id)
+    if sensor_id is None:
         raise HTTPException(status_code=404, detail="Sensor not found")
 
     record = SensorData(
-        timestamp=data.timestamp,
+        timestamp=naive_utc(data.timestamp),
         is_light=data.is_light,
         latitude=data.latitude,
         longitude=data.longitude,
-        sensor=sensor
+        sensor_id=sensor_id
     )
     db.add(record)
-    db.commit()
+    await db.commit()
     return {"status": "Sensor data added"}
 
 @router.post("/batch/")
-def add_sensor_data_batch(data: SensorDataBatchCreate, db: Session = Depends(get_db)):
-    sensor = db.query(Sensor).filter_by(internal_id=data.internal_id).first()
-    if not sensor:
+async def add_sensor_data_batch(data: SensorDataBatchCreate, db: AsyncSession = Depends(get_db)):
+    sensor_ids = await resolve_sensor_ids(db, [data.internal_id])
+    if data.internal_id not in sensor_ids:
         raise HTTPException(status_code=404, detail="Sensor not found")
     
-    for entry in data.entries:
-        record = SensorData(
-            timestamp=entry.timestamp,
-            is_light=entry.is_light,
-            latitude=entry.latitude,
-            longitude=entry.longitude,
-            sensor=sensor
-        )
-        db.add(record)
-        
-    db.commit()
+    count = await bulk_insert_sensor_data(db, rows_for_sensor(sensor_ids[data.internal_id], data.entries))
+    await db.commit()
     
-    return {"status": "Sensor data added"}
+    return {"status": "Sensor data added", "count": count}
+
+@router.post("/batch/multi/")
+async def add_sensor_data_multi_batch(data: SensorDataMultiBatchCreate, db: AsyncSession = Depends(get_db)):
+    sensor_ids = await resolve_sensor_ids(db, {e.internal_id for e in data.entries})
+    unknown = sorted({e.internal_id for e in data.entries} - sensor_ids.keys())
+    if unknown:
+        raise HTTPException(status_code=404, detail={"message": "Sensor not found", "internal_ids": unknown})
+
+    rows = [
+        (naive_utc(e.timestamp), e.is_light, e.latitude, e.longitude, sensor_ids[e.internal_id])
+        for e in data.entries
+    ]
+    count = await bulk_insert_sensor_data(db, rows)
+    await db.commit()
+
+    return {"status": "Sensor data added", "count": count}
+
+@router.post("/batch/ndjson/")
+async def add_sensor_data_ndjson(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Потоковая загрузка: тело - NDJSON, по одному объекту SensorDataCreate
+    на строку. Данные пишутся и фиксируются пачками по NDJSON_FLUSH_ROWS
+    строк, так что при ошибке уже записанное остаётся в БД, а в ответе
+    указывается, сколько строк сохранено.
+    """
+    pending: List[SensorDataCreate] = []
+    saved = 0
+    line_no = 0
+
+    async def flush():
+        nonlocal saved
+        sensor_ids = await resolve_sensor_ids(db, {e.internal_id for e in pending})
+        unknown = sorted({e.internal_id for e in pending} - sensor_ids.keys())
+        if unknown:
+            raise HTTPException(status_code=404, detail={
+                "message": "Sensor not found", "internal_ids": unknown, "saved": saved,
+            })
+        rows = [
+            (naive_utc(e.timestamp), e.is_light, e.latitude, e.longitude, sensor_ids[e.internal_id])
+            for e in pending
+        ]
+        saved += await bulk_insert_sensor_data(db, rows)
+        await db.commit()
+        pending.clear()
+
+    def parse(line: bytes):
+        try:
+            pending.append(SensorDataCreate.model_validate_json(line))
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail={
+                "message": f"Invalid record on line {line_no}",
+                "errors": json.loads(exc.json()),
+                "saved": saved,
+            })
+
+    tail = b""
+    async for chunk in request.stream():
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                parse(line)
+        if len(pending) >= config.NDJSON_FLUSH_ROWS:
+            await flush()
+
+    if tail.strip():
+        line_no += 1
+        parse(tail)
+    if pending:
+        await flush()
+
+    return {"status": "Sensor data added", "count": saved}
 
 @router.get("/avg-speed/")
 async def get_avg_speed(
@@ -58,19 +130,14 @@ async def get_avg_speed(
     date_to: datetime,
     times_of_day: Optional[bool] = False
 ):
-    records = await fetch_sensor_data(
-        SENSOR_ADAPTER_URL,
+    stats = await fetch_sensor_stats(
         internal_id,
         date_from,
         date_to,
-        order="asc"
+        times_of_day=bool(times_of_day)
     )
     
-    if times_of_day:
-        records = list(filter(lambda x: x.light is not None and x.light > 0.8, records))
-        
-    avg_speed = calculate_avg_speed(records)
-    return {"average_speed_kmh": avg_speed}
+    return {"average_speed_kmh": stats.avg_speed_kmh}
 
 @router.get("/avg-distance/")
 async def get_avg_distance(
@@ -79,8 +146,23 @@ async def get_avg_distance(
     date_to: datetime,
     times_of_day: Optional[bool] = False
 ):    
-    records = await fetch_sensor_data(
-        SENSOR_ADAPTER_URL,
+    stats = await fetch_sensor_stats(
+        internal_id,
+        date_from,
+        date_to,
+        times_of_day=bool(times_of_day)
+    )
+    
+    return {"average_distance_km": stats.avg_segment_km}
+
+@router.get("/trajectory/", response_model=TrajectorySummaryResponse)
+async def get_trajectory_summary(
+    internal_id: str,
+    date_from: datetime,
+    date_to: datetime,
+    times_of_day: Optional[bool] = False
+):
+    columns = await fetch_sensor_columns(
         internal_id,
         date_from,
         date_to,
@@ -88,34 +170,203 @@ async def get_avg_distance(
     )
     
     if times_of_day:
-        records = list(filter(lambda x: x.light is not None and x.light > 0.8, records))
+        # NaN > 0.8 ложно, так что точки без освещённости отбрасываются
+        day = columns["light"] > 0.8
+        columns = {name: values[day] for name, values in columns.items()}
         
-    avg_distance = calculate_avg_distance(records)
-    return {"average_distance_km": avg_distance}
+    return summarize_trajectory(columns["latitude"], columns["longitude"], columns["timestamp"])
 
 @router.get("/coordinates/by-sensor/", response_model=List[CoordinateResponse])
 async def get_coordinates_by_sensor(
+    request: Request,
     internal_id: str,
     date_from: datetime,
-    date_to: datetime
+    date_to: datetime,
+    max_points: Optional[int] = Query(None, ge=2),
+    tolerance_m: Optional[float] = Query(None, gt=0),
+    bucket: Optional[int] = Query(None, ge=1),
 ):
-    records = await fetch_sensor_data(
-        SENSOR_ADAPTER_URL,
+    """
+    Для карт трек можно упростить на стороне адаптера: bucket - усреднение
+    по интервалам в секундах, tolerance_m и max_points - Рамер-Дуглас-Пекер.
+    """
+    columns = await fetch_sensor_columns(
         internal_id,
         date_from,
-        date_to
+        date_to,
+        max_points=max_points,
+        tolerance_m=tolerance_m,
+        bucket=bucket,
     )
 
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is not None:
+        return Response(encode_columns(columns, media_type), media_type=media_type)
+
     return [
         CoordinateResponse(
-            latitude=r.latitude,
-            longitude=r.longitude,
-            timestamp=r.timestamp
-        ) for r in records
+            latitude=lat,
+            longitude=lon,
+            timestamp=ts
+        ) for lat, lon, ts in zip(
+            columns["latitude"].tolist(),
+            columns["longitude"].tolist(),
+            columns["timestamp"].tolist(),
+        )
     ]
 
 
+@router.get("/nearby/", response_model=List[NearbySensorResponse])
+async def get_nearby_sensors(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Сенсоры, побывавшие не дальше radius_km от точки за период. Поиск идёт
+    по пространственному индексу адаптера, сенсоры сопоставляются по internal_id.
+    """
+    devices = await fetch_nearby_devices(lat, lon, radius_km, date_from, date_to, limit)
+    sensor_ids = await resolve_sensor_ids(db, [d.device_id for d in devices])
+
+    return [
+        NearbySensorResponse(
+            sensor_id=sensor_ids.get(d.device_id),
+            internal_id=d.device_id,
+            point_count=d.point_count,
+            first_timestamp=d.first_timestamp,
+            last_timestamp=d.last_timestamp,
+        ) for d in devices
+    ]
+
+
+async def _flock_sensor_ids(db: AsyncSession, internal_ids: Optional[List[str]]) -> Dict[str, int]:
+    """internal_id -> id зарегистрированных сенсоров из списка, без списка - всех."""
+    if internal_ids:
+        return await resolve_sensor_ids(db, internal_ids)
+    return dict((await db.execute(select(Sensor.internal_id, Sensor.id))).tuples().all())
+
+
+@router.get("/last-positions/", response_model=List[SensorPositionResponse])
+async def get_last_positions(
+    internal_id: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Последние известные положения сенсоров internal_id (можно повторять),
+    без параметра - всех зарегистрированных сенсоров. Сенсоры без данных
+    и незарегистрированные internal_id в ответ не попадают.
+    """
+    sensor_ids = await _flock_sensor_ids(db, internal_id)
+    if not sensor_ids:
+        return []
+
+    positions = await fetch_last_positions(sorted(sensor_ids))
+
+    return [
+        SensorPositionResponse(
+            sensor_id=sensor_ids[p.device_id],
+            internal_id=p.device_id,
+            latitude=p.latitude,
+            longitude=p.longitude,
+            timestamp=p.timestamp,
+            light=p.light,
+        ) for p in positions
+    ]
+
+
+async def _flock_stats(
+    db: AsyncSession,
+    internal_id: Optional[List[str]],
+    date_from: datetime,
+    date_to: datetime,
+    times_of_day: Optional[bool],
+) -> Dict[str, SensorStatsResponse]:
+    sensor_ids = await _flock_sensor_ids(db, internal_id)
+    if not sensor_ids:
+        return {}
+    return await fetch_flock_stats(sorted(sensor_ids), date_from, date_to, times_of_day=bool(times_of_day))
+
+
+@router.get("/flock/avg-speed/")
+async def get_flock_avg_speed(
+    date_from: datetime,
+    date_to: datetime,
+    internal_id: Optional[List[str]] = Query(None),
+    times_of_day: Optional[bool] = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Средняя скорость стаи - суммарный путь, делённый на суммарное время
+    треков, и скорость каждого сенсора. internal_id можно повторять, без
+    него берутся все зарегистрированные сенсоры.
+    """
+    stats = await _flock_stats(db, internal_id, date_from, date_to, times_of_day)
+    duration_s = sum(s.duration_s for s in stats.values())
+    distance_km = sum(s.distance_km for s in stats.values())
+
+    return {
+        "average_speed_kmh": distance_km / (duration_s / 3600) if duration_s else 0.0,
+        "sensors": {device_id: s.avg_speed_kmh for device_id, s in stats.items()},
+    }
+
+
+@router.get("/flock/avg-distance/")
+async def get_flock_avg_distance(
+    date_from: datetime,
+    date_to: datetime,
+    internal_id: Optional[List[str]] = Query(None),
+    times_of_day: Optional[bool] = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Средняя длина отрезка по всем трекам стаи и по каждому сенсору."""
+    stats = await _flock_stats(db, internal_id, date_from, date_to, times_of_day)
+    segments = sum(s.point_count - 1 for s in stats.values() if s.point_count > 1)
+    distance_km = sum(s.distance_km for s in stats.values())
+
+    return {
+        "average_distance_km": distance_km / segments if segments else 0.0,
+        "sensors": {device_id: s.avg_segment_km for device_id, s in stats.items()},
+    }
+
+
+@router.get("/flock/coordinates/", response_model=Dict[str, List[CoordinateResponse]])
+async def get_flock_coordinates(
+    date_from: datetime,
+    date_to: datetime,
+    internal_id: Optional[List[str]] = Query(None),
+    max_points: Optional[int] = Query(None, ge=2),
+    tolerance_m: Optional[float] = Query(None, gt=0),
+    bucket: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """Треки сенсоров стаи, сгруппированные по internal_id; упрощение - как у /coordinates/by-sensor/."""
+    sensor_ids = await _flock_sensor_ids(db, internal_id)
+    if not sensor_ids:
+        return {}
+
+    tracks = await fetch_flock_data(
+        sorted(sensor_ids),
+        date_from,
+        date_to,
+        max_points=max_points,
+        tolerance_m=tolerance_m,
+        bucket=bucket,
+    )
+
+    return {
+        device_id: [
+            CoordinateResponse(latitude=p.latitude, longitude=p.longitude, timestamp=p.timestamp)
+            for p in points
+        ] for device_id, points in tracks.items()
+    }
+
+
 @router.get("/get_data")
-async def get_sensor_data(limit: int = 10, db: Session = Depends(get_db)):
-    sensor_data = db.query(SensorData).limit(limit).all()
+async def get_sensor_data(limit: int = 10, db: AsyncSession = Depends(get_db)):
+    sensor_data = (await db.execute(select(SensorData).limit(limit))).scalars().all()
     return sensor_data
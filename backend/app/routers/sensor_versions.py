@@ -1,20 +1,24 @@
 from app.database import get_db
 from app.models import SensorVersion
+from app.registry import version_cache
 from app.schemas import SensorVersionCreate
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/sensor-version", tags=["Sensor Version"])
 
 
 @router.post("/create")
-def create_sensor_version(version_data: SensorVersionCreate, db: Session = Depends(get_db)):
+async def create_sensor_version(version_data: SensorVersionCreate, db: AsyncSession = Depends(get_db)):
     version = SensorVersion(version=version_data.version)
     db.add(version)
-    db.commit()
+    await db.commit()
+    # Сбрасываем закэшированное «нет такой версии»
+    version_cache.invalidate(version_data.version)
     return {"status": "ok"}
 
 @router.get("/get_data")
-async def get_sensor_versions(limit: int = 10, db: Session = Depends(get_db)):
-    sensor_versions = db.query(SensorVersion).limit(limit).all()
+async def get_sensor_versions(limit: int = 10, db: AsyncSession = Depends(get_db)):
+    sensor_versions = (await db.execute(select(SensorVersion).limit(limit))).scalars().all()
     return sensor_versions
@@ -1,29 +1,33 @@
 from app.database import get_db
-from app.models import Sensor, SensorVersion
+from app.models import Sensor
+from app.registry import resolve_version_id, sensor_cache
 from app.schemas import SensorCreate
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/sensors", tags=["Sensors"])
 
 
 @router.post("/create")
-def create_sensor(sensor_data: SensorCreate, db: Session = Depends(get_db)):
-    version = db.query(SensorVersion).filter_by(version=sensor_data.version).first()
-    if not version:
+async def create_sensor(sensor_data: SensorCreate, db: AsyncSession = Depends(get_db)):
+    version_id = await resolve_version_id(db, sensor_data.version)
+    if version_id is None:
         raise HTTPException(status_code=404, detail="Sensor version not found")
     
     sensor = Sensor(
         internal_id=sensor_data.internal_id,
         name=sensor_data.name,
-        version=version
+        version_id=version_id
     )
     db.add(sensor)
-    db.commit()
+    await db.commit()
+    # Сбрасываем закэшированное «нет такого сенсора»
+    sensor_cache.invalidate(sensor_data.internal_id)
     return {"status": "Sensor added"}
 
 
 @router.get("/sensors")
-async def get_sensors(limit: int = 10, db: Session = Depends(get_db)):
-    sensors = db.query(Sensor).limit(limit).all()
+async def get_sensors(limit: int = 10, db: AsyncSession = Depends(get_db)):
+    sensors = (await db.execute(select(Sensor).limit(limit))).scalars().all()
     return sensors
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
+from app import config
+
 class SensorVersionCreate(BaseModel):
     version: str
 
@@ -28,9 +30,38 @@ class SensorDataBatchEntry(BaseModel):
     
 class SensorDataBatchCreate(BaseModel):
     internal_id: str
-    entries: List[SensorDataBatchEntry] = Field(min_length=1, max_length=128)
+    entries: List[SensorDataBatchEntry] = Field(min_length=1, max_length=config.SENSOR_DATA_BATCH_MAX)
+
+# Пакет с записями разных сенсоров
+class SensorDataMultiBatchCreate(BaseModel):
+    entries: List[SensorDataCreate] = Field(min_length=1, max_length=config.SENSOR_DATA_BATCH_MAX)
 
 class CoordinateResponse(BaseModel):
     latitude: float
     longitude: float
     timestamp: datetime
+
+class SensorPositionResponse(BaseModel):
+    sensor_id: int
+    internal_id: str
+    latitude: float
+    longitude: float
+    timestamp: datetime
+    light: Optional[float] = None
+
+class NearbySensorResponse(BaseModel):
+    sensor_id: Optional[int] = None
+    internal_id: str
+    point_count: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+
+class TrajectorySummaryResponse(BaseModel):
+    point_count: int
+    total_distance_km: float
+    total_time_s: float
+    moving_time_s: float
+    stationary_time_s: float
+    avg_speed_kmh: float
+    avg_moving_speed_kmh: float
+    max_speed_kmh: float
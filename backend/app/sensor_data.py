@@ -1,7 +1,18 @@
+import asyncio
+import random
+import time
 import httpx
-from typing import Optional, List
-from datetime import datetime
+from prometheus_client import Counter, Histogram
+from typing import Any, Dict, Optional, List
+from datetime import datetime, timezone
 from pydantic import BaseModel
+from app import config
+from app.cache import TTLCache
+from app.formats import Columns, JSON_MEDIA_TYPE, accept_header, decode_columns, json_to_columns
+
+# Сколько internal_id передавать в одном запросе последних точек,
+# чтобы строка запроса оставалась короткой
+LAST_POSITIONS_PER_REQUEST = 100
 
 
 class SensorDataResponse(BaseModel):
@@ -11,20 +22,318 @@ class SensorDataResponse(BaseModel):
     light: Optional[float] = None
 
 
-async def fetch_sensor_data(
-    base_url: str,
+class SensorStatsResponse(BaseModel):
+    point_count: int
+    distance_km: float
+    duration_s: int
+    avg_speed_kmh: float
+    avg_segment_km: float
+
+
+class LastPositionResponse(BaseModel):
+    device_id: str
+    latitude: float
+    longitude: float
+    timestamp: datetime
+    light: Optional[float] = None
+
+
+class NearbyDeviceResponse(BaseModel):
+    device_id: str
+    point_count: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+
+
+ADAPTER_REQUEST_SECONDS = Histogram(
+    "backend_adapter_request_seconds", "Sensor adapter request latency including retries", ["path"]
+)
+ADAPTER_REQUESTS = Counter("backend_adapter_requests_total", "Sensor adapter requests by outcome", ["outcome"])
+
+_OUTCOME_OK = ADAPTER_REQUESTS.labels("ok")
+_OUTCOME_NOT_MODIFIED = ADAPTER_REQUESTS.labels("not_modified")
+_OUTCOME_CACHED = ADAPTER_REQUESTS.labels("cached")
+_OUTCOME_RETRY = ADAPTER_REQUESTS.labels("retry")
+_OUTCOME_UNAVAILABLE = ADAPTER_REQUESTS.labels("unavailable")
+
+
+class AdapterUnavailableError(Exception):
+    """Адаптер недоступен: размыкатель открыт или исчерпаны повторы."""
+
+
+class CircuitBreaker:
+    """
+    После threshold ошибок подряд размыкается на reset_after секунд, затем
+    полуоткрыт: пропускает один пробный запрос, остальные отклоняются, пока
+    проба не завершится. Проба, не сообщившая исход (например, отменённая),
+    через reset_after секунд уступает место следующей.
+    """
+
+    def __init__(self, threshold: int, reset_after: float):
+        self._threshold = threshold
+        self._reset_after = reset_after
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half-open":
+            return state == "closed"
+
+        now = time.monotonic()
+        if self._probe_started_at is not None and now - self._probe_started_at < self._reset_after:
+            return False
+        self._probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        # В полуоткрытом состоянии хватает одной неудачи, чтобы снова открыться
+        if self._failures >= self._threshold or self._opened_at is not None:
+            self._opened_at = time.monotonic()
+            self._probe_started_at = None
+
+
+class SensorAdapterClient:
+    """
+    Общий на приложение клиент к sensor-adapter: пул соединений с keep-alive,
+    повторы идемпотентных запросов и размыкатель при деградации адаптера.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, base_url: str):
+        self._base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(config.ADAPTER_BREAKER_THRESHOLD, config.ADAPTER_BREAKER_RESET)
+        # ключ запроса -> (время получения, заголовки, тело) ответа с ETag
+        self.cache = TTLCache(config.ADAPTER_CACHE_SIZE, config.ADAPTER_CACHE_TTL, 0)
+        # path -> серия гистограммы задержки, чтобы не собирать метки на каждый запрос
+        self._latency: Dict[str, Any] = {}
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self._base_url,
+            http2=config.ADAPTER_HTTP2,
+            limits=httpx.Limits(
+                max_connections=config.ADAPTER_MAX_CONNECTIONS,
+                max_keepalive_connections=config.ADAPTER_MAX_KEEPALIVE,
+                keepalive_expiry=config.ADAPTER_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(config.ADAPTER_TIMEOUT, connect=config.ADAPTER_CONNECT_TIMEOUT),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(
+        self,
+        path: str,
+        params: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        max_age: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        max_age включает кэш ответа: столько секунд он отдаётся без запроса,
+        после - проверяется у адаптера по ETag (0 - проверять каждый раз).
+        """
+        if max_age is None:
+            return await self._send(path, params, headers)
+
+        key = (path, tuple(sorted((k, str(v)) for k, v in params.items())), (headers or {}).get("Accept"))
+        found, entry = self.cache.get(key)
+        if found:
+            received_at, cached_headers, content = entry
+            if time.monotonic() - received_at < max_age:
+                _OUTCOME_CACHED.inc()
+                return httpx.Response(200, headers=cached_headers, content=content)
+            headers = {**(headers or {}), "If-None-Match": cached_headers["etag"]}
+
+        resp = await self._send(path, params, headers)
+        if resp.status_code == 304 and found:
+            _OUTCOME_NOT_MODIFIED.inc()
+            self.cache.set(key, (time.monotonic(), cached_headers, content))
+            return httpx.Response(200, headers=cached_headers, content=content)
+
+        etag = resp.headers.get("etag")
+        if etag is not None:
+            cached_headers = {"etag": etag, "content-type": resp.headers.get("content-type", JSON_MEDIA_TYPE)}
+            self.cache.set(key, (time.monotonic(), cached_headers, resp.content))
+        return resp
+
+    async def post(self, path: str, json: Dict[str, Any]) -> httpx.Response:
+        """Пакетные запросы адаптера только читают данные и повторяются, как GET."""
+        return await self._send(path, {}, None, method="POST", json=json)
+
+    async def _send(
+        self,
+        path: str,
+        params: Dict[str, Any],
+        headers: Optional[Dict[str, str]],
+        method: str = "GET",
+        json: Optional[Dict[str, Any]] = None,
+    ) -> httpx.Response:
+        if self._client is None:
+            await self.start()
+
+        if not self.breaker.allow():
+            _OUTCOME_UNAVAILABLE.inc()
+            raise AdapterUnavailableError("Sensor adapter circuit is open")
+
+        latency = self._latency.get(path)
+        if latency is None:
+            latency = self._latency[path] = ADAPTER_REQUEST_SECONDS.labels(path)
+        started = time.perf_counter()
+
+        for attempt in range(config.ADAPTER_RETRIES + 1):
+            if attempt:
+                _OUTCOME_RETRY.inc()
+                delay = config.ADAPTER_RETRY_BACKOFF * 2 ** (attempt - 1)
+                await asyncio.sleep(random.uniform(0, delay))
+
+            try:
+                resp = await self._client.request(method, path, params=params, headers=headers, json=json)
+            except httpx.TransportError as exc:
+                error = exc
+                continue
+
+            if resp.status_code in self.RETRY_STATUSES:
+                error = httpx.HTTPStatusError(
+                    f"Sensor adapter responded {resp.status_code}", request=resp.request, response=resp
+                )
+                continue
+
+            latency.observe(time.perf_counter() - started)
+            self.breaker.record_success()
+            if resp.status_code != 304:
+                _OUTCOME_OK.inc()
+                resp.raise_for_status()
+            return resp
+
+        latency.observe(time.perf_counter() - started)
+        _OUTCOME_UNAVAILABLE.inc()
+        self.breaker.record_failure()
+        raise AdapterUnavailableError(str(error)) from error
+
+
+adapter_client = SensorAdapterClient(config.SENSOR_ADAPTER_URL)
+
+
+def _max_age(date_to: Optional[datetime]) -> float:
+    """Ответ за прошедший период можно не перепроверять ADAPTER_CACHE_MAX_AGE секунд."""
+    if date_to is None:
+        return 0
+    if date_to.tzinfo is None:
+        date_to = date_to.replace(tzinfo=timezone.utc)
+    return config.ADAPTER_CACHE_MAX_AGE if date_to < datetime.now(timezone.utc) else 0
+
+
+async def fetch_sensor_columns(
     internal_id: str,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
-    limit: Optional[int] = None,
     order: Optional[str] = None,
-) -> List[SensorDataResponse]:
-    """Запрос данных к удалённому сервису."""
+    max_points: Optional[int] = None,
+    tolerance_m: Optional[float] = None,
+    bucket: Optional[int] = None,
+) -> Columns:
+    """
+    Запрос данных в колоночном виде: адаптер отдаёт Arrow или msgpack,
+    если они доступны, и ответ сразу раскладывается в массивы numpy.
+    max_points, tolerance_m и bucket просят адаптер упростить трек.
+    """
 
     params = {
         "internal_id": internal_id
     }
 
+    if date_from is not None:
+        params["date_from"] = date_from.isoformat()
+
+    if date_to is not None:
+        params["date_to"] = date_to.isoformat()
+
+    if order is not None:
+        params["order"] = order
+
+    if max_points is not None:
+        params["max_points"] = max_points
+
+    if tolerance_m is not None:
+        params["tolerance_m"] = tolerance_m
+
+    if bucket is not None:
+        params["bucket"] = bucket
+
+    resp = await adapter_client.get(
+        "/api/v1/sensors/data", params=params, headers={"Accept": accept_header()}, max_age=_max_age(date_to)
+    )
+
+    media_type = resp.headers.get("content-type", JSON_MEDIA_TYPE)
+    if media_type.startswith(JSON_MEDIA_TYPE):
+        return json_to_columns(resp.json())
+    return decode_columns(resp.content, media_type)
+
+
+async def fetch_sensor_stats(
+    internal_id: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    times_of_day: bool = False,
+) -> SensorStatsResponse:
+    """Запрос агрегатов по треку, посчитанных на стороне удалённого сервиса."""
+
+    params = {
+        "internal_id": internal_id,
+        "times_of_day": times_of_day,
+    }
+
+    if date_from is not None:
+        params["date_from"] = date_from.isoformat()
+
+    if date_to is not None:
+        params["date_to"] = date_to.isoformat()
+
+    resp = await adapter_client.get("/api/v1/sensors/stats", params=params, max_age=_max_age(date_to))
+
+    return SensorStatsResponse(**resp.json())
+
+
+async def fetch_nearby_devices(
+    lat: float,
+    lon: float,
+    radius_km: float,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[NearbyDeviceResponse]:
+    """Устройства, у которых есть точки не дальше radius_km от (lat, lon)."""
+
+    params = {
+        "lat": lat,
+        "lon": lon,
+        "radius_km": radius_km,
+        "summary": True,
+    }
+
     if date_from is not None:
         params["date_from"] = date_from.isoformat()
 
@@ -34,11 +343,97 @@ async def fetch_sensor_data(
     if limit is not None:
         params["limit"] = limit
 
-    if order is not None:
-        params["order"] = order
+    resp = await adapter_client.get("/api/v1/sensors/spatial/radius", params=params)
+
+    return [NearbyDeviceResponse(**item) for item in resp.json()]
+
+
+def _chunks(internal_ids: List[str], size: int) -> List[List[str]]:
+    return [internal_ids[i:i + size] for i in range(0, len(internal_ids), size)]
+
+
+async def fetch_last_positions(internal_ids: List[str]) -> List[LastPositionResponse]:
+    """
+    Последние известные точки устройств. Адаптер держит их в памяти, так что
+    и большой список обходится несколькими дешёвыми запросами вместо
+    запроса на каждое устройство.
+    """
+    responses = await asyncio.gather(*(
+        adapter_client.get("/api/v1/sensors/last", params={"internal_id": chunk})
+        for chunk in _chunks(internal_ids, LAST_POSITIONS_PER_REQUEST)
+    ))
+
+    return [LastPositionResponse(**item) for resp in responses for item in resp.json()]
+
+
+async def _post_batch(path: str, internal_ids: List[str], query: Dict[str, Any]) -> Dict[str, Any]:
+    """Пакетный запрос к адаптеру по ADAPTER_BATCH_DEVICES устройств, ответы объединяются."""
+    responses = await asyncio.gather(*(
+        adapter_client.post(path, json={"internal_ids": chunk, **query})
+        for chunk in _chunks(internal_ids, config.ADAPTER_BATCH_DEVICES)
+    ))
+
+    merged: Dict[str, Any] = {}
+    for resp in responses:
+        merged.update(resp.json())
+    return merged
+
+
+def _range_query(date_from: Optional[datetime], date_to: Optional[datetime]) -> Dict[str, Any]:
+    query = {}
+
+    if date_from is not None:
+        query["date_from"] = date_from.isoformat()
+
+    if date_to is not None:
+        query["date_to"] = date_to.isoformat()
+
+    return query
+
+
+async def fetch_flock_data(
+    internal_ids: List[str],
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    max_points: Optional[int] = None,
+    tolerance_m: Optional[float] = None,
+    bucket: Optional[int] = None,
+) -> Dict[str, List[SensorDataResponse]]:
+    """
+    Треки нескольких устройств одним запросом к адаптеру вместо запроса на
+    каждое; max_points, tolerance_m и bucket упрощают каждый трек.
+    """
+
+    query = _range_query(date_from, date_to)
+
+    if max_points is not None:
+        query["max_points"] = max_points
+
+    if tolerance_m is not None:
+        query["tolerance_m"] = tolerance_m
+
+    if bucket is not None:
+        query["bucket"] = bucket
+
+    tracks = await _post_batch("/api/v1/sensors/batch/data", internal_ids, query)
+
+    return {
+        device_id: [SensorDataResponse(**item) for item in points]
+        for device_id, points in tracks.items()
+    }
+
+
+async def fetch_flock_stats(
+    internal_ids: List[str],
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    times_of_day: bool = False,
+) -> Dict[str, SensorStatsResponse]:
+    """Агрегаты по трекам нескольких устройств одним запросом к адаптеру."""
+
+    query = _range_query(date_from, date_to)
+    query["times_of_day"] = times_of_day
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{base_url}/api/v1/sensors/data", params=params)
-        resp.raise_for_status()
+    stats = await _post_batch("/api/v1/sensors/batch/stats", internal_ids, query)
 
-    return [SensorDataResponse(**item) for item in resp.json()]
\ No newline at end of file
+    return {device_id: SensorStatsResponse(**item) for device_id, item in stats.items()}
@@ -1,33 +1,99 @@
 from math import radians, cos, sin, asin, sqrt
 from datetime import datetime
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+# Отрезок быстрее этого считается движением, медленнее - стоянкой, км/ч.
+# Порог и строгое сравнение совпадают с MOVING_SPEED_KMH адаптера
+# (app/core/analytics.py), чтобы сервисы давали одно время в движении
+MOVING_SPEED_KMH = 1.0
 
 # Haversine formula для расстояния между двумя GPS координатами
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # Радиус Земли в км
+    R = EARTH_RADIUS_KM  # Радиус Земли в км
     d_lat = radians(lat2 - lat1)
     d_lon = radians(lon2 - lon1)
     a = sin(d_lat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon/2)**2
     return 2 * R * asin(sqrt(a))
 
-# Расчет средней скорости
-def calculate_avg_speed(data):
-    if len(data) < 2:
-        return 0
-    total_distance = 0
-    total_time = 0
-    for i in range(1, len(data)):
-        d = haversine(data[i-1].latitude, data[i-1].longitude, data[i].latitude, data[i].longitude)
-        t = (data[i].timestamp - data[i-1].timestamp).total_seconds() / 3600  # часы
-        total_distance += d
-        total_time += t
-    return total_distance / total_time if total_time else 0
-
-# Расчет средней дистанции
-def calculate_avg_distance(data):
-    if len(data) < 2:
-        return 0
-    total_distance = sum(
-        haversine(data[i-1].latitude, data[i-1].longitude, data[i].latitude, data[i].longitude)
-        for i in range(1, len(data))
+# Векторная версия: принимает массивы, считает все отрезки разом
+def haversine_np(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# Раскладывает список точек (latitude, longitude, timestamp) в массивы
+def track_columns(data: Sequence) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lat = np.fromiter((p.latitude for p in data), dtype=np.float64, count=len(data))
+    lon = np.fromiter((p.longitude for p in data), dtype=np.float64, count=len(data))
+    ts = np.fromiter(
+        (p.timestamp.timestamp() if isinstance(p.timestamp, datetime) else p.timestamp
+         for p in data),
+        dtype=np.float64,
+        count=len(data),
     )
-    return total_distance / (len(data) - 1)
+    return lat, lon, ts
+
+# Все характеристики трека за один векторный проход.
+# Массивы по отрезкам имеют длину n - 1, cumulative_km - длину n.
+def trajectory_kernel(lat, lon, ts, moving_speed_kmh: float = MOVING_SPEED_KMH) -> Dict[str, np.ndarray]:
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    ts = np.asarray(ts, dtype=np.float64)
+
+    segment_km = haversine_np(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    segment_s = np.diff(ts)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed_kmh = np.where(segment_s > 0, segment_km / (segment_s / 3600), 0.0)
+
+    phi1, phi2 = np.radians(lat[:-1]), np.radians(lat[1:])
+    d_lon = np.radians(lon[1:] - lon[:-1])
+    bearing_deg = np.degrees(np.arctan2(
+        np.sin(d_lon) * np.cos(phi2),
+        np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(d_lon),
+    )) % 360
+
+    cumulative_km = np.concatenate(([0.0], np.cumsum(segment_km)))
+
+    return {
+        "segment_km": segment_km,
+        "segment_s": segment_s,
+        "speed_kmh": speed_kmh,
+        "cumulative_km": cumulative_km,
+        "bearing_deg": bearing_deg,
+        "moving": speed_kmh > moving_speed_kmh,
+    }
+
+# Сводка по треку для аналитических роутов
+def summarize_trajectory(lat, lon, ts) -> Dict[str, float]:
+    if len(lat) < 2:
+        return {
+            "point_count": len(lat),
+            "total_distance_km": 0.0,
+            "total_time_s": 0.0,
+            "moving_time_s": 0.0,
+            "stationary_time_s": 0.0,
+            "avg_speed_kmh": 0.0,
+            "avg_moving_speed_kmh": 0.0,
+            "max_speed_kmh": 0.0,
+        }
+
+    k = trajectory_kernel(lat, lon, ts)
+    distance = float(k["segment_km"].sum())
+    total_time = float(k["segment_s"].sum())
+    moving_time = float(k["segment_s"][k["moving"]].sum())
+    moving_distance = float(k["segment_km"][k["moving"]].sum())
+
+    return {
+        "point_count": len(lat),
+        "total_distance_km": distance,
+        "total_time_s": total_time,
+        "moving_time_s": moving_time,
+        "stationary_time_s": total_time - moving_time,
+        "avg_speed_kmh": distance / (total_time / 3600) if total_time else 0.0,
+        "avg_moving_speed_kmh": moving_distance / (moving_time / 3600) if moving_time else 0.0,
+        "max_speed_kmh": float(k["speed_kmh"].max()),
+    }
@@ -0,0 +1,73 @@
+"""
+Сравнение векторного ядра траекторий с прежней поточечной реализацией.
+
+    cd backend && python -m benchmarks.geodesy_benchmark [--points 1000000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.utils import haversine, summarize_trajectory, track_columns, trajectory_kernel
+
+
+# Реализация до перехода на numpy, оставлена как эталон
+def legacy_avg_speed(data):
+    if len(data) < 2:
+        return 0
+    total_distance = 0
+    total_time = 0
+    for i in range(1, len(data)):
+        d = haversine(data[i-1].latitude, data[i-1].longitude, data[i].latitude, data[i].longitude)
+        t = (data[i].timestamp - data[i-1].timestamp).total_seconds() / 3600
+        total_distance += d
+        total_time += t
+    return total_distance / total_time if total_time else 0
+
+
+def make_track(points: int):
+    rng = np.random.default_rng(42)
+    lat = 55.0 + np.cumsum(rng.normal(0, 1e-4, points))
+    lon = 37.0 + np.cumsum(rng.normal(0, 1e-4, points))
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    data = [
+        SimpleNamespace(latitude=float(a), longitude=float(b), timestamp=start + timedelta(seconds=i))
+        for i, (a, b) in enumerate(zip(lat, lon))
+    ]
+    return data
+
+
+def numpy_avg_speed(data):
+    return summarize_trajectory(*track_columns(data))["avg_speed_kmh"]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    data = make_track(args.points)
+
+    legacy, legacy_s = timed(legacy_avg_speed, data)
+    current, current_s = timed(numpy_avg_speed, data)
+    columns, columns_s = timed(track_columns, data)
+    _, kernel_s = timed(trajectory_kernel, *columns)
+
+    print(f"points:                       {args.points}")
+    print(f"legacy loop avg speed:        {legacy_s:8.3f} s  ({legacy:.6f} km/h)")
+    print(f"numpy avg speed (from list):  {current_s:8.3f} s  ({current:.6f} km/h)")
+    print(f"  list -> columns:            {columns_s:8.3f} s")
+    print(f"  full kernel on columns:     {kernel_s:8.3f} s")
+    print(f"speedup on columns:           {legacy_s / kernel_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
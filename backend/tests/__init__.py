@@ -0,0 +1,5 @@
+import os
+
+# Движок БД создаётся при импорте app.database; проверкам соединение не нужно
+for _name, _value in (("POSTGRES_HOST", "localhost"), ("POSTGRES_PORT", "5432")):
+    os.environ.setdefault(_name, _value)
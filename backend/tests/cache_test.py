@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import patch
+from app.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        patcher = patch("app.cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=10, ttl=60, negative_ttl=5)
+        cache.set("a", 1)
+        cache.set_missing("b")
+
+        self.assertEqual((cache.get("a"), cache.get("b")), ((True, 1), (True, None)))
+        self.now += 10
+        self.assertEqual((cache.get("a"), cache.get("b")), ((True, 1), (False, None)))
+        self.now += 60
+        self.assertEqual(cache.get("a"), (False, None))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60, negative_ttl=5)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
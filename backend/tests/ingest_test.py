@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app import config
+from app.database import DATABASE_URL, Base
+from app.ingest import bulk_insert_sensor_data
+
+SCHEMA = "backend_test"
+
+
+class TestBulkInsert(unittest.IsolatedAsyncioTestCase):
+    """Проверки в отдельной схеме БД из POSTGRES_*; без БД пропускаются."""
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(DATABASE_URL, connect_args={"server_settings": {"search_path": SCHEMA}})
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(text("INSERT INTO sensors (id) VALUES (1)"))
+        except Exception as exc:
+            await self.engine.dispose()
+            self.skipTest(f"database is not available: {exc}")
+
+    async def asyncTearDown(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await self.engine.dispose()
+
+    async def _count(self) -> int:
+        async with self.engine.connect() as conn:
+            return (await conn.execute(text("SELECT count(*) FROM sensor_data"))).scalar()
+
+    async def test_rows_roll_back_with_the_session(self):
+        rows = [(datetime(2026, 1, 1, 0, 0, i), True, 55.0, 37.0, 1) for i in range(10)]
+
+        for copy_min_rows in (1, 1000):
+            with patch.object(config, "BULK_COPY_MIN_ROWS", copy_min_rows):
+                async with AsyncSession(self.engine) as session:
+                    # Первый запрос сессии, как при попадании сенсоров в кэш
+                    self.assertEqual(await bulk_insert_sensor_data(session, rows), 10)
+                    await session.rollback()
+
+            self.assertEqual(await self._count(), 0)
+
+    async def test_rows_are_written_on_commit(self):
+        rows = [(datetime(2026, 1, 1, 0, 0, i), False, 55.0, 37.0, 1) for i in range(10)]
+
+        with patch.object(config, "BULK_COPY_MIN_ROWS", 1):
+            async with AsyncSession(self.engine) as session:
+                await bulk_insert_sensor_data(session, rows)
+                await session.commit()
+
+        self.assertEqual(await self._count(), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import metrics
+from app.sensor_data import ADAPTER_REQUESTS
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(metrics.router)
+        self.client = TestClient(app)
+
+    def test_prometheus_text(self):
+        ADAPTER_REQUESTS.labels("ok").inc()
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('backend_adapter_requests_total{outcome="ok"}', response.text)
+        self.assertIn("# TYPE backend_adapter_request_seconds histogram", response.text)
+
+    def test_sampled_values_are_read_on_scrape(self):
+        cache = metrics.version_cache
+        before = cache.stats()["misses"]
+        cache.get("missing")
+
+        text = self.client.get("/metrics").text
+
+        self.assertIn(f'backend_cache_misses_total{{cache="sensor_versions"}} {before + 1:.1f}', text)
+        self.assertIn('backend_db_pool_connections{state="checked_out"} 0.0', text)
+        self.assertIn("backend_adapter_breaker_open 0.0", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+import httpx
+from app import config
+from app.sensor_data import AdapterUnavailableError, CircuitBreaker, SensorAdapterClient
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = patch("app.sensor_data.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(threshold=2, reset_after=30)
+
+    def test_opens_after_threshold_failures_in_a_row(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_admits_a_single_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+
+        self.assertEqual(self.breaker.state, "half-open")
+        self.assertEqual([self.breaker.allow() for _ in range(3)], [True, False, False])
+
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+    def test_probe_without_outcome_is_replaced_after_reset(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow())
+
+
+class TestAdapterClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.statuses = []
+        self.requests = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+        async def handler(request):
+            self.requests += 1
+            await self.release.wait()
+            status = self.statuses.pop(0) if self.statuses else 200
+            if status == "error":
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(status, json={"ok": True})
+
+        patcher = patch.multiple(config, ADAPTER_RETRIES=2, ADAPTER_RETRY_BACKOFF=0,
+                                 ADAPTER_BREAKER_THRESHOLD=1, ADAPTER_BREAKER_RESET=30)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = SensorAdapterClient("http://adapter")
+        self.client._client = httpx.AsyncClient(base_url="http://adapter", transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_retries_transport_errors_and_gateway_statuses(self):
+        self.statuses = ["error", 503]
+
+        resp = await self.client.get("/data", {})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.requests, 3)
+        self.assertEqual(self.client.breaker.state, "closed")
+
+    async def test_client_errors_are_not_retried(self):
+        self.statuses = [404]
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.client.get("/data", {})
+
+        self.assertEqual(self.requests, 1)
+
+    async def test_exhausted_retries_open_the_breaker(self):
+        self.statuses = [502, 502, 502]
+
+        with self.assertRaises(AdapterUnavailableError):
+            await self.client.get("/data", {})
+        with self.assertRaises(AdapterUnavailableError):
+            await self.client.get("/data", {})
+
+        self.assertEqual(self.requests, 3)
+        self.assertEqual(self.client.breaker.state, "open")
+
+    async def test_half_open_sends_one_probe_for_concurrent_requests(self):
+        self.client.breaker.record_failure()
+        self.client.breaker._opened_at -= 30
+        self.release.clear()
+
+        probe = asyncio.ensure_future(self.client.get("/data", {}))
+        await asyncio.sleep(0.01)
+        # Пропущенные к адаптеру запросы повисли бы до release
+        rejected = await asyncio.wait_for(asyncio.gather(
+            *(self.client.get("/data", {}) for _ in range(5)), return_exceptions=True
+        ), 1)
+        self.release.set()
+
+        self.assertEqual((await probe).status_code, 200)
+        self.assertTrue(all(isinstance(r, AdapterUnavailableError) for r in rejected))
+        self.assertEqual(self.requests, 1)
+        self.assertEqual(self.client.breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import math
+import unittest
+import numpy as np
+from app.utils import EARTH_RADIUS_KM, haversine, summarize_trajectory, trajectory_kernel
+
+LAT = [0.0, 0.01, 0.03]
+LON = [0.0, 0.0, 0.0]
+TS = [0.0, 3600.0, 7200.0]
+
+
+class TestMovingThreshold(unittest.TestCase):
+    def test_segment_at_threshold_is_stationary(self):
+        slow, fast = trajectory_kernel(LAT, LON, TS)["speed_kmh"].tolist()
+
+        # Как в адаптере: движение - строго быстрее порога
+        k = trajectory_kernel(LAT, LON, TS, moving_speed_kmh=slow)
+
+        self.assertLess(slow, fast)
+        self.assertEqual(k["moving"].tolist(), [False, True])
+
+    def test_moving_time(self):
+        summary = summarize_trajectory(LAT, LON, TS)
+
+        self.assertEqual(summary["moving_time_s"], 7200.0)
+        self.assertEqual(summary["stationary_time_s"], 0.0)
+
+
+class TestTrajectoryKernel(unittest.TestCase):
+    # На север на градус за час, стоянка, на восток на градус за полчаса
+    LAT = [0.0, 1.0, 1.0, 1.0]
+    LON = [0.0, 0.0, 0.0, 1.0]
+    TS = [0.0, 3600.0, 3600.0, 5400.0]
+
+    def test_segments_match_scalar_haversine(self):
+        rng = np.random.default_rng(1)
+        lat, lon = rng.uniform(-80, 80, 50), rng.uniform(-179, 179, 50)
+
+        k = trajectory_kernel(lat, lon, np.arange(50.0))
+
+        expected = [haversine(lat[i], lon[i], lat[i + 1], lon[i + 1]) for i in range(49)]
+        np.testing.assert_allclose(k["segment_km"], expected, rtol=1e-12)
+        np.testing.assert_allclose(k["cumulative_km"], np.concatenate(([0.0], np.cumsum(expected))))
+
+    def test_speed_bearing_and_zero_time_segments(self):
+        degree_km = math.pi * EARTH_RADIUS_KM / 180
+
+        k = trajectory_kernel(self.LAT, self.LON, self.TS)
+
+        self.assertAlmostEqual(k["speed_kmh"][0], degree_km)
+        # Отрезок без прошедшего времени не даёт бесконечной скорости
+        self.assertEqual(k["speed_kmh"][1], 0.0)
+        self.assertAlmostEqual(k["bearing_deg"][0], 0.0)
+        # Начальный азимут вдоль параллели чуть меньше 90
+        self.assertAlmostEqual(k["bearing_deg"][2], 90.0, delta=0.01)
+        self.assertEqual(k["moving"].tolist(), [True, False, True])
+
+    def test_summary(self):
+        summary = summarize_trajectory(self.LAT, self.LON, self.TS)
+
+        self.assertEqual(summary["point_count"], 4)
+        self.assertEqual(summary["total_time_s"], 5400.0)
+        self.assertEqual(summary["moving_time_s"], 5400.0)
+        self.assertAlmostEqual(summary["max_speed_kmh"], 2 * haversine(1.0, 0.0, 1.0, 1.0))
+
+    def test_short_track_summary_is_zero(self):
+        summary = summarize_trajectory([55.0], [37.0], [0.0])
+
+        self.assertEqual(summary["point_count"], 1)
+        self.assertEqual(summary["total_distance_km"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
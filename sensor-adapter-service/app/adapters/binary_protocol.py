@@ -1,11 +1,45 @@
 import struct
 from logging import getLogger
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
+import numpy as np
 from crcmod.predefined import mkCrcFun
 
 logger = getLogger(__name__)
 CRC8_FUNC = mkCrcFun('crc-8-maxim')
 
+# Пакет разбирается из любого буфера без копирования: bytes из TCP,
+# bytearray из потокового чтения тела HTTP-запроса
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _make_crc8_maxim_table() -> np.ndarray:
+    # CRC-8/Maxim: отражённый полином 0x31 (0x8C), init=0x00, xorout=0x00
+    table = np.zeros(256, dtype=np.uint8)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8C if crc & 1 else crc >> 1
+        table[i] = crc
+    return table
+
+
+CRC8_TABLE = _make_crc8_maxim_table()
+
+
+class CrcError(ValueError):
+    """Контрольная сумма сообщения не сошлась."""
+
+
+def crc8_maxim_rows(rows: np.ndarray) -> np.ndarray:
+    """
+    Табличный векторизованный CRC-8/Maxim: считает контрольную сумму
+    каждой строки двумерного массива uint8 за один проход по столбцам.
+    """
+    crc = np.zeros(rows.shape[0], dtype=np.uint8)
+    for col in range(rows.shape[1]):
+        crc = CRC8_TABLE[crc ^ rows[:, col]]
+    return crc
+
 class BinaryProtocolParser:
     """
     Парсит заголовок и поток сообщений протокола, описанного в binary_protocol.md
@@ -21,32 +55,112 @@ class BinaryProtocolParser:
     MSG_SENSOR_ALL_FMT = "<BIffhhhhhhhhhff"
     MSG_SENSOR_ALL_SIZE = struct.calcsize(MSG_SENSOR_ALL_FMT)
 
-    def parse_packet(self, raw: bytes) -> Dict[str, Any]:
+    # Форматы компилируются один раз; запись читается вместе с CRC через
+    # unpack_from прямо из буфера пакета, без срезов-копий
+    HEADER_STRUCT = struct.Struct(HEADER_FMT)
+    RECORD_STRUCT = struct.Struct(MSG_SENSOR_ALL_FMT + CRC_FMT[1:])
+
+    # Запись 0x02 вместе с CRC как структурированный тип numpy
+    MSG_SENSOR_ALL_DTYPE = np.dtype([
+        ("msg_type", "u1"),
+        ("timestamp", "<u4"),
+        ("latitude", "<f4"),
+        ("longitude", "<f4"),
+        ("acc_x", "<i2"), ("acc_y", "<i2"), ("acc_z", "<i2"),
+        ("gyr_x", "<i2"), ("gyr_y", "<i2"), ("gyr_z", "<i2"),
+        ("mag_x", "<i2"), ("mag_y", "<i2"), ("mag_z", "<i2"),
+        ("light", "<f4"),
+        ("temperature", "<f4"),
+        ("crc", "u1"),
+    ])
+    RECORD_SIZE = MSG_SENSOR_ALL_SIZE + CRC_SIZE
+
+    COLUMNS = (
+        "timestamp", "latitude", "longitude",
+        "acc_x", "acc_y", "acc_z",
+        "gyr_x", "gyr_y", "gyr_z",
+        "mag_x", "mag_y", "mag_z",
+        "light", "temperature",
+    )
+
+    def parse_packet(self, raw: Buffer) -> Dict[str, Any]:
+        device_id, body = self._split_packet(raw)
+
+        messages = self._decode_messages(body)
+
+        return {"device_id": device_id.hex(), "messages": messages}
+
+    def parse_packet_columns(self, raw: Buffer) -> Dict[str, Any]:
+        """
+        Колоночный режим: вместо списка словарей возвращает массивы numpy
+        (по одному на поле записи 0x02), которые смотрят в исходный буфер.
+        """
+        device_id, body = self._split_packet(raw)
+
+        count, columns = self._decode_columns(body)
+
+        return {"device_id": device_id.hex(), "count": count, "columns": columns}
+
+    # ------------------------------------------------------------------ #
+
+    def parse_header(self, raw: Buffer) -> Tuple[bytes, int]:
+        """
+        Разбирает только заголовок пакета: возвращает device_id и длину
+        блока сообщений. Используется для фрейминга потока на TCP.
+        """
         if len(raw) < self.HEADER_SIZE:
             logger.error("The packet is shorter than the header")
             raise ValueError("Пакет короче заголовка")
 
-        device_id, msg_len = struct.unpack(
-            self.HEADER_FMT, raw[: self.HEADER_SIZE]
-        )
-        
-        logger.info(f"Decoded device_id={device_id.hex()}, msg_len={msg_len}")
+        return self.HEADER_STRUCT.unpack_from(raw)
+
+    def _split_packet(self, raw: Buffer) -> Tuple[bytes, memoryview]:
+        device_id, msg_len = self.parse_header(raw)
 
-        body = raw[self.HEADER_SIZE :]
+        # Тело - окно в исходный буфер, а не его копия
+        body = memoryview(raw)[self.HEADER_SIZE :]
         if len(body) != msg_len:
             logger.error("Invalid message block length")
             raise ValueError("Неверная длина блока сообщений")
 
-        messages = self._decode_messages(body)
-        
-        logger.info(f"Successfully decoded {len(messages)} messages")
+        return device_id, body
 
-        return {"device_id": device_id.hex(), "messages": messages}
+    def _decode_columns(self, body: memoryview) -> Tuple[int, Dict[str, np.ndarray]]:
+        buffer = np.frombuffer(body, dtype=np.uint8)
+
+        # Типы записей стоят с шагом RECORD_SIZE; ищем первую не-0x02
+        types = buffer[:: self.RECORD_SIZE]
+        (bad,) = np.nonzero(types != 0x02)
+
+        if bad.size:
+            count = int(bad[0])
+            msg_type = int(types[count])
+            if msg_type != 0xFF:
+                logger.error(f"Unknown msg_type={msg_type}")
+                raise ValueError(f"Неизвестный msg_type={msg_type}")
+        else:
+            count = int(types.size)
+            if count * self.RECORD_SIZE > buffer.size:
+                logger.error("The message of type 0x02 is not full")
+                raise ValueError("Сообщение 0x02 обрезано")
+
+        rows = buffer[: count * self.RECORD_SIZE].reshape(count, self.RECORD_SIZE)
+        records = rows.view(self.MSG_SENSOR_ALL_DTYPE).reshape(count)
+
+        crc = crc8_maxim_rows(rows[:, : self.MSG_SENSOR_ALL_SIZE])
+        if not np.array_equal(crc, records["crc"]):
+            logger.error("The message has invalid crc8")
+            raise CrcError("Неверная контрольная сумма сообщения")
+
+        return count, {name: records[name] for name in self.COLUMNS}
 
     # ------------------------------------------------------------------ #
 
-    def _decode_messages(self, body: bytes) -> List[Dict[str, Any]]:
+    def _decode_messages(self, body: memoryview) -> List[Dict[str, Any]]:
         result: List[Dict[str, Any]] = []
+        unpack_from = self.RECORD_STRUCT.unpack_from
+        msg_size = self.MSG_SENSOR_ALL_SIZE
+        record_size = self.RECORD_STRUCT.size
         idx = 0
 
         while idx < len(body):
@@ -58,19 +172,10 @@ class BinaryProtocolParser:
                 logger.error(f"Unknown msg_type={msg_type}")
                 raise ValueError(f"Неизвестный msg_type={msg_type}")
 
-            if len(body) - idx < self.MSG_SENSOR_ALL_SIZE + self.CRC_SIZE:
+            if len(body) - idx < record_size:
                 logger.error("The message of type 0x02 is not full")
                 raise ValueError("Сообщение 0x02 обрезано")
 
-            unpacked = struct.unpack(
-                self.MSG_SENSOR_ALL_FMT, body[idx : idx + self.MSG_SENSOR_ALL_SIZE]
-            )
-            
-            (crc_8, ) = struct.unpack(
-                self.CRC_FMT, body[idx + self.MSG_SENSOR_ALL_SIZE : idx + self.MSG_SENSOR_ALL_SIZE
-                                   + self.CRC_SIZE]
-            )
-            
             (
                 _,
                 timestamp,
@@ -87,11 +192,13 @@ class BinaryProtocolParser:
                 mag_z,
                 light,
                 temp,
-            ) = unpacked
+                crc_8,
+            ) = unpack_from(body, idx)
             
-            if not CRC8_FUNC(body[idx : idx + self.MSG_SENSOR_ALL_SIZE]) == crc_8:
+            # Срез memoryview - окно в тот же буфер, байты не копируются
+            if not CRC8_FUNC(body[idx : idx + msg_size]) == crc_8:
                 logger.error("The message has invalid crc8")
-                raise ValueError("Неверная контрольная сумма сообщения")
+                raise CrcError("Неверная контрольная сумма сообщения")
 
             result.append(
                 {
@@ -105,6 +212,18 @@ class BinaryProtocolParser:
                     "temperature": temp,
                 }
             )
-            idx += self.MSG_SENSOR_ALL_SIZE + self.CRC_SIZE
+            idx += record_size
 
         return result
+
+
+_default_parser = BinaryProtocolParser()
+
+
+def decode_packet_columns(raw: Buffer) -> Dict[str, Any]:
+    """
+    Колоночный разбор пакета как функция модуля, чтобы её можно было
+    отправить в пул процессов. Результат - массивы numpy без объектов
+    Python на каждую запись, поэтому он дёшево сериализуется между процессами.
+    """
+    return _default_parser.parse_packet_columns(raw)
@@ -1,18 +1,151 @@
-from typing import Any, Dict
-from app.adapters.binary_protocol import BinaryProtocolParser
-from app.core.services import save_messages
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from logging import getLogger
+from typing import Any, Dict, Optional
+import numpy as np
+from prometheus_client import Counter, Histogram
+from app.adapters.binary_protocol import BinaryProtocolParser, Buffer, CrcError, decode_packet_columns
+from app.config.settings import settings
+from app.core.live import live_hub, make_fix
+from app.core.logs import LogSampler
+from app.core.services import save_columns
+
+logger = getLogger(__name__)
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+PACKET_SIZE = Histogram(
+    "adapter_packet_size_bytes", "Size of received packets",
+    buckets=(64, 256, 1024, 4096, 16384, 65536),
+)
+MESSAGES_PER_PACKET = Histogram(
+    "adapter_messages_per_packet", "Decoded 0x02 messages per packet",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 1600),
+)
+PARSE_SECONDS = Histogram(
+    "adapter_parse_seconds", "Packet decoding time", ["executor"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+PACKETS = Counter("adapter_packets_total", "Processed packets by outcome", ["result"])
+CRC_FAILURES = Counter("adapter_crc_failures_total", "Packets rejected because of a CRC mismatch")
+MESSAGES = Counter("adapter_messages_total", "Decoded messages by outcome", ["result"])
+
+_PARSE_INLINE = PARSE_SECONDS.labels("inline")
+_PARSE_POOL = PARSE_SECONDS.labels("pool")
+_PACKETS_OK = PACKETS.labels("ok")
+_PACKETS_REJECTED = PACKETS.labels("rejected")
+_PACKETS_FAILED = PACKETS.labels("error")
+_MESSAGES_SAVED = MESSAGES.labels("saved")
+_MESSAGES_DUPLICATE = MESSAGES.labels("duplicate")
 
 
 class SensorProtocolAdapter:
     """
     Высокоуровневый адаптер: принимает бинарный пакет, проверяет,
     парсит и сохраняет сообщения в БД.
+
+    Крупные пакеты можно разбирать вне цикла событий - в пуле потоков или
+    процессов (см. PARSER_EXECUTOR), чтобы разбор не тормозил HTTP и TCP.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        executor_mode: str = settings.PARSER_EXECUTOR,
+        offload_min_size: int = settings.PARSER_OFFLOAD_MIN_SIZE,
+        workers: int = settings.PARSER_WORKERS,
+    ):
+        if executor_mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown parser executor mode {executor_mode}")
+
         self._parser = BinaryProtocolParser()
+        self._executor_mode = executor_mode
+        self._offload_min_size = offload_min_size
+        self._workers = workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+        self._log_sampled = LogSampler(settings.LOG_SAMPLE_EVERY)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._executor_mode == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="packet-decoder"
+                )
+            else:
+                # spawn: форк процесса с работающим циклом событий и потоками небезопасен
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        return self._executor
+
+    async def decode(self, raw: Buffer) -> Dict[str, Any]:
+        started = time.perf_counter()
+        if self._executor_mode == "inline" or len(raw) < self._offload_min_size:
+            parsed = self._parser.parse_packet_columns(raw)
+            _PARSE_INLINE.observe(time.perf_counter() - started)
+            return parsed
+
+        loop = asyncio.get_running_loop()
+        parsed = await loop.run_in_executor(self._get_executor(), decode_packet_columns, raw)
+        _PARSE_POOL.observe(time.perf_counter() - started)
+        return parsed
+
+    async def process_packet(self, raw: Buffer) -> Dict[str, Any]:
+        PACKET_SIZE.observe(len(raw))
+        try:
+            parsed = await self.decode(raw)
+        except CrcError:
+            CRC_FAILURES.inc()
+            _PACKETS_REJECTED.inc()
+            raise
+        except ValueError:
+            _PACKETS_REJECTED.inc()
+            raise
+        except Exception:
+            _PACKETS_FAILED.inc()
+            raise
+        MESSAGES_PER_PACKET.observe(parsed["count"])
+
+        try:
+            saved, duplicates = await save_columns(parsed["device_id"], parsed["columns"])
+        except Exception:
+            _PACKETS_FAILED.inc()
+            raise
+        _PACKETS_OK.inc()
+        _MESSAGES_SAVED.inc(saved)
+        _MESSAGES_DUPLICATE.inc(duplicates)
+
+        # При fanout точку публикует транзакция записи (services.write_messages)
+        if saved and not live_hub.fanout and live_hub.has_subscribers(parsed["device_id"]):
+            self._publish_latest(parsed["device_id"], parsed["columns"])
+
+        if self._log_sampled():
+            logger.info(
+                f"Decoded {parsed['count']} messages ({len(raw)} bytes) from device_id={parsed['device_id']}, "
+                f"saved {saved}, duplicates {duplicates}"
+            )
+        return {
+            "device_id": parsed["device_id"],
+            "saved_messages": saved,
+            "duplicate_messages": duplicates,
+        }
+
+    @staticmethod
+    def _publish_latest(device_id: str, columns: Dict[str, np.ndarray]) -> None:
+        """Подписчикам нужна только последняя точка пакета."""
+        i = int(np.argmax(columns["timestamp"]))
+        live_hub.publish(make_fix(
+            device_id,
+            int(columns["timestamp"][i]),
+            float(columns["latitude"][i]),
+            float(columns["longitude"][i]),
+            float(columns["light"][i]),
+        ))
 
-    async def process_packet(self, raw: bytes) -> Dict[str, Any]:
-        parsed = self._parser.parse_packet(raw)
-        saved = await save_messages(parsed["device_id"], parsed["messages"])
-        return {"device_id": parsed["device_id"], "saved_messages": saved}
+    async def shutdown(self) -> None:
+        """Дожидается разборов, которые уже идут в пуле, не блокируя цикл событий."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
@@ -1,68 +1,575 @@
-from typing import List, Optional
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from logging import getLogger
 from datetime import datetime
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import numpy as np
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import BigInteger, and_, cast, func, or_, select, tuple_
 from app.adapters import adapter
+from app.config.settings import settings
 from app.core.models import SensorMessage
-from app.core.database import get_db
-from app.core.schemas import CoordinateResponse
+from app.core.database import SessionLocal, get_db
+from app.core.formats import encode_columns, negotiate, rows_to_columns
+from app.core.last_fixes import last_fixes
+from app.core.logs import LogSampler
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.response_cache import CachedResponse, etag_matches, make_etag, response_cache
+from app.core.schemas import (
+    BatchCoordinatesQuery, BatchStatsQuery, CoordinatePage, CoordinateResponse, LivePosition, PolygonQuery,
+    SpatialDeviceSummary, SpatialPoint, TrackStatsResponse,
+)
+from app.core.analytics import device_condition, get_track_stats, get_tracks_stats, haversine_sql
+from app.core.geo import (
+    BBox, bbox_condition, cover_bbox, geohash_condition, points_in_polygon, polygon_bbox, radius_bboxes,
+)
+from app.core.simplify import simplify
 
 logger = getLogger(__name__)
 router = APIRouter()
+_log_sampled = LogSampler(settings.LOG_SAMPLE_EVERY)
+
+_COORDINATES_JSON = TypeAdapter(List[CoordinateResponse])
+_BATCH_COORDINATES_JSON = TypeAdapter(Dict[str, List[CoordinateResponse]])
+
+async def read_body(request: Request, limit: int) -> bytearray:
+    """
+    Читает тело по частям в один буфер, который затем разбирается без
+    копирования. При известном Content-Length буфер выделяется сразу;
+    тело больше limit отклоняется с 413, не дочитываясь до конца.
+    """
+    declared = request.headers.get("content-length")
+    size = int(declared) if declared is not None and declared.isdigit() else None
+    if size is not None and size > limit:
+        raise HTTPException(413, detail="Пакет превышает максимальный размер")
+
+    body = bytearray(size or 0)
+    received = 0
+    async for chunk in request.stream():
+        end = received + len(chunk)
+        if end > limit:
+            raise HTTPException(413, detail="Пакет превышает максимальный размер")
+        # Внутри выделенного буфера - копирование на место, за его концом - дописывание
+        body[received:end] = chunk
+        received = end
+
+    del body[received:]
+    return body
+
 
 @router.post("/sensors/binary", status_code=201)
 async def receive_binary(request: Request):
-    logger.info(f"Processing request from {request.client.host}")
-    raw = await request.body()
+    if _log_sampled():
+        logger.info(f"Processing request from {request.client.host}")
+    raw = await read_body(request, settings.HTTP_MAX_BODY_SIZE)
     try:
         processed = await adapter.process_packet(raw)
     except Exception as exc:
         raise HTTPException(400, detail=str(exc))
     return JSONResponse(content=processed)
 
+def _coordinates_stmt(
+    internal_id: Union[str, Sequence[str]],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+):
+    stmt = select(
+        SensorMessage.id,
+        SensorMessage.latitude,
+        SensorMessage.longitude,
+        SensorMessage.timestamp,
+        SensorMessage.light,
+    ).where(
+        device_condition(SensorMessage.device_id, internal_id)
+    )
+
+    if date_from is not None:
+        stmt = stmt.where(
+            SensorMessage.timestamp >= int(date_from.timestamp())
+        )
+
+    if date_to is not None:
+        stmt = stmt.where(
+            SensorMessage.timestamp <= int(date_to.timestamp())
+        )
+
+    return stmt
+
+
+def _bucket_columns(points):
+    """Средняя точка интервала; группировка - на стороне вызывающего."""
+    return (
+        func.min(points.c.id).label("id"),
+        func.avg(points.c.latitude).label("latitude"),
+        func.avg(points.c.longitude).label("longitude"),
+        cast(func.avg(points.c.timestamp), BigInteger).label("timestamp"),
+        func.avg(points.c.light).label("light"),
+    )
+
+
+def _bucketed_stmt(
+    internal_id: str,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    bucket: int,
+):
+    """Точки, усреднённые по интервалам bucket секунд."""
+    points = _coordinates_stmt(internal_id, date_from, date_to).subquery()
+    return select(*_bucket_columns(points)).group_by(points.c.timestamp // bucket)
+
+
+def _replace_endpoints(records, first, last, order):
+    """
+    records - усреднённые интервалы по порядку order: крайние из них
+    содержат первую и последнюю точки и заменяются ими самими.
+    """
+    if order == "desc":
+        first, last = last, first
+    if first.timestamp == last.timestamp:
+        return [first]
+    return [first, *records[1:-1], last]
+
+
+async def _with_endpoints(db: AsyncSession, records, internal_id, date_from, date_to, order):
+    """Заменяет крайние точки усреднённого трека настоящими первой и последней."""
+    stmt = _coordinates_stmt(internal_id, date_from, date_to).limit(1)
+    first = (await db.execute(stmt.order_by(SensorMessage.timestamp.asc()))).first()
+    last = (await db.execute(stmt.order_by(SensorMessage.timestamp.desc()))).first()
+    if first is None:
+        return records
+    return _replace_endpoints(records, first, last, order)
+
+
+def _range_key(date_from: Optional[datetime], date_to: Optional[datetime]) -> Tuple[int, Optional[int]]:
+    """Границы диапазона в секундах: одинаковое время в разной записи даёт один ключ."""
+    ts_from = int(date_from.timestamp()) if date_from is not None else 0
+    ts_to = int(date_to.timestamp()) if date_to is not None else None
+    return ts_from, ts_to
+
+
+async def _cached_response(
+    request: Request,
+    key: str,
+    internal_id: str,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    render: Callable[[], Awaitable[Tuple[bytes, str]]],
+) -> Response:
+    """
+    Отдаёт ответ с ETag и 304 на совпавший If-None-Match. Ответы на запросы
+    с закрытым диапазоном (date_to в прошлом) кэшируются до прихода записей
+    внутри диапазона, остальные каждый раз считаются заново.
+    """
+    ts_from, ts_to = _range_key(date_from, date_to)
+    cacheable = response_cache.enabled and ts_to is not None and ts_to < time.time()
+
+    cached = response_cache.get(key) if cacheable else None
+    if cached is None:
+        body, media_type = await render()
+        cached = CachedResponse(body, media_type, make_etag(body))
+        if cacheable:
+            response_cache.set(key, cached, internal_id, (ts_from, ts_to))
+
+    headers = {"ETag": cached.etag}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type=cached.media_type, headers=headers)
+
+
+def _to_coordinate(r) -> CoordinateResponse:
+    return CoordinateResponse(
+        latitude=r.latitude,
+        longitude=r.longitude,
+        timestamp=r.timestamp,
+        light=r.light,
+    )
+
+
 @router.get("/sensors/data", response_model=List[CoordinateResponse])
 async def get_coordinates_by_sensor(
+    request: Request,
     internal_id: str,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
     limit: Optional[int] = None,
     order: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=2),
+    tolerance_m: Optional[float] = Query(None, gt=0),
+    bucket: Optional[int] = Query(None, ge=1),
     db: AsyncSession = Depends(get_db)
 ):
-    stmt = select(SensorMessage).where(
-        SensorMessage.device_id == internal_id
+    """
+    Упрощение трека для карт: bucket - усреднить точки по интервалам в
+    секундах (в БД), tolerance_m и max_points - алгоритм Рамера-Дугласа-Пекера
+    с допуском в метрах и/или ограничением числа точек. Первая и последняя
+    точки трека сохраняются.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+
+    async def render() -> Tuple[bytes, str]:
+        if bucket is not None:
+            stmt = _bucketed_stmt(internal_id, date_from, date_to, bucket)
+            ts = stmt.selected_columns.timestamp
+        else:
+            stmt = _coordinates_stmt(internal_id, date_from, date_to)
+            ts = SensorMessage.timestamp
+
+        simplified = max_points is not None or tolerance_m is not None
+        if order == "desc":
+            stmt = stmt.order_by(ts.desc())
+        elif order == "asc" or bucket is not None or simplified:
+            # Упрощать можно только упорядоченную по времени ломаную
+            stmt = stmt.order_by(ts.asc())
+
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        result = await db.execute(stmt)
+
+        records = result.all()
+
+        if bucket is not None and limit is None:
+            records = await _with_endpoints(db, records, internal_id, date_from, date_to, order)
+
+        if simplified and records:
+            keep = simplify(
+                np.fromiter((r.latitude for r in records), np.float64, len(records)),
+                np.fromiter((r.longitude for r in records), np.float64, len(records)),
+                tolerance_m=tolerance_m,
+                max_points=max_points,
+            )
+            records = [records[i] for i in keep.tolist()]
+
+        if media_type is not None:
+            return encode_columns(rows_to_columns(records), media_type), media_type
+        return _COORDINATES_JSON.dump_json([_to_coordinate(r) for r in records]), "application/json"
+
+    key = response_cache.make_key(
+        "data", internal_id=internal_id, range=_range_key(date_from, date_to), limit=limit, order=order,
+        max_points=max_points, tolerance_m=tolerance_m, bucket=bucket, media_type=media_type,
     )
+    return await _cached_response(request, key, internal_id, date_from, date_to, render)
 
-    if date_from is not None:
-        stmt = stmt.where(
-            SensorMessage.timestamp >= int(date_from.timestamp())
+
+@router.get("/sensors/data/page", response_model=CoordinatePage)
+async def get_coordinates_page(
+    internal_id: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    page_size: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Постраничная выдача по ключу (timestamp, id): каждая страница - это
+    поиск по индексу от позиции курсора, без OFFSET.
+    """
+    stmt = _coordinates_stmt(internal_id, date_from, date_to)
+    key = tuple_(SensorMessage.timestamp, SensorMessage.id)
+    scope = f"{internal_id}:{order}"
+
+    if cursor is not None:
+        try:
+            position = tuple_(*decode_cursor(cursor, scope))
+        except ValueError as exc:
+            raise HTTPException(400, detail=str(exc))
+        stmt = stmt.where(key > position if order == "asc" else key < position)
+
+    if order == "asc":
+        stmt = stmt.order_by(SensorMessage.timestamp.asc(), SensorMessage.id.asc())
+    else:
+        stmt = stmt.order_by(SensorMessage.timestamp.desc(), SensorMessage.id.desc())
+
+    records = (await db.execute(stmt.limit(page_size + 1))).all()
+
+    next_cursor = None
+    if len(records) > page_size:
+        records = records[:page_size]
+        next_cursor = encode_cursor(records[-1].timestamp, records[-1].id, scope)
+
+    return CoordinatePage(items=[_to_coordinate(r) for r in records], next_cursor=next_cursor)
+
+
+@router.get("/sensors/data/stream")
+async def stream_coordinates(
+    internal_id: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|json)$"),
+):
+    """
+    Потоковая выгрузка всего диапазона через серверный курсор: в памяти
+    одновременно держится не больше STREAM_CHUNK_ROWS строк.
+    """
+    stmt = _coordinates_stmt(internal_id, date_from, date_to).order_by(
+        SensorMessage.timestamp.asc(), SensorMessage.id.asc()
+    ).execution_options(yield_per=settings.STREAM_CHUNK_ROWS)
+
+    ndjson = format == "ndjson"
+
+    async def generate():
+        # Сессия открывается внутри генератора: зависимость get_db
+        # закрылась бы раньше, чем ответ будет отправлен
+        async with SessionLocal() as session:
+            result = await session.stream(stmt)
+            first = True
+            if not ndjson:
+                yield b"["
+            async for partition in result.partitions():
+                lines = [_to_coordinate(r).model_dump_json().encode() for r in partition]
+                if ndjson:
+                    yield b"\n".join(lines) + b"\n"
+                else:
+                    yield (b"" if first else b",") + b",".join(lines)
+                first = False
+            if not ndjson:
+                yield b"]"
+
+    media_type = "application/x-ndjson" if ndjson else "application/json"
+    return StreamingResponse(generate(), media_type=media_type)
+
+
+@router.get("/sensors/stats", response_model=TrackStatsResponse)
+async def get_track_stats_by_sensor(
+    request: Request,
+    internal_id: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    times_of_day: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    async def render() -> Tuple[bytes, str]:
+        stats = await get_track_stats(db, internal_id, date_from, date_to, times_of_day)
+        return stats.model_dump_json().encode(), "application/json"
+
+    key = response_cache.make_key(
+        "stats", internal_id=internal_id, range=_range_key(date_from, date_to), times_of_day=times_of_day,
+    )
+    return await _cached_response(request, key, internal_id, date_from, date_to, render)
+
+
+@router.get("/sensors/last", response_model=List[LivePosition])
+async def get_last_positions(internal_id: Optional[List[str]] = Query(None)):
+    """
+    Последние известные точки устройств internal_id (можно повторять),
+    без параметра - всех устройств. Отвечает из памяти, без запроса к БД;
+    устройства без точек в ответ не попадают.
+    """
+    fixes = last_fixes.get(internal_id)
+    return Response("[" + ",".join(fix.payload for fix in fixes) + "]", media_type="application/json")
+
+
+def _batch_coordinates_stmt(query: BatchCoordinatesQuery):
+    points = _coordinates_stmt(query.internal_ids, query.date_from, query.date_to).add_columns(
+        SensorMessage.device_id
+    )
+    if query.bucket is None:
+        return points.order_by(SensorMessage.device_id, SensorMessage.timestamp)
+
+    points = points.subquery()
+    stmt = select(points.c.device_id, *_bucket_columns(points)).group_by(
+        points.c.device_id, points.c.timestamp // query.bucket
+    )
+    return stmt.order_by(stmt.selected_columns.device_id, stmt.selected_columns.timestamp)
+
+
+async def _batch_endpoints(db: AsyncSession, query: BatchCoordinatesQuery) -> Dict[str, tuple]:
+    """Настоящие первая и последняя точки каждого устройства: два запроса на все устройства."""
+    stmt = _coordinates_stmt(query.internal_ids, query.date_from, query.date_to).add_columns(
+        SensorMessage.device_id
+    ).distinct(SensorMessage.device_id)
+    first = await db.execute(stmt.order_by(SensorMessage.device_id, SensorMessage.timestamp.asc()))
+    last = await db.execute(stmt.order_by(SensorMessage.device_id, SensorMessage.timestamp.desc()))
+    last_by_device = {r.device_id: r for r in last}
+    return {r.device_id: (r, last_by_device[r.device_id]) for r in first}
+
+
+@router.post("/sensors/batch/data", response_model=Dict[str, List[CoordinateResponse]])
+async def get_coordinates_batch(query: BatchCoordinatesQuery, db: AsyncSession = Depends(get_db)):
+    """
+    Треки нескольких устройств одним запросом к БД (device_id = ANY(...)),
+    по возрастанию времени, сгруппированные по device_id. bucket, tolerance_m
+    и max_points - как у /sensors/data, для каждого трека отдельно.
+    """
+    tracks: Dict[str, list] = {device_id: [] for device_id in query.internal_ids}
+    for r in await db.execute(_batch_coordinates_stmt(query)):
+        tracks[r.device_id].append(r)
+
+    if query.bucket is not None:
+        for device_id, (first, last) in (await _batch_endpoints(db, query)).items():
+            tracks[device_id] = _replace_endpoints(tracks[device_id], first, last, "asc")
+
+    if query.max_points is not None or query.tolerance_m is not None:
+        for device_id, records in tracks.items():
+            if not records:
+                continue
+            keep = simplify(
+                np.fromiter((r.latitude for r in records), np.float64, len(records)),
+                np.fromiter((r.longitude for r in records), np.float64, len(records)),
+                tolerance_m=query.tolerance_m,
+                max_points=query.max_points,
+            )
+            tracks[device_id] = [records[i] for i in keep.tolist()]
+
+    body = _BATCH_COORDINATES_JSON.dump_json({
+        device_id: [_to_coordinate(r) for r in records] for device_id, records in tracks.items()
+    })
+    return Response(body, media_type="application/json")
+
+
+@router.post("/sensors/batch/stats", response_model=Dict[str, TrackStatsResponse])
+async def get_track_stats_batch(query: BatchStatsQuery, db: AsyncSession = Depends(get_db)):
+    """
+    Статистика треков нескольких устройств: агрегаты и края диапазона
+    читаются запросами на все устройства сразу, а не на каждое.
+    """
+    return await get_tracks_stats(
+        db, list(dict.fromkeys(query.internal_ids)), query.date_from, query.date_to, query.times_of_day
+    )
+
+
+def _spatial_stmt(
+    boxes: Sequence[BBox],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    internal_id: Optional[str],
+):
+    """
+    Точки внутри прямоугольников: диапазоны индекса по префиксам geohash,
+    покрывающим каждый прямоугольник, и точная проверка координат.
+    """
+    stmt = select(
+        SensorMessage.device_id,
+        SensorMessage.latitude,
+        SensorMessage.longitude,
+        SensorMessage.timestamp,
+    ).where(or_(*(
+        and_(
+            geohash_condition(SensorMessage.geohash, cover_bbox(bbox)),
+            bbox_condition(SensorMessage.latitude, SensorMessage.longitude, bbox),
         )
+        for bbox in boxes
+    )))
 
+    if date_from is not None:
+        stmt = stmt.where(SensorMessage.timestamp >= int(date_from.timestamp()))
     if date_to is not None:
-        stmt = stmt.where(
-            SensorMessage.timestamp <= int(date_to.timestamp())
-        )
-        
-    if order == "asc":
-        stmt = stmt.order_by(SensorMessage.timestamp.asc())
-    elif order == "desc":
-        stmt = stmt.order_by(SensorMessage.timestamp.desc())
+        stmt = stmt.where(SensorMessage.timestamp <= int(date_to.timestamp()))
+    if internal_id is not None:
+        stmt = stmt.where(SensorMessage.device_id == internal_id)
+
+    return stmt
+
+
+async def _spatial_response(db: AsyncSession, stmt, limit: int, summary: bool):
+    if summary:
+        points = stmt.subquery()
+        summary_stmt = select(
+            points.c.device_id,
+            func.count().label("point_count"),
+            func.min(points.c.timestamp).label("first_timestamp"),
+            func.max(points.c.timestamp).label("last_timestamp"),
+        ).group_by(points.c.device_id).order_by(points.c.device_id).limit(limit)
+        rows = (await db.execute(summary_stmt)).all()
+        return [SpatialDeviceSummary(**r._mapping) for r in rows]
+
+    rows = (await db.execute(stmt.order_by(SensorMessage.timestamp.asc()).limit(limit))).all()
+    return [SpatialPoint(**r._mapping) for r in rows]
+
+
+def _check_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> BBox:
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(400, detail="Некорректный прямоугольник: min больше max")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+SpatialResponse = Union[List[SpatialDeviceSummary], List[SpatialPoint]]
+
 
-    if limit is not None:
-        stmt = stmt.limit(limit)
+@router.get("/sensors/spatial/bbox", response_model=SpatialResponse)
+async def get_points_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    internal_id: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    summary: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Точки в прямоугольнике за период. summary=true - вместо точек список
+    устройств с числом точек и первым/последним временем.
+    """
+    bbox = _check_bbox(min_lat, min_lon, max_lat, max_lon)
+    stmt = _spatial_stmt([bbox], date_from, date_to, internal_id)
+    return await _spatial_response(db, stmt, limit, summary)
+
+
+@router.get("/sensors/spatial/radius", response_model=SpatialResponse)
+async def get_points_in_radius(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    internal_id: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    summary: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Точки не дальше radius_km от (lat, lon) за период."""
+    stmt = _spatial_stmt(radius_bboxes(lat, lon, radius_km), date_from, date_to, internal_id).where(
+        haversine_sql(lat, lon, SensorMessage.latitude, SensorMessage.longitude) <= radius_km
+    )
+    return await _spatial_response(db, stmt, limit, summary)
+
+
+@router.post("/sensors/spatial/polygon", response_model=SpatialResponse)
+async def get_points_in_polygon(query: PolygonQuery, db: AsyncSession = Depends(get_db)):
+    """
+    Точки внутри многоугольника за период. Из БД читаются точки описанного
+    прямоугольника, принадлежность многоугольнику проверяется векторно.
+    """
+    stmt = _spatial_stmt([polygon_bbox(query.polygon)], query.date_from, query.date_to, query.internal_id)
+    stmt = stmt.order_by(SensorMessage.timestamp.asc()).execution_options(
+        yield_per=settings.STREAM_CHUNK_ROWS
+    )
+
+    points: List[SpatialPoint] = []
+    # device_id -> [число точек, первое время, последнее время]
+    devices: Dict[str, list] = {}
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        inside = points_in_polygon(
+            np.fromiter((r.latitude for r in partition), np.float64, len(partition)),
+            np.fromiter((r.longitude for r in partition), np.float64, len(partition)),
+            query.polygon,
+        )
+        hits = [r for r, hit in zip(partition, inside.tolist()) if hit]
 
-    result = await db.execute(stmt)
+        if query.summary:
+            for r in hits:
+                device = devices.setdefault(r.device_id, [0, r.timestamp, r.timestamp])
+                device[0] += 1
+                device[2] = r.timestamp
+            continue
 
-    records = result.scalars().all()
+        points += [SpatialPoint(**r._mapping) for r in hits]
+        if len(points) >= query.limit:
+            await result.close()
+            return points[:query.limit]
 
-    return [
-        CoordinateResponse(
-            latitude=r.latitude,
-            longitude=r.longitude,
-            timestamp=r.timestamp,
-            light=(r.data.get("light") if r.data else None),
-        ) for r in records
-    ]
\ No newline at end of file
+    if query.summary:
+        return [
+            SpatialDeviceSummary(
+                device_id=device_id, point_count=count, first_timestamp=first, last_timestamp=last
+            )
+            for device_id, (count, first, last) in sorted(devices.items())[:query.limit]
+        ]
+    return points
@@ -0,0 +1,120 @@
+import asyncio
+from typing import FrozenSet, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, WebSocket
+from fastapi.responses import StreamingResponse
+from app.config.settings import settings
+from app.core.geo import BBox
+from app.core.live import Subscription, live_hub
+
+router = APIRouter()
+
+
+def _live_filter(
+    internal_id: Optional[List[str]],
+    min_lat: Optional[float],
+    min_lon: Optional[float],
+    max_lat: Optional[float],
+    max_lon: Optional[float],
+) -> Tuple[Optional[FrozenSet[str]], Optional[BBox]]:
+    corners = (min_lat, min_lon, max_lat, max_lon)
+    if all(c is None for c in corners):
+        bbox = None
+    elif any(c is None for c in corners):
+        raise ValueError("Прямоугольник задаётся всеми четырьмя границами")
+    elif min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("Некорректный прямоугольник: min больше max")
+    else:
+        bbox = corners
+
+    return (frozenset(internal_id) if internal_id else None), bbox
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    # Сообщения от клиента не нужны, но без чтения не узнать о закрытии
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def _send_updates(websocket: WebSocket, subscription: Subscription) -> None:
+    disconnected = asyncio.ensure_future(_wait_disconnect(websocket))
+    try:
+        while True:
+            updates = asyncio.ensure_future(subscription.get())
+            await asyncio.wait({updates, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                updates.cancel()
+                return
+            for fix in updates.result():
+                await websocket.send_text(fix.payload)
+    finally:
+        disconnected.cancel()
+
+
+@router.websocket("/sensors/live/ws")
+async def live_positions_ws(
+    websocket: WebSocket,
+    internal_id: Optional[List[str]] = Query(None),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+    """
+    Свежие координаты устройств internal_id и/или внутри прямоугольника:
+    по сообщению JSON на точку. Без фильтров - все устройства.
+    """
+    try:
+        device_ids, bbox = _live_filter(internal_id, min_lat, min_lon, max_lat, max_lon)
+    except ValueError as exc:
+        await websocket.close(code=1008, reason=str(exc))
+        return
+
+    await websocket.accept()
+    subscription = live_hub.subscribe(device_ids, bbox)
+    try:
+        await _send_updates(websocket, subscription)
+    except Exception:
+        # Клиент отвалился посреди отправки
+        pass
+    finally:
+        live_hub.unsubscribe(subscription)
+
+
+@router.get("/sensors/live/sse")
+async def live_positions_sse(
+    internal_id: Optional[List[str]] = Query(None),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+    """
+    То же, что /sensors/live/ws, в виде Server-Sent Events. Раз в
+    LIVE_KEEPALIVE секунд без новых точек отправляется комментарий,
+    чтобы прокси не закрывали простаивающее соединение.
+    """
+    try:
+        device_ids, bbox = _live_filter(internal_id, min_lat, min_lon, max_lat, max_lon)
+    except ValueError as exc:
+        raise HTTPException(400, detail=str(exc))
+
+    async def events():
+        # Подписка живёт ровно столько, сколько поток ответа
+        subscription = live_hub.subscribe(device_ids, bbox)
+        try:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    fixes = await asyncio.wait_for(subscription.get(), settings.LIVE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield "".join(f"data: {fix.payload}\n\n" for fix in fixes).encode()
+        finally:
+            live_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
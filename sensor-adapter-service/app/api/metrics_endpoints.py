@@ -0,0 +1,54 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from app.core.database import engine
+from app.core.last_fixes import last_fixes
+from app.core.metrics import CONTENT_TYPE, render
+from app.core.response_cache import response_cache
+from app.core.services import ingest_buffer, recent_keys
+
+router = APIRouter()
+
+
+class _SampledMetrics(Collector):
+    """Значения, которые читаются в момент опроса."""
+
+    def collect(self):
+        yield GaugeMetricFamily(
+            "adapter_ingest_buffer_rows", "Rows waiting in the ingest buffer", value=ingest_buffer.pending
+        )
+        yield GaugeMetricFamily(
+            "adapter_dedup_keys", "Keys remembered by the ingest deduplication window", value=len(recent_keys)
+        )
+        yield GaugeMetricFamily(
+            "adapter_last_fix_devices", "Devices with a known last position", value=len(last_fixes)
+        )
+
+        pool = GaugeMetricFamily("adapter_db_pool_connections", "Database pool connections by state", labels=["state"])
+        pool.add_metric(["checked_in"], engine.pool.checkedin())
+        pool.add_metric(["checked_out"], engine.pool.checkedout())
+        pool.add_metric(["overflow"], max(engine.pool.overflow(), 0))
+        yield pool
+
+        yield GaugeMetricFamily(
+            "adapter_response_cache_entries", "Cached responses", value=response_cache.stats()["size"]
+        )
+        lookups = CounterMetricFamily("adapter_response_cache_requests", "Response cache lookups", labels=["result"])
+        lookups.add_metric(["hit"], response_cache.hits)
+        lookups.add_metric(["miss"], response_cache.misses)
+        yield lookups
+        yield CounterMetricFamily(
+            "adapter_response_cache_invalidations", "Responses dropped because of new data",
+            value=response_cache.invalidations,
+        )
+
+
+_SAMPLED = CollectorRegistry()
+_SAMPLED.register(_SampledMetrics())
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(render(_SAMPLED), media_type=CONTENT_TYPE)
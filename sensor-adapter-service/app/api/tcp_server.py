@@ -1,35 +1,270 @@
 import asyncio
 from logging import getLogger
+from prometheus_client import Counter, Gauge
 from app.adapters import adapter
+from app.adapters.binary_protocol import BinaryProtocolParser
+from app.config.settings import settings
+from app.core.logs import LogSampler
 
 logger = getLogger(__name__)
 
-async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-    data = await reader.read()  # читаем весь пакет
-    addr = writer.get_extra_info("peername")
-    
-    logger.info(f"Processing request from TCP client {addr}")
-    
-    response = b""
+TCP_CONNECTIONS = Gauge("adapter_tcp_connections", "Open TCP client connections", multiprocess_mode="livesum")
+TCP_CONNECTIONS_TOTAL = Counter("adapter_tcp_accepted_connections_total", "Accepted TCP client connections")
+TCP_INFLIGHT = Gauge("adapter_tcp_inflight_packets", "TCP packets being processed", multiprocess_mode="livesum")
+
+_log_sampled = LogSampler(settings.LOG_SAMPLE_EVERY)
+
+_header_parser = BinaryProtocolParser()
+_inflight: asyncio.Semaphore | None = None
+
+_STASH_SIZE = 0x1000
+_LINGER_TIMEOUT = 1.0
+
+
+def _get_inflight() -> asyncio.Semaphore:
+    # Общий на все соединения лимит одновременно обрабатываемых пакетов:
+    # пока он исчерпан, соединения не читают сокет и клиенты упираются
+    # в TCP-окно (backpressure)
+    global _inflight
+    if _inflight is None:
+        _inflight = asyncio.Semaphore(settings.TCP_MAX_INFLIGHT_PACKETS)
+    return _inflight
+
+
+async def _process(data: bytearray) -> bytes:
+    async with _get_inflight():
+        TCP_INFLIGHT.inc()
+        try:
+            result = await adapter.process_packet(data)
+            return f"OK {result['saved_messages']}\n".encode()
+        except Exception as e:
+            return f"ERR {e}\n".encode()
+        finally:
+            TCP_INFLIGHT.dec()
+
+
+class ClientConnection(asyncio.BufferedProtocol):
+    """
+    Соединение с TCP-клиентом, которое читает прямо в буферы пакетов.
+
+    Транспорт принимает байты из сокета (recv_into) в окно, которое отдаёт
+    get_buffer, поэтому тело пакета попадает в свой bytearray без
+    промежуточных копий. Короткие чтения (заголовок, маленькие пакеты) и
+    данные, пришедшие раньше, чем их ждут, идут через запас на _STASH_SIZE
+    байт: один recv забирает сразу несколько пакетов. Когда запас полон,
+    чтение приостанавливается и клиент упирается в TCP-окно.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._transport: asyncio.Transport | None = None
+        self._target: memoryview | None = None
+        self._filled = 0
+        self._stash = memoryview(bytearray(_STASH_SIZE))
+        self._stash_start = 0
+        self._stash_end = 0
+        self._direct = False
+        self._waiter: asyncio.Future | None = None
+        self._eof = False
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self._closed = self._loop.create_future()
+        self._handler: asyncio.Task | None = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self._transport = transport
+        self._handler = self._loop.create_task(handle_client(self))
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        # Запас пуст, пока readinto ждёт сокет, поэтому порядок байт не нарушается
+        self._direct = (
+            self._target is not None and len(self._target) - self._filled >= len(self._stash)
+        )
+        if self._direct:
+            return self._target[self._filled :]
+        return self._stash[self._stash_end :]
+
+    def buffer_updated(self, nbytes: int):
+        if self._direct:
+            self._filled += nbytes
+        else:
+            self._stash_end += nbytes
+            if self._target is not None:
+                self._filled += self._take(self._target[self._filled :])
+            if self._stash_end == len(self._stash):
+                self._transport.pause_reading()
+        if self._target is not None and self._filled == len(self._target):
+            self._wake(self._filled)
+
+    def eof_received(self) -> bool:
+        self._eof = True
+        self._wake(self._filled)
+        # Полузакрытое соединение остаётся открытым для ответа
+        return True
+
+    def connection_lost(self, exc: Exception | None):
+        self._eof = True
+        if exc is None:
+            self._wake(self._filled)
+        elif self._waiter is not None and not self._waiter.done():
+            self._waiter.set_exception(exc)
+        self._can_write.set()
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    def pause_writing(self):
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self._can_write.set()
+
+    def _take(self, view: memoryview) -> int:
+        count = min(len(view), self._stash_end - self._stash_start)
+        view[:count] = self._stash[self._stash_start : self._stash_start + count]
+        self._stash_start += count
+        if self._stash_start == self._stash_end:
+            self._stash_start = self._stash_end = 0
+        return count
+
+    def _wake(self, result: int):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(result)
+
+    async def readinto(self, buffer: bytearray | memoryview) -> int:
+        """
+        Заполняет buffer данными из сокета и возвращает число прочитанных
+        байт; меньше len(buffer) - только если клиент закрыл соединение.
+        """
+        view = memoryview(buffer)
+        filled = self._take(view)
+        if self._eof or filled == len(view):
+            return filled
+
+        self._target, self._filled = view, filled
+        self._waiter = self._loop.create_future()
+        self._transport.resume_reading()
+        try:
+            return await self._waiter
+        finally:
+            self._target = None
+            self._waiter = None
+
+    def get_extra_info(self, name: str):
+        return self._transport.get_extra_info(name)
+
+    def write(self, data: bytes):
+        self._transport.write(data)
+
+    async def drain(self):
+        await self._can_write.wait()
+        if self._closed.done():
+            raise ConnectionResetError("Connection lost")
+
+    async def close(self):
+        """
+        Закрывает соединение. Сокет, закрытый с непрочитанными данными, шлёт
+        клиенту RST, и тот может потерять уже отправленный ответ, поэтому
+        сначала отправляем FIN и дочитываем вход до EOF - не больше
+        TCP_MAX_PACKET_SIZE байт и не дольше _LINGER_TIMEOUT секунд.
+        """
+        if not self._eof:
+            self._transport.write_eof()
+            try:
+                await asyncio.wait_for(self._discard_input(settings.TCP_MAX_PACKET_SIZE),
+                                       timeout=_LINGER_TIMEOUT)
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+        self._transport.close()
+        await self._closed
+
+    async def _discard_input(self, limit: int):
+        scratch = memoryview(bytearray(min(limit, 0x10000)))
+        while limit > 0:
+            chunk = scratch[:limit]
+            if await self.readinto(chunk) < len(chunk):
+                return
+            limit -= len(chunk)
+
+
+async def read_packet(conn: ClientConnection) -> bytearray | None:
+    """
+    Читает из соединения ровно один пакет: заголовок, затем msg_len байт тела
+    сразу в bytearray под весь пакет. Возвращает None, если клиент закрыл
+    соединение между пакетами; на заголовок и на тело даётся по
+    TCP_IDLE_TIMEOUT секунд.
+    """
+    header_size = BinaryProtocolParser.HEADER_SIZE
+    header = bytearray(header_size)
+    received = await asyncio.wait_for(conn.readinto(header), timeout=settings.TCP_IDLE_TIMEOUT)
+    if received == 0:
+        return None
+    if received < header_size:
+        raise ValueError("Пакет короче заголовка")
+
+    _, msg_len = _header_parser.parse_header(header)
+    if header_size + msg_len > settings.TCP_MAX_PACKET_SIZE:
+        raise ValueError("Пакет превышает максимальный размер")
+
+    packet = bytearray(header_size + msg_len)
+    packet[:header_size] = header
+
+    # Клиент, приславший заголовок и замолчавший, иначе держал бы соединение вечно
+    body = memoryview(packet)[header_size:]
+    received = await asyncio.wait_for(conn.readinto(body), timeout=settings.TCP_IDLE_TIMEOUT)
+    if received < msg_len:
+        raise ValueError("Неверная длина блока сообщений")
+
+    return packet
+
+
+async def _serve(conn: ClientConnection, persistent: bool):
+    while True:
+        try:
+            data = await read_packet(conn)
+        except asyncio.TimeoutError:
+            break
+        except ValueError as e:
+            # После ошибки фрейминга граница следующего пакета неизвестна
+            conn.write(f"ERR {e}\n".encode())
+            await conn.drain()
+            break
+
+        if data is None:
+            break
+
+        conn.write(await _process(data))
+        await conn.drain()
+        if not persistent:
+            break
+
+
+async def handle_client(conn: ClientConnection):
+    addr = conn.get_extra_info("peername")
+    logged = _log_sampled()
+    if logged:
+        logger.info(f"Processing request from TCP client {addr}")
+    TCP_CONNECTIONS_TOTAL.inc()
+    TCP_CONNECTIONS.inc()
 
     try:
-        result = await adapter.process_packet(data)
-        response = f"OK {result['saved_messages']}\n".encode()
-    except Exception as e:
-        response = f"ERR {e}\n".encode()
-
-    writer.write(response)
-    await writer.drain()
-    writer.close()
-    await writer.wait_closed()
-    
-    logger.info(f"TCP client {addr} disconnected")
+        await _serve(conn, settings.TCP_PERSISTENT_CONNECTIONS)
+    except ConnectionError:
+        logger.warning(f"TCP client {addr} reset the connection")
+    finally:
+        await conn.close()
+        TCP_CONNECTIONS.dec()
+
+    if logged:
+        logger.info(f"TCP client {addr} disconnected")
 
 
-async def run_tcp_server(host: str, port: int, stop_event: asyncio.Event):
-    logger.info(f"Starting tcp server on host={host}, port={port}")
+async def run_tcp_server(host: str, port: int, stop_event: asyncio.Event, reuse_port: bool = False):
+    logger.info(f"Starting tcp server on host={host}, port={port}, reuse_port={reuse_port}")
     
-    server = await asyncio.start_server(handle_client, host, port)
+    # reuse_port: каждый воркер слушает порт своим сокетом, ядро само
+    # распределяет между ними входящие соединения
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(ClientConnection, host, port, reuse_port=reuse_port)
     async with server:
         await stop_event.wait()
         server.close()
@@ -7,8 +7,79 @@ class _Settings(BaseSettings):
     APP_TCP_PORT: int = 9999
     ENABLE_TCP_SERVER: bool = False
     
+    # Число процессов-воркеров при запуске через `python -m app.run`.
+    # TCP-порт воркеры делят через SO_REUSEPORT, HTTP - через общий сокет uvicorn
+    APP_WORKERS: int = 1
+    TCP_REUSE_PORT: bool = False
+    # Создавать схему при старте приложения. `app.run` создаёт её один раз
+    # в родительском процессе и выключает это в воркерах
+    DATABASE_INIT_ON_STARTUP: bool = True
+    # Постоянные соединения: пакеты режутся по msg_len из заголовка,
+    # ответ OK/ERR отправляется на каждый пакет в том же сокете
+    TCP_PERSISTENT_CONNECTIONS: bool = True
+    TCP_MAX_PACKET_SIZE: int = 14 + 0xFFFF
+    TCP_IDLE_TIMEOUT: float = 300.0
+    TCP_MAX_INFLIGHT_PACKETS: int = 256
+    # Предел тела POST /sensors/binary: больше пакет с 16-битной длиной быть не может.
+    # Тело читается потоком и отклоняется с 413, как только превысит предел
+    HTTP_MAX_BODY_SIZE: int = 14 + 0xFFFF
+    
     DATABASE_URL: str = ""
+    
+    # Где разбирать пакеты: inline - в цикле событий, thread - в пуле потоков,
+    # process - в пуле процессов. Пакеты короче PARSER_OFFLOAD_MIN_SIZE байт
+    # всегда разбираются inline. PARSER_WORKERS=0 - по числу ядер
+    PARSER_EXECUTOR: str = "inline"
+    PARSER_OFFLOAD_MIN_SIZE: int = 4096
+    PARSER_WORKERS: int = 0
+    
+    # Буфер отложенной записи: пакеты от разных устройств сбрасываются в БД
+    # одной пачкой, когда набралось INGEST_FLUSH_MAX_ROWS строк или прошло
+    # INGEST_FLUSH_INTERVAL секунд
+    INGEST_BUFFER_ENABLED: bool = True
+    INGEST_FLUSH_MAX_ROWS: int = 5000
+    INGEST_FLUSH_INTERVAL: float = 0.05
+    INGEST_USE_COPY: bool = True
+    # Сколько последних ключей (device_id, timestamp) помнить, чтобы отбрасывать
+    # повторно присланные пакеты до БД. 0 - только уникальный ключ в таблице
+    INGEST_DEDUP_WINDOW: int = 200_000
+    
+    # Секции sensor_messages создаются помесячно на столько месяцев вперёд
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_CHECK_INTERVAL: float = 3600.0
+    
+    # Почасовые и посуточные агрегаты треков (app/core/rollups.py). Изменённые
+    # приёмом часы пересчитываются раз в ROLLUP_REFRESH_INTERVAL секунд
+    ROLLUPS_ENABLED: bool = True
+    ROLLUP_REFRESH_INTERVAL: float = 5.0
+    
+    # Кэш ответов на запросы с закрытым диапазоном дат (app/core/response_cache.py).
+    # RESPONSE_CACHE_BACKEND: memory или "module:Class" внешнего хранилища
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 1024
+    RESPONSE_CACHE_TTL: float = 3600.0
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    
+    # Рассылка свежих координат (app/core/live.py): сколько устройств может
+    # ждать отправки у одного подписчика и как часто слать keep-alive, секунды
+    LIVE_QUEUE_SIZE: int = 1000
+    LIVE_KEEPALIVE: float = 15.0
+    
+    # Последние точки устройств (app/core/last_fixes.py): при APP_WORKERS > 1
+    # копия в памяти раз в столько секунд дочитывает записи других воркеров
+    LAST_FIX_REFRESH_INTERVAL: float = 5.0
+    
+    # Журнал на каждый пакет и соединение пишется только для каждого
+    # LOG_SAMPLE_EVERY-го (1 - для всех, 0 - никогда); ошибки пишутся всегда
+    LOG_SAMPLE_EVERY: int = 100
+    
+    # Постраничная выдача и потоковая выгрузка координат
+    PAGE_SIZE_DEFAULT: int = 1000
+    PAGE_SIZE_MAX: int = 10000
+    STREAM_CHUNK_ROWS: int = 5000
+    # Сколько устройств можно запросить одним пакетным запросом /sensors/batch/*
+    BATCH_MAX_DEVICES: int = 500
 
     model_config = SettingsConfigDict(env_file=".env", extra='allow')
 
-settings = _Settings()
\ No newline at end of file
+settings = _Settings()
@@ -0,0 +1,321 @@
+import math
+import time
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from sqlalchemy import Float, String, and_, any_, bindparam, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.settings import settings
+from app.core.models import SensorMessage, SensorRollup
+from app.core.schemas import TrackStatsResponse
+
+EARTH_RADIUS_KM = 6371
+# Порог освещённости, выше которого точка считается дневной
+LIGHT_THRESHOLD = 0.8
+# Отрезок быстрее этого считается движением, медленнее - стоянкой
+MOVING_SPEED_KMH = 1.0
+
+HOUR = 3600
+DAY = 24 * HOUR
+# timestamp в пакете - беззнаковое 32-битное число
+MAX_TIMESTAMP = 2 ** 32
+
+Range = Tuple[int, int]
+
+
+def device_condition(column, device_ids: Union[str, Sequence[str]]):
+    """
+    column = ANY(:массив): один параметр на любое число устройств, так что
+    текст запроса и его план не зависят от длины списка.
+    """
+    if isinstance(device_ids, str):
+        return column == device_ids
+    return column == any_(bindparam(None, list(device_ids), type_=ARRAY(String)))
+
+
+def haversine_sql(lat1, lon1, lat2, lon2):
+    """Формула гаверсинусов в виде SQL-выражения, результат в км."""
+    a = (
+        func.power(func.sin(func.radians(lat2 - lat1) / 2), 2)
+        + func.cos(func.radians(lat1)) * func.cos(func.radians(lat2))
+        * func.power(func.sin(func.radians(lon2 - lon1) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(literal(1.0), a)))
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """То же, что haversine_sql, для склейки агрегатов на стороне Python."""
+    a = (
+        math.sin(math.radians(lat2 - lat1) / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2))
+        * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+@dataclass
+class TrackChunk:
+    """
+    Сводка по непрерывному куску трека. Два соседних куска склеиваются
+    отрезком между последней точкой первого и первой точкой второго.
+    """
+    point_count: int
+    distance_km: float
+    moving_s: int
+    first_ts: int
+    first_lat: float
+    first_lon: float
+    last_ts: int
+    last_lat: float
+    last_lon: float
+    min_lat: float
+    max_lat: float
+    min_lon: float
+    max_lon: float
+
+
+CHUNK_FIELDS = tuple(f.name for f in fields(TrackChunk))
+
+
+def chunk_from_row(row) -> TrackChunk:
+    mapping = row._mapping
+    return TrackChunk(**{name: mapping[name] for name in CHUNK_FIELDS})
+
+
+def compose_chunks(chunks: Iterable[TrackChunk]) -> Optional[TrackChunk]:
+    """Склеивает непересекающиеся куски трека в один."""
+    total = None
+    for chunk in sorted(chunks, key=lambda c: c.first_ts):
+        if total is None:
+            total = replace(chunk)
+            continue
+
+        bridge_km = haversine(total.last_lat, total.last_lon, chunk.first_lat, chunk.first_lon)
+        bridge_s = chunk.first_ts - total.last_ts
+
+        total.point_count += chunk.point_count
+        total.distance_km += bridge_km + chunk.distance_km
+        total.moving_s += chunk.moving_s
+        if bridge_s > 0 and bridge_km * HOUR > MOVING_SPEED_KMH * bridge_s:
+            total.moving_s += bridge_s
+        total.last_ts, total.last_lat, total.last_lon = chunk.last_ts, chunk.last_lat, chunk.last_lon
+        total.min_lat = min(total.min_lat, chunk.min_lat)
+        total.max_lat = max(total.max_lat, chunk.max_lat)
+        total.min_lon = min(total.min_lon, chunk.min_lon)
+        total.max_lon = max(total.max_lon, chunk.max_lon)
+
+    return total
+
+
+def track_chunks_stmt(
+    device_ids: Union[str, Sequence[str]],
+    ts_from: int,
+    ts_to: int,
+    daylight: bool = False,
+    bucket_s: Optional[int] = None,
+):
+    """
+    Куски трека по сырым точкам из [ts_from, ts_to): по одному на устройство
+    или, если задан bucket_s, на каждый интервал bucket_s секунд.
+    Соседние точки связываются оконной функцией lag за один проход в БД.
+    """
+    bucket = (
+        (SensorMessage.timestamp // bucket_s) * bucket_s if bucket_s else literal(0)
+    ).label("bucket_start")
+    points = select(
+        SensorMessage.device_id,
+        SensorMessage.timestamp,
+        SensorMessage.latitude,
+        SensorMessage.longitude,
+        bucket,
+    ).where(
+        device_condition(SensorMessage.device_id, device_ids),
+        SensorMessage.timestamp >= ts_from,
+        SensorMessage.timestamp < ts_to,
+    )
+    if daylight:
+        points = points.where(SensorMessage.light > LIGHT_THRESHOLD)
+    points = points.subquery()
+
+    window = {
+        "partition_by": (points.c.device_id, points.c.bucket_start),
+        "order_by": points.c.timestamp,
+    }
+    seg = select(
+        points,
+        func.lag(points.c.latitude).over(**window).label("prev_lat"),
+        func.lag(points.c.longitude).over(**window).label("prev_lon"),
+        func.lag(points.c.timestamp).over(**window).label("prev_ts"),
+    ).subquery()
+
+    seg_km = haversine_sql(seg.c.prev_lat, seg.c.prev_lon, seg.c.latitude, seg.c.longitude)
+    seg_s = seg.c.timestamp - seg.c.prev_ts
+
+    def first(column, order):
+        return func.array_agg(aggregate_order_by(column, order), type_=ARRAY(Float))[1]
+
+    return select(
+        seg.c.device_id,
+        seg.c.bucket_start,
+        func.count().label("point_count"),
+        func.coalesce(func.sum(seg_km).filter(seg.c.prev_ts.isnot(None)), 0.0).label("distance_km"),
+        func.coalesce(func.sum(seg_s).filter(and_(
+            seg.c.prev_ts.isnot(None), seg_s > 0, seg_km * HOUR > MOVING_SPEED_KMH * seg_s,
+        )), 0).label("moving_s"),
+        func.min(seg.c.timestamp).label("first_ts"),
+        first(seg.c.latitude, seg.c.timestamp).label("first_lat"),
+        first(seg.c.longitude, seg.c.timestamp).label("first_lon"),
+        func.max(seg.c.timestamp).label("last_ts"),
+        first(seg.c.latitude, seg.c.timestamp.desc()).label("last_lat"),
+        first(seg.c.longitude, seg.c.timestamp.desc()).label("last_lon"),
+        func.min(seg.c.latitude).label("min_lat"),
+        func.max(seg.c.latitude).label("max_lat"),
+        func.min(seg.c.longitude).label("min_lon"),
+        func.max(seg.c.longitude).label("max_lon"),
+    ).group_by(seg.c.device_id, seg.c.bucket_start)
+
+
+def ceil_to(ts: int, step: int) -> int:
+    return -(-ts // step) * step
+
+
+def split_range(ts_from: int, ts_to: int, cutoff: int) -> Tuple[Optional[Range], List[Range], List[Range]]:
+    """
+    Делит [ts_from, ts_to) на целые сутки, целые часы по краям суток и
+    сырые края короче часа. Агрегатами закрывается только время до cutoff:
+    позже агрегаты могут ещё не успеть пересчитаться.
+    """
+    covered_to = min(ts_to, cutoff)
+    h0, h1 = ceil_to(ts_from, HOUR), covered_to // HOUR * HOUR
+    if h0 >= h1:
+        return None, [], [(ts_from, ts_to)]
+
+    d0, d1 = ceil_to(h0, DAY), h1 // DAY * DAY
+    if d0 < d1:
+        days, hours = (d0, d1), [(h0, d0), (d1, h1)]
+    else:
+        days, hours = None, [(h0, h1)]
+
+    hours = [(lo, hi) for lo, hi in hours if lo < hi]
+    raw = [(lo, hi) for lo, hi in ((ts_from, h0), (h1, ts_to)) if lo < hi]
+    return days, hours, raw
+
+
+class RollupState:
+    """
+    Можно ли читать агрегаты: отметку о заполнении по накопленным данным
+    загружает и обновляет app/core/rollups.py. До неё в sensor_rollups нет
+    часов, записанных до включения агрегатов или перенесённых миграцией.
+    """
+
+    def __init__(self):
+        self.ready = False
+
+
+rollup_state = RollupState()
+
+
+def rollup_cutoff(now: Optional[float] = None) -> int:
+    """Начало часа, до которого агрегаты заведомо пересчитаны."""
+    settled = (time.time() if now is None else now) - 2 * settings.ROLLUP_REFRESH_INTERVAL
+    return int(settled) // HOUR * HOUR
+
+
+async def _rollup_chunks(
+    db: AsyncSession,
+    device_ids: Sequence[str],
+    daylight: bool,
+    days: Optional[Range],
+    hours: List[Range],
+) -> List[Tuple[str, TrackChunk]]:
+    buckets = [
+        and_(SensorRollup.bucket_s == HOUR, SensorRollup.bucket_start >= lo, SensorRollup.bucket_start < hi)
+        for lo, hi in hours
+    ]
+    if days is not None:
+        buckets.append(and_(
+            SensorRollup.bucket_s == DAY,
+            SensorRollup.bucket_start >= days[0],
+            SensorRollup.bucket_start < days[1],
+        ))
+
+    stmt = select(SensorRollup).where(
+        device_condition(SensorRollup.device_id, device_ids),
+        SensorRollup.daylight == daylight,
+        or_(*buckets),
+    )
+    rollups = (await db.execute(stmt)).scalars().all()
+    return [
+        (r.device_id, TrackChunk(**{name: getattr(r, name) for name in CHUNK_FIELDS}))
+        for r in rollups
+    ]
+
+
+async def get_tracks_stats(
+    db: AsyncSession,
+    device_ids: Sequence[str],
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    times_of_day: bool = False,
+) -> Dict[str, TrackStatsResponse]:
+    """
+    Считает длину трека, длительность и скорость каждого устройства. Целые
+    часы и сутки берутся из агрегатов sensor_rollups, по сырым точкам
+    считаются только края диапазона, так что запрос за год стоит O(дней),
+    а не O(точек). Пока агрегаты не заполнены по накопленным данным,
+    всё считается по сырым точкам. Число запросов к БД не зависит от
+    числа устройств.
+    """
+    ts_from = int(date_from.timestamp()) if date_from is not None else 0
+    ts_to = int(date_to.timestamp()) + 1 if date_to is not None else MAX_TIMESTAMP
+
+    chunks: Dict[str, List[TrackChunk]] = defaultdict(list)
+    raw = [(ts_from, ts_to)]
+    if settings.ROLLUPS_ENABLED and rollup_state.ready:
+        days, hours, raw = split_range(ts_from, ts_to, rollup_cutoff())
+        if days is not None or hours:
+            for device_id, chunk in await _rollup_chunks(db, device_ids, times_of_day, days, hours):
+                chunks[device_id].append(chunk)
+
+    for lo, hi in raw:
+        rows = (await db.execute(track_chunks_stmt(device_ids, lo, hi, times_of_day))).all()
+        for r in rows:
+            chunks[r.device_id].append(chunk_from_row(r))
+
+    stats = {}
+    for device_id in device_ids:
+        total = compose_chunks(chunks.get(device_id, ()))
+        if total is None:
+            stats[device_id] = make_track_stats(0, 0.0, 0)
+        else:
+            stats[device_id] = make_track_stats(
+                total.point_count, total.distance_km, total.last_ts - total.first_ts, total.moving_s
+            )
+    return stats
+
+
+async def get_track_stats(
+    db: AsyncSession,
+    internal_id: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    times_of_day: bool = False,
+) -> TrackStatsResponse:
+    """То же, что get_tracks_stats, для одного устройства."""
+    stats = await get_tracks_stats(db, [internal_id], date_from, date_to, times_of_day)
+    return stats[internal_id]
+
+
+def make_track_stats(
+    point_count: int, distance_km: float, duration_s: int, moving_s: int = 0
+) -> TrackStatsResponse:
+    return TrackStatsResponse(
+        point_count=point_count,
+        distance_km=distance_km,
+        duration_s=duration_s,
+        avg_speed_kmh=(distance_km / (duration_s / 3600) if duration_s else 0.0),
+        avg_segment_km=(distance_km / (point_count - 1) if point_count > 1 else 0.0),
+        moving_s=moving_s,
+    )
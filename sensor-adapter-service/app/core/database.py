@@ -8,8 +8,11 @@ SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 Base = declarative_base()
 
 async def start_database():
+    from app.core.partitions import ensure_future_partitions
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_future_partitions(conn)
 
 async def get_db():
     async with SessionLocal() as session:
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from typing import Hashable, Iterable, List
+
+
+class RecentKeys:
+    """
+    LRU-окно недавно принятых ключей (device_id, timestamp).
+
+    После обрыва связи устройства повторно шлют неподтверждённые пакеты -
+    такие записи отбрасываются ещё до БД. Окно конечное и своё в каждом
+    процессе, а повтор, пришедший пока исходная пачка ещё пишется, в окне
+    не найдётся, поэтому окончательно дубли отсекает уникальный ключ в
+    таблице: вставка повтора ждёт исхода транзакции исходной пачки.
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._keys: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def unseen(self, keys: Iterable[Hashable]) -> List[Hashable]:
+        """
+        Ключи, которых нет в окне, без повторов и в исходном порядке.
+        Окно при этом не пополняется: ключ попадает в него только после
+        успешной записи (add), иначе повтор пакета, пришедший во время
+        неудавшейся записи, был бы подтверждён без сохранения строк.
+        """
+        unseen = []
+        for key in dict.fromkeys(keys):
+            if key in self._keys:
+                self._keys.move_to_end(key)
+            else:
+                unseen.append(key)
+        return unseen
+
+    def add(self, keys: Iterable[Hashable]) -> None:
+        """Запоминает ключи, уже записанные в БД."""
+        for key in keys:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+
+        while len(self._keys) > self._maxsize:
+            self._keys.popitem(last=False)
@@ -0,0 +1,91 @@
+"""
+Компактные форматы ответа с координатами: Arrow IPC, Parquet и msgpack.
+Данные передаются колонками (latitude, longitude, timestamp, light),
+timestamp - секунды UTC. Библиотеки необязательны: если какой-то нет,
+соответствующий формат просто не предлагается при согласовании.
+"""
+import io
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+COLUMNS = ("latitude", "longitude", "timestamp", "light")
+
+
+def available_media_types() -> List[str]:
+    types = []
+    if pa is not None:
+        types += [ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE]
+    if msgpack is not None:
+        types.append(MSGPACK_MEDIA_TYPE)
+    return types
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Выбирает компактный формат по заголовку Accept с учётом q-весов.
+    None означает обычный JSON.
+    """
+    if not accept:
+        return None
+
+    supported = available_media_types()
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in supported and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def rows_to_columns(rows: Sequence) -> Dict[str, list]:
+    return {name: [getattr(r, name) for r in rows] for name in COLUMNS}
+
+
+def _arrow_table(columns: Dict[str, list]):
+    return pa.table({
+        "latitude": pa.array(columns["latitude"], type=pa.float64()),
+        "longitude": pa.array(columns["longitude"], type=pa.float64()),
+        "timestamp": pa.array(columns["timestamp"], type=pa.int64()),
+        "light": pa.array(columns["light"], type=pa.float32()),
+    })
+
+
+def encode_columns(columns: Dict[str, list], media_type: str) -> bytes:
+    if media_type == ARROW_MEDIA_TYPE:
+        table = _arrow_table(columns)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if media_type == PARQUET_MEDIA_TYPE:
+        sink = io.BytesIO()
+        pq.write_table(_arrow_table(columns), sink)
+        return sink.getvalue()
+
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(columns, use_single_float=False)
+
+    raise ValueError(f"Unsupported media type {media_type}")
@@ -0,0 +1,146 @@
+"""
+Пространственные запросы по точкам sensor_messages через geohash.
+
+У каждой записи хранится geohash из GEOHASH_PRECISION символов в колонке
+с побайтовой сортировкой (COLLATE "C"): точки из одной ячейки geohash
+лежат в B-tree индексе подряд, и ячейка выбирается диапазоном по префиксу.
+Область запроса покрывается небольшим числом ячеек, найденные в них точки
+затем точно фильтруются по прямоугольнику, радиусу или многоугольнику.
+"""
+import math
+from typing import List, Sequence, Tuple
+import numpy as np
+from sqlalchemy import and_, or_
+
+GEOHASH_PRECISION = 12
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Самый большой символ BASE32 - "z", поэтому "~" закрывает любой префикс сверху
+_PREFIX_END = "~"
+_BASE32_BYTES = np.frombuffer(BASE32.encode(), dtype=np.uint8)
+
+KM_PER_DEGREE = 111.32
+# Больше ячеек - точнее покрытие, но длиннее условие в запросе
+MAX_COVER_CELLS = 32
+
+BBox = Tuple[float, float, float, float]
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Раздвигает младшие 32 бита: бит i попадает в позицию 2i."""
+    v = v & np.uint64(0xFFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def geohash_encode(lat, lon, precision: int = GEOHASH_PRECISION) -> np.ndarray:
+    """
+    Векторное кодирование массивов координат в geohash (массив строк).
+    Для NaN, бесконечностей и координат вне диапазона - None (NULL в БД):
+    такие точки не попадают ни в одну ячейку.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    valid = (np.abs(lat) <= 90.0) & (np.abs(lon) <= 180.0)
+    if not valid.all():
+        lat, lon = np.where(valid, lat, 0.0), np.where(valid, lon, 0.0)
+
+    # 60 бит на 12 символов: по 30 бит на долготу и широту
+    scale = float(1 << 30)
+    lat_q = np.clip((lat + 90.0) / 180.0 * scale, 0, scale - 1).astype(np.uint64)
+    lon_q = np.clip((lon + 180.0) / 360.0 * scale, 0, scale - 1).astype(np.uint64)
+    bits = (_spread_bits(lon_q) << np.uint64(1)) | _spread_bits(lat_q)
+
+    chars = np.empty((lat.size, precision), dtype=np.uint8)
+    for i in range(precision):
+        shift = np.uint64(55 - 5 * i)
+        chars[:, i] = _BASE32_BYTES[((bits >> shift) & np.uint64(31)).astype(np.intp)]
+    hashes = chars.view(f"S{precision}").ravel().astype(str)
+    if not valid.all():
+        hashes = hashes.astype(object)
+        hashes[~valid.ravel()] = None
+    return hashes
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Размер ячейки geohash в градусах: (по широте, по долготе)."""
+    bits = 5 * precision
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << (bits - bits // 2))
+
+
+def _cell_index(value: float, origin: float, size: float, count: int) -> int:
+    """Номер ячейки сетки; край диапазона (90 или 180) относится к последней."""
+    return min(math.floor((value + origin) / size), count - 1)
+
+
+def cover_bbox(bbox: BBox, max_cells: int = MAX_COVER_CELLS) -> List[str]:
+    """
+    Префиксы geohash наибольшей точности, которые покрывают прямоугольник
+    (min_lat, min_lon, max_lat, max_lon) не более чем max_cells ячейками.
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        d_lat, d_lon = cell_size(precision)
+        n_lat, n_lon = round(180.0 / d_lat), round(360.0 / d_lon)
+        row0 = _cell_index(min_lat, 90.0, d_lat, n_lat)
+        col0 = _cell_index(min_lon, 180.0, d_lon, n_lon)
+        rows = _cell_index(max_lat, 90.0, d_lat, n_lat) - row0 + 1
+        cols = _cell_index(max_lon, 180.0, d_lon, n_lon) - col0 + 1
+        if rows * cols <= max_cells:
+            break
+
+    lats = np.repeat((row0 + 0.5 + np.arange(rows)) * d_lat - 90.0, cols)
+    lons = np.tile((col0 + 0.5 + np.arange(cols)) * d_lon - 180.0, rows)
+    return sorted(set(geohash_encode(lats, lons, precision).tolist()))
+
+
+def radius_bboxes(lat: float, lon: float, radius_km: float) -> List[BBox]:
+    """
+    Прямоугольники, описанные вокруг круга радиуса radius_km. Круг через
+    антимеридиан покрывается двумя прямоугольниками - по обе стороны от него,
+    круг через полюс - полосой по всем долготам.
+    """
+    d_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+    cos_lat = math.cos(math.radians(lat))
+    if min_lat == -90.0 or max_lat == 90.0 or radius_km >= KM_PER_DEGREE * cos_lat * 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+
+    d_lon = radius_km / (KM_PER_DEGREE * cos_lat)
+    west, east = lon - d_lon, lon + d_lon
+    if west < -180.0:
+        return [(min_lat, west + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, east)]
+    if east > 180.0:
+        return [(min_lat, west, max_lat, 180.0), (min_lat, -180.0, max_lat, east - 360.0)]
+    return [(min_lat, west, max_lat, east)]
+
+
+def polygon_bbox(polygon: Sequence[Tuple[float, float]]) -> BBox:
+    lats = [p[0] for p in polygon]
+    lons = [p[1] for p in polygon]
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def points_in_polygon(lat: np.ndarray, lon: np.ndarray, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Маска точек внутри многоугольника (метод лучей, векторно по точкам)."""
+    inside = np.zeros(len(lat), dtype=bool)
+    vertices = list(polygon)
+    for (y1, x1), (y2, x2) in zip(vertices, vertices[1:] + vertices[:1]):
+        crosses = (y1 > lat) != (y2 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lon < x_at)
+    return inside
+
+
+def geohash_condition(column, prefixes: List[str]):
+    """Условие "geohash начинается с одного из префиксов" в виде диапазонов индекса."""
+    return or_(*(and_(column >= p, column < p + _PREFIX_END) for p in prefixes))
+
+
+def bbox_condition(lat_column, lon_column, bbox: BBox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return and_(lat_column.between(min_lat, max_lat), lon_column.between(min_lon, max_lon))
@@ -0,0 +1,123 @@
+import asyncio
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+logger = getLogger(__name__)
+
+WriteRows = Callable[[List[Dict[str, Any]]], Awaitable[Any]]
+RowKey = Callable[[Dict[str, Any]], Hashable]
+
+
+class IngestBuffer:
+    """
+    Буфер отложенной записи: копит строки от многих пакетов и сбрасывает
+    их в БД одной пачкой по порогу размера или времени.
+
+    Вызывающий ждёт завершения того сброса, в который попали его строки,
+    поэтому подтверждение пакета по-прежнему означает, что данные в БД.
+    submit возвращает то, что вернула write_rows для всей пачки.
+
+    С key строка с ключом, который уже ждёт в пачке, в неё не добавляется:
+    строка принадлежит первому, кто её прислал. write_rows тогда возвращает
+    множество ключей записанных строк, а submit - только ключи своих строк.
+    """
+
+    def __init__(self, write_rows: WriteRows, max_rows: int, flush_interval: float, key: Optional[RowKey] = None):
+        self._write_rows = write_rows
+        self._max_rows = max_rows
+        self._flush_interval = flush_interval
+        self._key = key
+
+        self._rows: List[Dict[str, Any]] = []
+        self._keys: Set[Hashable] = set()
+        self._batch: Optional[asyncio.Future] = None
+        self._has_rows: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._has_rows = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дожидается сброса всех накопленных строк и останавливает буфер."""
+        if self._task is None:
+            return
+
+        self._stopping = True
+        self._has_rows.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, rows: List[Dict[str, Any]]) -> Any:
+        if not rows:
+            return None
+
+        if self._task is None or self._stopping:
+            return await self._write_rows(rows)
+
+        if self._batch is None:
+            self._batch = asyncio.get_running_loop().create_future()
+        batch = self._batch
+
+        if self._key is None:
+            self._rows.extend(rows)
+        else:
+            own = {}
+            for row in rows:
+                key = self._key(row)
+                if key not in self._keys and key not in own:
+                    own[key] = row
+            self._keys.update(own)
+            self._rows.extend(own.values())
+        self._has_rows.set()
+        if len(self._rows) >= self._max_rows:
+            self._full.set()
+
+        result = await asyncio.shield(batch)
+        if self._key is None:
+            return result
+        return {key for key in own if key in result}
+
+    # ------------------------------------------------------------------ #
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_rows.wait()
+
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self._flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            await self._flush()
+
+            if self._stopping and not self._rows:
+                break
+
+    async def _flush(self) -> None:
+        rows, batch = self._rows, self._batch
+        self._rows, self._batch = [], None
+        self._keys = set()
+        self._has_rows.clear()
+        self._full.clear()
+
+        if not rows:
+            return
+
+        try:
+            result = await self._write_rows(rows)
+        except Exception as exc:
+            logger.error(f"Failed to flush {len(rows)} buffered rows: {exc}")
+            batch.set_exception(exc)
+        else:
+            batch.set_result(result)
@@ -0,0 +1,140 @@
+"""
+Последние точки устройств: таблица sensor_last_fixes и её копия в памяти.
+
+Запись пачки в sensor_messages тут же обновляет строки устройств, для
+которых в пачке есть точка новее сохранённой. Копия в памяти отвечает на
+GET /sensors/last без запроса к БД и отсеивает обновления старыми точками
+(например, при дозагрузке истории) ещё до БД. При APP_WORKERS > 1 в таблицу
+пишут и другие воркеры, поэтому копия раз в LAST_FIX_REFRESH_INTERVAL секунд
+дочитывается из таблицы. Заполнение по уже накопленным данным:
+
+    python -m app.core.last_fixes
+"""
+import argparse
+import asyncio
+from logging import getLogger
+from typing import Dict, Iterable, List, Mapping, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.config.settings import settings
+from app.core.database import engine
+from app.core.live import LiveFix, make_fix
+from app.core.logs import init_logging
+from app.core.models import SensorLastFix, SensorMessage
+
+logger = getLogger(__name__)
+
+_FIELDS = ("timestamp", "latitude", "longitude", "light")
+
+
+class LastFixes:
+    """Последняя известная точка каждого устройства с готовым JSON для ответа."""
+
+    def __init__(self):
+        self._fixes: Dict[str, LiveFix] = {}
+
+    def __len__(self) -> int:
+        return len(self._fixes)
+
+    def _is_newer(self, device_id: str, timestamp: int) -> bool:
+        current = self._fixes.get(device_id)
+        return current is None or current.timestamp < timestamp
+
+    def newer(self, rows: Iterable[Mapping]) -> List[Dict]:
+        """Самая поздняя строка каждого устройства, если она новее известной."""
+        latest: Dict[str, Mapping] = {}
+        for row in rows:
+            current = latest.get(row["device_id"])
+            if current is None or current["timestamp"] < row["timestamp"]:
+                latest[row["device_id"]] = row
+        return [
+            {"device_id": device_id, **{name: row[name] for name in _FIELDS}}
+            for device_id, row in latest.items()
+            if self._is_newer(device_id, row["timestamp"])
+        ]
+
+    def update(self, rows: Iterable[Mapping]) -> None:
+        for row in rows:
+            if self._is_newer(row["device_id"], row["timestamp"]):
+                self._fixes[row["device_id"]] = make_fix(
+                    row["device_id"], row["timestamp"], row["latitude"], row["longitude"], row["light"]
+                )
+
+    def get(self, device_ids: Optional[Iterable[str]] = None) -> List[LiveFix]:
+        """Точки устройств device_ids (None - всех); неизвестные устройства пропускаются."""
+        if device_ids is None:
+            return list(self._fixes.values())
+        found = (self._fixes.get(device_id) for device_id in dict.fromkeys(device_ids))
+        return [fix for fix in found if fix is not None]
+
+
+last_fixes = LastFixes()
+
+
+def _if_newer(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=["device_id"],
+        set_={name: stmt.excluded[name] for name in _FIELDS},
+        where=SensorLastFix.timestamp < stmt.excluded.timestamp,
+    )
+
+
+async def upsert_last_fixes(conn: AsyncConnection, rows: List[Dict]) -> None:
+    """Обновляет строки устройств, только если точка новее сохранённой."""
+    if not rows:
+        return
+
+    stmt = _if_newer(pg_insert(SensorLastFix))
+    # Один порядок блокировок строк у всех воркеров, иначе пачки с общими
+    # устройствами могут взаимно заблокироваться
+    await conn.execute(stmt, sorted(rows, key=lambda r: r["device_id"]))
+
+
+async def load_last_fixes(engine) -> int:
+    """Дочитывает копию в памяти из таблицы, возвращает число устройств."""
+    async with engine.connect() as conn:
+        rows = (await conn.execute(select(SensorLastFix))).mappings().all()
+    last_fixes.update(rows)
+    return len(rows)
+
+
+async def run_last_fix_refresh(engine, stop_event: asyncio.Event) -> None:
+    """Периодически подтягивает точки, записанные другими воркерами."""
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), settings.LAST_FIX_REFRESH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            await load_last_fixes(engine)
+        except Exception as exc:
+            logger.error(f"Last fix refresh failed: {exc}")
+
+
+async def backfill() -> None:
+    latest = (
+        select(SensorMessage.device_id, *(getattr(SensorMessage, name) for name in _FIELDS))
+        .distinct(SensorMessage.device_id)
+        .order_by(SensorMessage.device_id, SensorMessage.timestamp.desc())
+    )
+    stmt = _if_newer(pg_insert(SensorLastFix).from_select(["device_id", *_FIELDS], latest))
+    async with engine.begin() as conn:
+        await conn.run_sync(SensorLastFix.__table__.create, checkfirst=True)
+        result = await conn.execute(stmt)
+    logger.info(f"Updated last fixes of {result.rowcount} devices")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args()
+
+    init_logging()
+    asyncio.run(backfill())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Рассылка свежих координат подписчикам (WebSocket и SSE) по мере приёма.
+
+Приём публикует в live_hub последнюю точку каждого пакета, хаб раздаёт её
+подписчикам на устройства и/или прямоугольник. У подписчика хранится одна
+неотправленная точка на устройство: новая заменяет старую, поэтому
+медленный клиент получает последнее положение, а не очередь устаревших.
+Устройств в ожидании не больше LIVE_QUEUE_SIZE, при переполнении
+вытесняется то, что обновлялось давнее всех.
+
+Хаб свой у каждого процесса. При APP_WORKERS > 1 точки расходятся по
+воркерам через PostgreSQL: транзакция записи пачки отправляет NOTIFY в
+канал LIVE_CHANNEL (уходит только после коммита), а каждый воркер слушает
+канал и раздаёт полученные точки своим подписчикам.
+"""
+import asyncio
+import json
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set
+from prometheus_client import Counter, Gauge
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.config.settings import settings
+from app.core.geo import BBox
+from app.core.schemas import LivePosition
+
+logger = getLogger(__name__)
+
+LIVE_CHANNEL = "sensor_live"
+# Как часто слушатель канала проверяет, не оборвалось ли соединение, секунды
+_LISTEN_CHECK_INTERVAL = 5.0
+
+LIVE_SUBSCRIBERS = Gauge(
+    "adapter_live_subscribers", "Open live position subscriptions", multiprocess_mode="livesum"
+)
+LIVE_PUBLISHED = Counter("adapter_live_published_total", "Positions published to the live hub")
+LIVE_DROPPED = Counter("adapter_live_dropped_total", "Pending positions evicted from full subscriber queues")
+
+
+@dataclass
+class LiveFix:
+    device_id: str
+    timestamp: int
+    latitude: float
+    longitude: float
+    # JSON готовится один раз при публикации, а не для каждого подписчика
+    payload: str
+
+
+def make_fix(device_id: str, timestamp: int, latitude: float, longitude: float, light: Optional[float]) -> LiveFix:
+    position = LivePosition(
+        device_id=device_id,
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=datetime.fromtimestamp(timestamp, timezone.utc),
+        light=light,
+    )
+    return LiveFix(device_id, timestamp, latitude, longitude, position.model_dump_json())
+
+
+class Subscription:
+    def __init__(self, device_ids: Optional[FrozenSet[str]], bbox: Optional[BBox], maxsize: int):
+        self.device_ids = device_ids
+        self.bbox = bbox
+        self._maxsize = maxsize
+        self._pending: "OrderedDict[str, LiveFix]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def matches(self, fix: LiveFix) -> bool:
+        if self.device_ids is not None and fix.device_id not in self.device_ids:
+            return False
+        if self.bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = self.bbox
+            return min_lat <= fix.latitude <= max_lat and min_lon <= fix.longitude <= max_lon
+        return True
+
+    def offer(self, fix: LiveFix) -> None:
+        current = self._pending.get(fix.device_id)
+        if current is not None:
+            # Пакеты одного устройства могут обработаться не по порядку
+            if current.timestamp >= fix.timestamp:
+                return
+            self._pending.move_to_end(fix.device_id)
+        elif len(self._pending) >= self._maxsize:
+            self._pending.popitem(last=False)
+            LIVE_DROPPED.inc()
+        self._pending[fix.device_id] = fix
+        self._ready.set()
+
+    async def get(self) -> List[LiveFix]:
+        """Ждёт и забирает все накопившиеся точки, по одной на устройство."""
+        await self._ready.wait()
+        self._ready.clear()
+        fixes = list(self._pending.values())
+        self._pending.clear()
+        return fixes
+
+
+class LiveHub:
+    """
+    fanout - точки публикуются не напрямую, а через NOTIFY (notify_fixes)
+    и приходят в хаб из run_live_listener, в том числе от других воркеров.
+    """
+
+    def __init__(self, maxsize: int, fanout: bool = False):
+        self._maxsize = maxsize
+        self.fanout = fanout
+        # Подписки на конкретные устройства ищутся по device_id, остальные
+        # (только прямоугольник или весь поток) проверяются на каждой точке
+        self._by_device: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._by_area: Set[Subscription] = set()
+
+    def subscribe(self, device_ids: Optional[FrozenSet[str]] = None, bbox: Optional[BBox] = None) -> Subscription:
+        subscription = Subscription(device_ids, bbox, self._maxsize)
+        if device_ids:
+            for device_id in device_ids:
+                self._by_device[device_id].add(subscription)
+        else:
+            self._by_area.add(subscription)
+        LIVE_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription.device_ids:
+            for device_id in subscription.device_ids:
+                subscribers = self._by_device.get(device_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_device[device_id]
+        else:
+            self._by_area.discard(subscription)
+        LIVE_SUBSCRIBERS.dec()
+
+    def has_subscribers(self, device_id: str) -> bool:
+        return bool(self._by_area) or device_id in self._by_device
+
+    def publish(self, fix: LiveFix) -> None:
+        LIVE_PUBLISHED.inc()
+        for subscription in self._by_device.get(fix.device_id, ()):
+            if subscription.matches(fix):
+                subscription.offer(fix)
+        for subscription in self._by_area:
+            if subscription.matches(fix):
+                subscription.offer(fix)
+
+
+live_hub = LiveHub(settings.LIVE_QUEUE_SIZE, fanout=settings.APP_WORKERS > 1)
+
+
+async def notify_fixes(conn: AsyncConnection, rows: List[Mapping]) -> None:
+    """Отправляет точки в LIVE_CHANNEL в транзакции conn."""
+    if not rows:
+        return
+
+    await conn.execute(text("SELECT pg_notify(:channel, :payload)"), [
+        {
+            "channel": LIVE_CHANNEL,
+            "payload": json.dumps([r["device_id"], r["timestamp"], r["latitude"], r["longitude"], r["light"]]),
+        }
+        for r in rows
+    ])
+
+
+def _deliver(connection, pid, channel, payload: str) -> None:
+    live_hub.publish(make_fix(*json.loads(payload)))
+
+
+async def run_live_listener(engine, stop_event: asyncio.Event) -> None:
+    """
+    Держит соединение с LISTEN на LIVE_CHANNEL и раздаёт точки подписчикам
+    этого воркера; при обрыве соединения подключается заново.
+    """
+    while not stop_event.is_set():
+        try:
+            async with engine.connect() as conn:
+                driver = (await conn.get_raw_connection()).driver_connection
+                await driver.add_listener(LIVE_CHANNEL, _deliver)
+                try:
+                    while not stop_event.is_set() and not driver.is_closed():
+                        try:
+                            await asyncio.wait_for(stop_event.wait(), _LISTEN_CHECK_INTERVAL)
+                        except asyncio.TimeoutError:
+                            pass
+                finally:
+                    if not driver.is_closed():
+                        await driver.remove_listener(LIVE_CHANNEL, _deliver)
+            if not stop_event.is_set():
+                logger.error("Live listener connection closed, reconnecting")
+        except Exception as exc:
+            logger.error(f"Live listener failed: {exc}")
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), _LISTEN_CHECK_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
@@ -1,3 +1,4 @@
+import itertools
 import logging
 from app.config.settings import settings
 
@@ -9,4 +10,17 @@ def init_logging() -> None:
     logging.basicConfig(
         level=logging.INFO,
         handlers=[stream_handler, ]
-    )
\ No newline at end of file
+    )
+
+class LogSampler:
+    """
+    Пропускает каждое every-е событие: журнал на каждый пакет сам стоит
+    заметного времени под нагрузкой. every=1 - всё, 0 - ничего.
+    """
+
+    def __init__(self, every: int):
+        self._every = every
+        self._counter = itertools.count()
+
+    def __call__(self) -> bool:
+        return self._every > 0 and next(self._counter) % self._every == 0
@@ -0,0 +1,36 @@
+"""
+Метрики в формате Prometheus (prometheus_client), отдаются на GET /metrics.
+
+Счётчики, гистограммы и датчики объявляются в модулях, которые их
+обновляют; серии с метками связываются через labels() один раз на уровне
+модуля, поэтому на горячем пути нет поиска серии по значениям меток.
+
+При запуске через app.run с APP_WORKERS > 1 задаётся PROMETHEUS_MULTIPROC_DIR:
+каждый воркер пишет значения в свои файлы общего каталога, и воркер,
+ответивший на опрос, отдаёт сумму по всем. Значения, которые читаются в
+момент опроса (глубина очереди, пул соединений, кэш), берутся у него же.
+"""
+import os
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def _multiprocess() -> bool:
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def render(local: CollectorRegistry) -> bytes:
+    """Метрики всех воркеров и значения local, прочитанные в этом процессе."""
+    registry = REGISTRY
+    if _multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry) + generate_latest(local)
+
+
+def mark_worker_exited() -> None:
+    """Убирает датчики завершившегося воркера из сумм по живым процессам."""
+    if _multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,192 @@
+"""
+Перенос sensor_messages со старой схемы (поля в JSONB `data`, без секций)
+на типизированные колонки и секционирование по времени.
+
+    python -m app.core.migrations [--batch-size N] [--drop-legacy]
+
+Старая таблица переименовывается в sensor_messages_legacy, создаётся новая
+секционированная таблица, строки переносятся пачками по id, каждая пачка
+в своей транзакции. При обрыве повторный запуск продолжает перенос
+с последнего перенесённого id. Последовательность id новой таблицы сразу
+сдвигается за старые id, так что сервис может принимать данные во время
+переноса.
+
+В уже секционированной таблице без уникального ключа (device_id, timestamp)
+удаляются дубли (остаётся запись с меньшим id) и создаётся ключ. Колонка
+geohash добавляется при необходимости и заполняется пачками по batch-size.
+"""
+import argparse
+import asyncio
+from logging import getLogger
+from sqlalchemy import text
+from app.core.database import Base, engine
+from app.core.geo import geohash_encode
+from app.core.logs import init_logging
+from app.core.models import SensorMessage, SensorRollupBackfill
+from app.core.partitions import (
+    TABLE, ensure_future_partitions, ensure_partitions, is_partitioned, table_exists,
+)
+
+logger = getLogger(__name__)
+
+LEGACY = f"{TABLE}_legacy"
+ROLLUP_BACKFILL = SensorRollupBackfill.__tablename__
+
+_COPY_SQL = f"""
+INSERT INTO {TABLE} (
+    id, device_id, timestamp, latitude, longitude,
+    acc_x, acc_y, acc_z, gyr_x, gyr_y, gyr_z, mag_x, mag_y, mag_z,
+    light, temperature
+)
+SELECT
+    id, device_id, timestamp, latitude, longitude,
+    (data->'accelerometer'->>'x')::smallint,
+    (data->'accelerometer'->>'y')::smallint,
+    (data->'accelerometer'->>'z')::smallint,
+    (data->'gyroscope'->>'x')::smallint,
+    (data->'gyroscope'->>'y')::smallint,
+    (data->'gyroscope'->>'z')::smallint,
+    (data->'magnetometer'->>'x')::smallint,
+    (data->'magnetometer'->>'y')::smallint,
+    (data->'magnetometer'->>'z')::smallint,
+    (data->>'light')::real,
+    (data->>'temperature')::real
+FROM {LEGACY}
+WHERE id > :lo AND id <= :hi
+ON CONFLICT DO NOTHING
+"""
+
+UNIQUE_INDEX = f"uq_{TABLE}_device_id_timestamp"
+
+
+async def _rename_legacy(conn) -> None:
+    # Индексы и последовательность тоже переименовываем, иначе их имена
+    # займут место индексов новой таблицы
+    await conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY}"))
+    await conn.execute(text(f"ALTER TABLE {LEGACY} RENAME CONSTRAINT {TABLE}_pkey TO {LEGACY}_pkey"))
+    for column in ("id", "device_id", "timestamp"):
+        await conn.execute(text(
+            f"ALTER INDEX IF EXISTS ix_{TABLE}_{column} RENAME TO ix_{LEGACY}_{column}"
+        ))
+    await conn.execute(text(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq RENAME TO {LEGACY}_id_seq"))
+
+
+async def _add_unique_key(conn) -> None:
+    if await table_exists(conn, UNIQUE_INDEX):
+        return
+
+    logger.info(f"Removing duplicate ({TABLE}.device_id, timestamp) rows")
+    result = await conn.execute(text(
+        f"DELETE FROM {TABLE} a USING {TABLE} b "
+        f"WHERE a.device_id = b.device_id AND a.timestamp = b.timestamp AND a.id > b.id"
+    ))
+    logger.info(f"Removed {result.rowcount} duplicate rows")
+
+    await conn.execute(text(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON {TABLE} (device_id, timestamp)"))
+    await conn.execute(text(f"DROP INDEX IF EXISTS ix_{TABLE}_device_id_timestamp"))
+
+
+async def _add_geohash(conn) -> None:
+    await conn.execute(text(
+        f'ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS geohash varchar(12) COLLATE "C"'
+    ))
+    await conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_geohash_timestamp ON {TABLE} (geohash, timestamp)"
+    ))
+
+
+async def _backfill_geohash(batch_size: int) -> None:
+    """Заполняет geohash у старых записей, каждая пачка в своей транзакции."""
+    update = text(f"UPDATE {TABLE} SET geohash = :geohash WHERE id = :id AND timestamp = :ts")
+
+    total = 0
+    while True:
+        async with engine.begin() as conn:
+            # У точек с неверными координатами geohash остаётся NULL
+            rows = (await conn.execute(text(
+                f"SELECT id, timestamp, latitude, longitude FROM {TABLE} "
+                f"WHERE geohash IS NULL AND latitude BETWEEN -90 AND 90 "
+                f"AND longitude BETWEEN -180 AND 180 LIMIT :n"
+            ), {"n": batch_size})).all()
+            if not rows:
+                break
+
+            geohashes = geohash_encode([r.latitude for r in rows], [r.longitude for r in rows])
+            await conn.execute(update, [
+                {"geohash": g, "id": r.id, "ts": r.timestamp}
+                for r, g in zip(rows, geohashes.tolist())
+            ])
+        total += len(rows)
+        logger.info(f"Filled geohash for {total} rows")
+
+
+async def _migrate_legacy(batch_size: int, drop_legacy: bool) -> None:
+    async with engine.begin() as conn:
+        if await table_exists(conn, TABLE) and not await is_partitioned(conn):
+            logger.info(f"Renaming {TABLE} to {LEGACY}")
+            await _rename_legacy(conn)
+
+        await conn.run_sync(Base.metadata.create_all, tables=[SensorMessage.__table__])
+        await _add_unique_key(conn)
+        await _add_geohash(conn)
+
+        if not await table_exists(conn, LEGACY):
+            await ensure_future_partitions(conn)
+            logger.info("Nothing to migrate")
+            return
+
+        bounds = (await conn.execute(text(
+            f"SELECT min(timestamp), max(timestamp), max(id) FROM {LEGACY}"
+        ))).one()
+        last_id = bounds[2] or 0
+        # Сервис может писать в новую таблицу во время переноса: его записи
+        # получают id выше перенесённых, а продолжение переноса смотрит
+        # только на id из диапазона старой таблицы
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f"greatest((SELECT coalesce(max(id), 0) FROM {TABLE}), :last_id) + 1, false)"
+        ), {"last_id": last_id})
+        done = (await conn.execute(text(
+            f"SELECT coalesce(max(id), 0) FROM {TABLE} WHERE id <= :last_id"
+        ), {"last_id": last_id})).scalar()
+
+        if bounds[0] is not None:
+            await ensure_partitions(conn, bounds[0], bounds[1])
+        await ensure_future_partitions(conn)
+
+    lo = done
+    while lo < last_id:
+        hi = lo + batch_size
+        async with engine.begin() as conn:
+            result = await conn.execute(text(_COPY_SQL), {"lo": lo, "hi": hi})
+        logger.info(f"Migrated ids ({lo}, {min(hi, last_id)}]: {result.rowcount} rows")
+        lo = hi
+
+    async with engine.begin() as conn:
+        # Перенесённых записей нет в агрегатах: пока их не заполнят заново,
+        # статистика считается по сырым точкам
+        if await table_exists(conn, ROLLUP_BACKFILL):
+            await conn.execute(text(f"DELETE FROM {ROLLUP_BACKFILL}"))
+            logger.info("Run `python -m app.core.rollups` to roll up migrated rows")
+        if drop_legacy:
+            logger.info(f"Dropping {LEGACY}")
+            await conn.execute(text(f"DROP TABLE {LEGACY}"))
+
+
+async def migrate(batch_size: int, drop_legacy: bool) -> None:
+    await _migrate_legacy(batch_size, drop_legacy)
+    await _backfill_geohash(batch_size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+
+    init_logging()
+    asyncio.run(migrate(args.batch_size, args.drop_legacy))
+
+
+if __name__ == "__main__":
+    main()
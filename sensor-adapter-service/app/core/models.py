@@ -1,15 +1,103 @@
+from typing import Optional
+from sqlalchemy import Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy.types import Float, Integer, String
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import BigInteger, Boolean, Float, Integer, REAL, SmallInteger, String
 from app.core.database import Base
 
 
 class SensorMessage(Base):
+    """
+    Запись 0x02. Таблица секционирована по диапазонам timestamp
+    (см. app/core/partitions.py), поэтому timestamp входит в первичный ключ.
+    Пара (device_id, timestamp) уникальна: повторно присланные записи
+    при вставке пропускаются. geohash - для пространственных запросов
+    (см. app/core/geo.py).
+    """
     __tablename__ = "sensor_messages"
+    __table_args__ = (
+        Index("uq_sensor_messages_device_id_timestamp", "device_id", "timestamp", unique=True),
+        Index("ix_sensor_messages_geohash_timestamp", "geohash", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    device_id: Mapped[str] = mapped_column(String(24), index=True)
-    timestamp: Mapped[int] = mapped_column(Integer, index=True)
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    timestamp: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    device_id: Mapped[str] = mapped_column(String(24))
     latitude: Mapped[float] = mapped_column(Float)
     longitude: Mapped[float] = mapped_column(Float)
-    data: Mapped[dict] = mapped_column(JSONB)  # все остальные поля
+    acc_x: Mapped[int] = mapped_column(SmallInteger)
+    acc_y: Mapped[int] = mapped_column(SmallInteger)
+    acc_z: Mapped[int] = mapped_column(SmallInteger)
+    gyr_x: Mapped[int] = mapped_column(SmallInteger)
+    gyr_y: Mapped[int] = mapped_column(SmallInteger)
+    gyr_z: Mapped[int] = mapped_column(SmallInteger)
+    mag_x: Mapped[int] = mapped_column(SmallInteger)
+    mag_y: Mapped[int] = mapped_column(SmallInteger)
+    mag_z: Mapped[int] = mapped_column(SmallInteger)
+    light: Mapped[float] = mapped_column(REAL)
+    temperature: Mapped[float] = mapped_column(REAL)
+    geohash: Mapped[Optional[str]] = mapped_column(String(12, collation="C"), nullable=True)
+
+
+class SensorRollup(Base):
+    """
+    Агрегат трека устройства за час (bucket_s=3600) или сутки (bucket_s=86400).
+    daylight=True - то же по точкам с освещённостью выше порога.
+    Первая и последняя точки нужны, чтобы склеивать соседние агрегаты
+    (см. compose_chunks в app/core/analytics.py).
+    """
+    __tablename__ = "sensor_rollups"
+
+    device_id: Mapped[str] = mapped_column(String(24), primary_key=True)
+    daylight: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    bucket_s: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket_start: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    point_count: Mapped[int] = mapped_column(Integer)
+    distance_km: Mapped[float] = mapped_column(Float)
+    moving_s: Mapped[int] = mapped_column(BigInteger)
+    first_ts: Mapped[int] = mapped_column(BigInteger)
+    first_lat: Mapped[float] = mapped_column(Float)
+    first_lon: Mapped[float] = mapped_column(Float)
+    last_ts: Mapped[int] = mapped_column(BigInteger)
+    last_lat: Mapped[float] = mapped_column(Float)
+    last_lon: Mapped[float] = mapped_column(Float)
+    min_lat: Mapped[float] = mapped_column(Float)
+    max_lat: Mapped[float] = mapped_column(Float)
+    min_lon: Mapped[float] = mapped_column(Float)
+    max_lon: Mapped[float] = mapped_column(Float)
+
+
+class SensorRollupDirty(Base):
+    """
+    Часы, в которые пришли новые записи и агрегаты которых нужно пересчитать.
+    Пишется в одной транзакции с записями, поэтому переживает падение процесса.
+    """
+    __tablename__ = "sensor_rollup_dirty"
+
+    device_id: Mapped[str] = mapped_column(String(24), primary_key=True)
+    hour_start: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+
+class SensorRollupBackfill(Base):
+    """
+    Отметка о том, что агрегаты посчитаны по всем уже накопленным записям.
+    Пока её нет, статистика считается только по сырым точкам.
+    """
+    __tablename__ = "sensor_rollup_backfill"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    completed_at: Mapped[int] = mapped_column(BigInteger)
+
+
+class SensorLastFix(Base):
+    """
+    Последняя точка каждого устройства (см. app/core/last_fixes.py).
+    Обновляется при приёме, только если пришла точка новее сохранённой.
+    """
+    __tablename__ = "sensor_last_fixes"
+
+    device_id: Mapped[str] = mapped_column(String(24), primary_key=True)
+    timestamp: Mapped[int] = mapped_column(BigInteger)
+    latitude: Mapped[float] = mapped_column(Float)
+    longitude: Mapped[float] = mapped_column(Float)
+    light: Mapped[Optional[float]] = mapped_column(REAL, nullable=True)
@@ -0,0 +1,31 @@
+import base64
+import hashlib
+import struct
+from typing import Tuple
+
+# Курсор - непрозрачная строка: (timestamp, id) последней отданной записи
+# и контрольная сумма, привязанная к запросу (устройство и порядок), так что
+# испорченный или взятый из другого запроса курсор отклоняется
+_CURSOR_FMT = "<qq"
+_CURSOR_SIZE = struct.calcsize(_CURSOR_FMT)
+_DIGEST_SIZE = 8
+
+
+def _digest(position: bytes, scope: str) -> bytes:
+    return hashlib.blake2b(scope.encode() + b"\0" + position, digest_size=_DIGEST_SIZE).digest()
+
+
+def encode_cursor(timestamp: int, id: int, scope: str) -> str:
+    raw = struct.pack(_CURSOR_FMT, timestamp, id)
+    return base64.urlsafe_b64encode(raw + _digest(raw, scope)).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, scope: str) -> Tuple[int, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except ValueError:
+        raise ValueError("Некорректный курсор")
+    position, digest = raw[:_CURSOR_SIZE], raw[_CURSOR_SIZE:]
+    if len(raw) != _CURSOR_SIZE + _DIGEST_SIZE or digest != _digest(position, scope):
+        raise ValueError("Некорректный курсор")
+    return struct.unpack(_CURSOR_FMT, position)
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Iterator, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.config.settings import settings
+from app.core.models import SensorMessage
+
+logger = getLogger(__name__)
+
+TABLE = SensorMessage.__tablename__
+DEFAULT = f"{TABLE}_default"
+
+
+def month_ranges(ts_from: int, ts_to: int) -> Iterator[Tuple[str, int, int]]:
+    """
+    Месячные диапазоны [start, end) в секундах UTC, покрывающие
+    отрезок [ts_from, ts_to], вместе с суффиксом имени секции.
+    """
+    current = datetime.fromtimestamp(ts_from, tz=timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    while int(current.timestamp()) <= ts_to:
+        if current.month == 12:
+            following = current.replace(year=current.year + 1, month=1)
+        else:
+            following = current.replace(month=current.month + 1)
+        yield current.strftime("%Y%m"), int(current.timestamp()), int(following.timestamp())
+        current = following
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"),
+        {"name": TABLE},
+    )
+    return result.first() is not None
+
+
+async def table_exists(conn: AsyncConnection, name: str) -> bool:
+    result = await conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+    return bool(result.scalar())
+
+
+async def _split_default(conn: AsyncConnection, partition: str, start: int, end: int) -> None:
+    """
+    Создаёт секцию, в диапазон которой уже попали записи секции по умолчанию.
+    Напрямую Postgres такую секцию не создаст, поэтому секция по умолчанию
+    отсоединяется, записи переносятся в новую и она присоединяется обратно.
+    Отсоединение блокирует таблицу до конца транзакции, так что параллельная
+    запись подождёт, а не упадёт без подходящей секции.
+    """
+    columns = ", ".join(c.name for c in SensorMessage.__table__.columns)
+    in_range = f"timestamp >= {start} AND timestamp < {end}"
+
+    await conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT}"))
+    await conn.execute(text(
+        f"CREATE TABLE {partition} PARTITION OF {TABLE} FOR VALUES FROM ({start}) TO ({end})"
+    ))
+    moved = await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT} WHERE {in_range} RETURNING {columns}) "
+        f"INSERT INTO {partition} ({columns}) SELECT {columns} FROM moved"
+    ))
+    await conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT} DEFAULT"))
+    logger.info(f"Moved {moved.rowcount} rows from {DEFAULT} to {partition}")
+
+
+async def ensure_partitions(conn: AsyncConnection, ts_from: int, ts_to: int) -> None:
+    """Создаёт недостающие месячные секции и секцию по умолчанию."""
+    if conn.dialect.name != "postgresql":
+        return
+
+    if not await is_partitioned(conn):
+        logger.warning(
+            f"Table {TABLE} is not partitioned, run `python -m app.core.migrations`"
+        )
+        return
+
+    # Несколько воркеров адаптера делают это одновременно: блокировка до конца
+    # транзакции, чтобы они не столкнулись на CREATE TABLE одной и той же секции
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock(hashtext('{TABLE}_partitions'))"))
+
+    has_default = await table_exists(conn, DEFAULT)
+    for suffix, start, end in month_ranges(ts_from, ts_to):
+        partition = f"{TABLE}_p{suffix}"
+        if await table_exists(conn, partition):
+            continue
+
+        stray = has_default and (await conn.execute(text(
+            f"SELECT 1 FROM {DEFAULT} WHERE timestamp >= {start} AND timestamp < {end} LIMIT 1"
+        ))).first() is not None
+        if stray:
+            await _split_default(conn, partition, start, end)
+        else:
+            await conn.execute(text(
+                f"CREATE TABLE {partition} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ({start}) TO ({end})"
+            ))
+
+    # Сюда попадают записи с явно неверными часами устройства
+    if not has_default:
+        await conn.execute(text(f"CREATE TABLE {DEFAULT} PARTITION OF {TABLE} DEFAULT"))
+
+
+async def ensure_future_partitions(conn: AsyncConnection) -> None:
+    now = int(datetime.now(tz=timezone.utc).timestamp())
+    ahead = now + settings.PARTITION_MONTHS_AHEAD * 31 * 24 * 3600
+    await ensure_partitions(conn, now, ahead)
+
+
+async def run_partition_maintenance(engine, stop_event: asyncio.Event) -> None:
+    """Периодически создаёт секции на PARTITION_MONTHS_AHEAD месяцев вперёд."""
+    while not stop_event.is_set():
+        try:
+            async with engine.begin() as conn:
+                await ensure_future_partitions(conn)
+        except Exception as exc:
+            logger.error(f"Partition maintenance failed: {exc}")
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), settings.PARTITION_CHECK_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
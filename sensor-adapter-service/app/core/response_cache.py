@@ -0,0 +1,179 @@
+"""
+Кэш готовых ответов на запросы координат и статистики.
+
+Кэшируются только запросы с закрытым диапазоном (date_to в прошлом): их
+результат меняется, только если для устройства придут записи со временем
+внутри диапазона. Такие записи приём передаёт в ResponseCache.invalidate,
+и затронутые ответы удаляются; статистика берёт целые часы из агрегатов,
+поэтому после их пересчёта затронутые ответы удаляются ещё раз.
+
+Хранилище подключаемое (RESPONSE_CACHE_BACKEND): по умолчанию LRU в памяти
+процесса, либо класс "module:Class" с методами get/set/invalidate/clear/__len__
+и атрибутом shared - например, обёртка над Redis. Диапазоны ответов хранятся
+вместе с ответами, чтобы запись, принятая любым воркером, сбрасывала ответы,
+закэшированные другими. Хранилище с shared = False (в том числе в памяти)
+при APP_WORKERS > 1 не используется.
+"""
+import hashlib
+import importlib
+import json
+import time
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config.settings import settings
+
+Window = Tuple[int, int]
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    media_type: str
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+class MemoryBackend:
+    """LRU в памяти процесса со сроком жизни записей и индексом диапазонов."""
+
+    # Хранилище своё у каждого процесса: записи, принятые другим воркером, его не сбросят
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, str, CachedResponse]]" = OrderedDict()
+        # device_id -> ключ -> диапазон [ts_from, ts_to] закэшированного ответа
+        self._windows: Dict[str, Dict[str, Window]] = defaultdict(dict)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._delete(key)
+            return None
+        self._data.move_to_end(key)
+        return entry[2]
+
+    def set(self, key: str, value: CachedResponse, device_id: str, window: Window) -> None:
+        if key in self._data:
+            self._delete(key)
+        self._data[key] = (time.monotonic() + self._ttl, device_id, value)
+        self._windows[device_id][key] = window
+        while len(self._data) > self._maxsize:
+            self._delete(next(iter(self._data)))
+
+    def invalidate(self, device_id: str, timestamps: List[int]) -> int:
+        """Удаляет ответы устройства, в диапазон которых попал хоть один из timestamps (по возрастанию)."""
+        windows = self._windows.get(device_id)
+        if not windows:
+            return 0
+
+        stale = []
+        for key, (ts_from, ts_to) in windows.items():
+            i = bisect_left(timestamps, ts_from)
+            if i < len(timestamps) and timestamps[i] <= ts_to:
+                stale.append(key)
+        for key in stale:
+            self._delete(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._windows.clear()
+
+    def _delete(self, key: str) -> None:
+        _, device_id, _ = self._data.pop(key)
+        windows = self._windows[device_id]
+        del windows[key]
+        if not windows:
+            del self._windows[device_id]
+
+
+def load_backend(spec: str, maxsize: int, ttl: float):
+    if spec == "memory":
+        return MemoryBackend(maxsize, ttl)
+
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Cache backend must be 'memory' or 'module:Class', got {spec!r}")
+    return getattr(importlib.import_module(module_name), class_name)(maxsize=maxsize, ttl=ttl)
+
+
+class ResponseCache:
+    def __init__(self, backend, enabled: bool = True):
+        self._backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(name: str, **params) -> str:
+        """Ключ по нормализованным параметрам: порядок и запись значений не важны."""
+        raw = json.dumps(params, sort_keys=True, default=str)
+        return f"{name}:{hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        cached = self._backend.get(key)
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    def set(self, key: str, value: CachedResponse, device_id: str, window: Window) -> None:
+        self._backend.set(key, value, device_id, window)
+
+    def invalidate(self, keys: Iterable[Tuple[str, int]]) -> int:
+        """Удаляет ответы, в диапазон которых попали новые записи (device_id, timestamp)."""
+        if not self.enabled:
+            return 0
+
+        by_device: Dict[str, List[int]] = defaultdict(list)
+        for device_id, timestamp in keys:
+            by_device[device_id].append(timestamp)
+
+        removed = 0
+        for device_id, timestamps in by_device.items():
+            removed += self._backend.invalidate(device_id, sorted(timestamps))
+
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        self._backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_backend = load_backend(settings.RESPONSE_CACHE_BACKEND, settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+# При нескольких воркерах и хранилище в памяти процесса запись, принятая
+# одним воркером, не сбросит ответы остальных - такой кэш не включается
+response_cache = ResponseCache(
+    _backend, enabled=settings.RESPONSE_CACHE_ENABLED and (settings.APP_WORKERS == 1 or _backend.shared),
+)
@@ -0,0 +1,248 @@
+"""
+Почасовые и посуточные агрегаты треков в таблице sensor_rollups.
+
+Приём в той же транзакции, что и записи, отмечает в sensor_rollup_dirty
+часы, в которые они попали; фоновая задача раз в ROLLUP_REFRESH_INTERVAL
+секунд пересчитывает эти часы по сырым точкам, а затем сутки - склейкой
+часов. Отметки хранятся в БД, поэтому падение процесса их не теряет.
+
+Записи, принятые до включения агрегатов или перенесённые миграцией, в
+агрегаты не попадают, пока их не заполнит команда ниже; без --device она
+по завершении ставит отметку в sensor_rollup_backfill, и только после этого
+статистика начинает читать агрегаты. --days - сколько суток пересчитывать
+в одной транзакции:
+
+    python -m app.core.rollups [--device ID] [--days N]
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional, Tuple
+from prometheus_client import Gauge
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.config.settings import settings
+from app.core.analytics import (
+    CHUNK_FIELDS, DAY, HOUR, TrackChunk, ceil_to, chunk_from_row, compose_chunks, rollup_state,
+    track_chunks_stmt,
+)
+from app.core.database import engine
+from app.core.logs import init_logging
+from app.core.models import SensorMessage, SensorRollup, SensorRollupBackfill, SensorRollupDirty
+from app.core.response_cache import response_cache
+
+logger = getLogger(__name__)
+
+
+# Каждый воркер считает отметки всей таблицы: берётся последнее значение
+DIRTY_HOURS = Gauge(
+    "adapter_rollup_dirty_hours", "Hours waiting for a rollup refresh", multiprocess_mode="livemostrecent"
+)
+
+
+async def mark_dirty(conn: AsyncConnection, keys: Iterable[Tuple[str, int]]) -> None:
+    """Отмечает часы новых записей (device_id, timestamp) в транзакции записи."""
+    rows = sorted({(device_id, timestamp // HOUR * HOUR) for device_id, timestamp in keys})
+    if not rows:
+        return
+
+    stmt = pg_insert(SensorRollupDirty)
+    # DO UPDATE, а не DO NOTHING: конфликтующая строка блокируется до конца
+    # транзакции, поэтому пересчёт не удалит отметку раньше, чем станут
+    # видны записанные с ней точки. Порядок строк - против взаимоблокировок
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["device_id", "hour_start"],
+        set_={"hour_start": stmt.excluded.hour_start},
+    )
+    await conn.execute(stmt, [{"device_id": d, "hour_start": h} for d, h in rows])
+
+
+async def _upsert(conn: AsyncConnection, rows: List[dict]) -> None:
+    if not rows:
+        return
+
+    stmt = pg_insert(SensorRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["device_id", "daylight", "bucket_s", "bucket_start"],
+        set_={name: stmt.excluded[name] for name in CHUNK_FIELDS},
+    )
+    await conn.execute(stmt, rows)
+
+
+def _rollup_row(device_id: str, daylight: bool, bucket_s: int, bucket_start: int, chunk: TrackChunk) -> dict:
+    row = {name: getattr(chunk, name) for name in CHUNK_FIELDS}
+    row.update(device_id=device_id, daylight=daylight, bucket_s=bucket_s, bucket_start=bucket_start)
+    return row
+
+
+async def refresh_rollups(conn: AsyncConnection, device_id: str, ts_from: int, ts_to: int) -> None:
+    """Пересчитывает часы, задевающие [ts_from, ts_to), и сутки, в которые они входят."""
+    h_lo, h_hi = ts_from // HOUR * HOUR, ceil_to(ts_to, HOUR)
+    d_lo, d_hi = h_lo // DAY * DAY, ceil_to(h_hi, DAY)
+
+    for daylight in (False, True):
+        hours = (await conn.execute(track_chunks_stmt(device_id, h_lo, h_hi, daylight, HOUR))).all()
+        await _upsert(conn, [
+            _rollup_row(device_id, daylight, HOUR, r.bucket_start, chunk_from_row(r)) for r in hours
+        ])
+
+        # Сутки склеиваются из всех своих часов, а не только пересчитанных
+        day_hours = (await conn.execute(
+            select(SensorRollup).where(
+                SensorRollup.device_id == device_id,
+                SensorRollup.daylight == daylight,
+                SensorRollup.bucket_s == HOUR,
+                SensorRollup.bucket_start >= d_lo,
+                SensorRollup.bucket_start < d_hi,
+            )
+        )).all()
+
+        by_day: Dict[int, List[TrackChunk]] = defaultdict(list)
+        for r in day_hours:
+            by_day[r.bucket_start // DAY * DAY].append(chunk_from_row(r))
+        await _upsert(conn, [
+            _rollup_row(device_id, daylight, DAY, day, compose_chunks(chunks))
+            for day, chunks in by_day.items()
+        ])
+
+
+async def _refresh_day(engine, device_id: str, day: int) -> List[int]:
+    """Пересчитывает отмеченные часы суток устройства и снимает с них отметки."""
+    async with engine.begin() as conn:
+        # Отметки, которые сейчас пишет приём или разбирает другой воркер,
+        # пропускаются до следующего прохода
+        hours = (await conn.execute(
+            select(SensorRollupDirty.hour_start)
+            .where(
+                SensorRollupDirty.device_id == device_id,
+                SensorRollupDirty.hour_start >= day,
+                SensorRollupDirty.hour_start < day + DAY,
+            )
+            .order_by(SensorRollupDirty.hour_start)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not hours:
+            return []
+
+        await conn.execute(
+            delete(SensorRollupDirty).where(
+                SensorRollupDirty.device_id == device_id,
+                SensorRollupDirty.hour_start.in_(hours),
+            )
+        )
+        # При ошибке отметки откатываются вместе с агрегатами
+        await refresh_rollups(conn, device_id, hours[0], hours[-1] + HOUR)
+    return hours
+
+
+async def refresh_dirty(engine) -> int:
+    """Пересчитывает отмеченные часы, по транзакции на каждые сутки устройства."""
+    day_start = SensorRollupDirty.hour_start // DAY * DAY
+    async with engine.connect() as conn:
+        dirty = (await conn.execute(
+            select(SensorRollupDirty.device_id, day_start.label("day"), func.count())
+            .group_by(SensorRollupDirty.device_id, day_start)
+        )).all()
+    waiting = sum(r[2] for r in dirty)
+    DIRTY_HOURS.set(waiting)
+
+    refreshed = 0
+    for device_id, day, _ in dirty:
+        hours = await _refresh_day(engine, device_id, day)
+        # Ответ, посчитанный по агрегату часа, покрывает весь час, в том числе его начало
+        response_cache.invalidate((device_id, hour) for hour in hours)
+        refreshed += len(hours)
+    DIRTY_HOURS.set(max(waiting - refreshed, 0))
+    return refreshed
+
+
+async def _mark_backfilled(conn: AsyncConnection) -> None:
+    stmt = pg_insert(SensorRollupBackfill).values(id=1, completed_at=int(time.time()))
+    await conn.execute(stmt.on_conflict_do_nothing())
+
+
+async def load_backfill_state(engine) -> bool:
+    """
+    Обновляет rollup_state.ready по отметке о заполнении. В пустой базе
+    заполнять нечего: отметка ставится сразу, а дальше агрегаты ведёт приём.
+    """
+    async with engine.begin() as conn:
+        ready = (await conn.execute(select(SensorRollupBackfill.id))).first() is not None
+        if not ready and (await conn.execute(select(SensorMessage.id).limit(1))).first() is None:
+            await _mark_backfilled(conn)
+            ready = True
+
+    if rollup_state.ready and not ready:
+        logger.warning("Rollup backfill mark was removed, stats are computed from raw points")
+    rollup_state.ready = ready
+    return ready
+
+
+async def run_rollup_refresh(engine, stop_event: asyncio.Event) -> None:
+    """
+    Периодически пересчитывает агрегаты часов, в которые пришли новые записи,
+    и перечитывает отметку о заполнении, которую ставит отдельный процесс.
+    """
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), settings.ROLLUP_REFRESH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            await load_backfill_state(engine)
+            await refresh_dirty(engine)
+        except Exception as exc:
+            logger.error(f"Rollup refresh failed: {exc}")
+
+
+async def backfill(device_id: Optional[str], days: int) -> None:
+    async with engine.connect() as conn:
+        if device_id is not None:
+            devices = [device_id]
+        else:
+            devices = (await conn.execute(select(SensorMessage.device_id).distinct())).scalars().all()
+
+    for device in devices:
+        async with engine.connect() as conn:
+            ts_min, ts_max = (await conn.execute(
+                select(func.min(SensorMessage.timestamp), func.max(SensorMessage.timestamp))
+                .where(SensorMessage.device_id == device)
+            )).one()
+        if ts_min is None:
+            continue
+
+        lo = ts_min // DAY * DAY
+        while lo <= ts_max:
+            hi = lo + days * DAY
+            async with engine.begin() as conn:
+                await refresh_rollups(conn, device, lo, hi)
+            lo = hi
+        logger.info(f"Rolled up {device}")
+
+    # Отметка только после прохода по всем устройствам: новые записи за это
+    # время агрегирует приём
+    if device_id is None:
+        async with engine.begin() as conn:
+            await conn.run_sync(SensorRollupBackfill.__table__.create, checkfirst=True)
+            await _mark_backfilled(conn)
+        logger.info("Rollups cover all stored messages")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--days", type=int, default=7, help="сутки на одну транзакцию")
+    args = parser.parse_args()
+
+    init_logging()
+    asyncio.run(backfill(args.device, args.days))
+
+
+if __name__ == "__main__":
+    main()
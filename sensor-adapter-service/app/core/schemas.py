@@ -1,9 +1,72 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from app.config.settings import settings
 
 class CoordinateResponse(BaseModel):
     latitude: float
     longitude: float
     timestamp: datetime
     light: float | None = None
+
+
+class CoordinatePage(BaseModel):
+    items: List[CoordinateResponse]
+    next_cursor: Optional[str] = None
+
+
+class TrackStatsResponse(BaseModel):
+    point_count: int
+    distance_km: float
+    duration_s: int
+    avg_speed_kmh: float
+    avg_segment_km: float
+    moving_s: int = 0
+
+
+class SpatialPoint(BaseModel):
+    device_id: str
+    latitude: float
+    longitude: float
+    timestamp: datetime
+
+
+class SpatialDeviceSummary(BaseModel):
+    device_id: str
+    point_count: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+
+
+class PolygonQuery(BaseModel):
+    # Вершины (широта, долгота), многоугольник замыкается автоматически
+    polygon: List[Tuple[float, float]] = Field(min_length=3)
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    internal_id: Optional[str] = None
+    limit: int = Field(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX)
+    summary: bool = False
+
+
+class DeviceBatchQuery(BaseModel):
+    internal_ids: List[str] = Field(min_length=1, max_length=settings.BATCH_MAX_DEVICES)
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+class BatchCoordinatesQuery(DeviceBatchQuery):
+    max_points: Optional[int] = Field(None, ge=2)
+    tolerance_m: Optional[float] = Field(None, gt=0)
+    bucket: Optional[int] = Field(None, ge=1)
+
+
+class BatchStatsQuery(DeviceBatchQuery):
+    times_of_day: bool = False
+
+
+class LivePosition(BaseModel):
+    device_id: str
+    latitude: float
+    longitude: float
+    timestamp: datetime
+    light: float | None = None
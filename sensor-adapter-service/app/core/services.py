@@ -1,22 +1,178 @@
-from typing import List, Dict
-from sqlalchemy import insert
+import time
+from typing import List, Dict, Set, Tuple
+import numpy as np
+from prometheus_client import Histogram
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.config.settings import settings
 from app.core.database import engine
+from app.core.dedup import RecentKeys
+from app.core.geo import geohash_encode
+from app.core.ingest import IngestBuffer
+from app.core.last_fixes import last_fixes, upsert_last_fixes
+from app.core.live import live_hub, notify_fixes
 from app.core.models import SensorMessage
+from app.core.response_cache import response_cache
+from app.core.rollups import mark_dirty
 
+_COPY_COLUMNS = (
+    "device_id", "timestamp", "latitude", "longitude",
+    "acc_x", "acc_y", "acc_z",
+    "gyr_x", "gyr_y", "gyr_z",
+    "mag_x", "mag_y", "mag_z",
+    "light", "temperature", "geohash",
+)
 
-async def save_messages(device_id: str, messages: List[Dict]) -> int:
+
+_STAGE = f"{SensorMessage.__tablename__}_stage"
+_STAGE_COLUMNS = ", ".join(_COPY_COLUMNS)
+
+Key = Tuple[str, int]
+
+
+def row_key(row: Dict) -> Key:
+    return row["device_id"], row["timestamp"]
+
+
+DB_WRITE_SECONDS = Histogram("adapter_db_write_seconds", "Time to write one batch including commit", ["method"])
+DB_BATCH_ROWS = Histogram(
+    "adapter_db_batch_rows", "Rows per written batch", buckets=(1, 10, 50, 100, 500, 1000, 5000, 20000),
+)
+_WRITE_COPY = DB_WRITE_SECONDS.labels("copy")
+_WRITE_INSERT = DB_WRITE_SECONDS.labels("insert")
+
+
+async def _copy_messages(conn, rows: List[Dict]) -> Set[Key]:
+    # COPY не умеет ON CONFLICT, поэтому пачка сначала попадает во временную
+    # таблицу соединения и переносится оттуда одним INSERT ... SELECT.
+    # Первый оператор идёт через SQLAlchemy и открывает её транзакцию: COPY
+    # драйвера попадает в неё же и фиксируется вместе с остальной пачкой
+    await conn.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {_STAGE} ON COMMIT DELETE ROWS AS "
+        f"SELECT {_STAGE_COLUMNS} FROM {SensorMessage.__tablename__} WITH NO DATA"
+    ))
+    raw = (await conn.get_raw_connection()).driver_connection
+    await raw.copy_records_to_table(
+        _STAGE,
+        records=[tuple(r[c] for c in _COPY_COLUMNS) for r in rows],
+        columns=_COPY_COLUMNS,
+    )
+    inserted = await conn.execute(text(
+        f"INSERT INTO {SensorMessage.__tablename__} ({_STAGE_COLUMNS}) "
+        f"SELECT DISTINCT ON (device_id, timestamp) {_STAGE_COLUMNS} FROM {_STAGE} "
+        f"ON CONFLICT DO NOTHING RETURNING device_id, timestamp"
+    ))
+    return {(r.device_id, r.timestamp) for r in inserted}
+
+
+async def write_messages(rows: List[Dict]) -> Set[Key]:
+    """
+    Пишет строки одной транзакцией: через COPY, если драйвер asyncpg,
+    иначе многострочным INSERT. Записи, уже лежащие в БД под тем же
+    (device_id, timestamp), пропускаются. В той же транзакции обновляются
+    последние точки устройств, отмечаются часы для пересчёта агрегатов и
+    при APP_WORKERS > 1 новые последние точки отправляются подписчикам всех
+    воркеров (app/core/live.py).
+    Возвращает ключи новых строк.
+    """
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        if settings.INGEST_USE_COPY and conn.dialect.driver == "asyncpg":
+            timer = _WRITE_COPY
+            inserted = await _copy_messages(conn, rows)
+        else:
+            timer = _WRITE_INSERT
+            stmt = (
+                pg_insert(SensorMessage)
+                .on_conflict_do_nothing()
+                .returning(SensorMessage.device_id, SensorMessage.timestamp)
+            )
+            result = await conn.execute(stmt, rows)
+            inserted = {(r.device_id, r.timestamp) for r in result}
+
+        fixes = last_fixes.newer(r for r in rows if row_key(r) in inserted)
+        await upsert_last_fixes(conn, fixes)
+        if live_hub.fanout:
+            await notify_fixes(conn, fixes)
+        if settings.ROLLUPS_ENABLED:
+            await mark_dirty(conn, inserted)
+
+    last_fixes.update(fixes)
+    timer.observe(time.perf_counter() - started)
+    DB_BATCH_ROWS.observe(len(rows))
+    return inserted
+
+
+ingest_buffer = IngestBuffer(
+    write_messages,
+    max_rows=settings.INGEST_FLUSH_MAX_ROWS,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL,
+    key=row_key,
+)
+
+recent_keys = RecentKeys(settings.INGEST_DEDUP_WINDOW)
+
+
+async def _store(rows: List[Dict]) -> Tuple[int, int]:
+    """
+    Сохраняет строки, отбрасывая повторы, и возвращает число новых строк
+    и число дублей.
+    """
+    by_key = {row_key(r): r for r in rows}
+    fresh = recent_keys.unseen(by_key) if settings.INGEST_DEDUP_WINDOW else list(by_key)
+    if not fresh:
+        return 0, len(rows)
+
+    to_insert = [by_key[key] for key in fresh]
+    if settings.INGEST_BUFFER_ENABLED:
+        inserted = await ingest_buffer.submit(to_insert)
+    else:
+        inserted = await write_messages(to_insert)
+    # Все ключи пачки теперь есть в БД: и новые, и отсечённые ON CONFLICT
+    if settings.INGEST_DEDUP_WINDOW:
+        recent_keys.add(fresh)
+
+    new_keys = [key for key in fresh if key in inserted]
+    # Закэшированные ответы, в диапазон которых попали новые записи, устарели
+    response_cache.invalidate(new_keys)
+    return len(new_keys), len(rows) - len(new_keys)
+
+
+async def save_messages(device_id: str, messages: List[Dict]) -> Tuple[int, int]:
     to_insert = [
         {
             "device_id": device_id,
             "timestamp": m["timestamp"],
             "latitude": m["latitude"],
             "longitude": m["longitude"],
-            "data": m,
+            "acc_x": m["accelerometer"]["x"],
+            "acc_y": m["accelerometer"]["y"],
+            "acc_z": m["accelerometer"]["z"],
+            "gyr_x": m["gyroscope"]["x"],
+            "gyr_y": m["gyroscope"]["y"],
+            "gyr_z": m["gyroscope"]["z"],
+            "mag_x": m["magnetometer"]["x"],
+            "mag_y": m["magnetometer"]["y"],
+            "mag_z": m["magnetometer"]["z"],
+            "light": m["light"],
+            "temperature": m["temperature"],
         }
         for m in messages
     ]
+    geohashes = geohash_encode(
+        [r["latitude"] for r in to_insert], [r["longitude"] for r in to_insert]
+    )
+    for row, geohash in zip(to_insert, geohashes.tolist()):
+        row["geohash"] = geohash
+    return await _store(to_insert)
 
-    async with engine.begin() as conn:
-        await conn.execute(insert(SensorMessage), to_insert)
 
-    return len(to_insert)
+async def save_columns(device_id: str, columns: Dict[str, np.ndarray]) -> Tuple[int, int]:
+    """Сохраняет результат колоночного разбора пакета (parse_packet_columns)."""
+    columns = {**columns, "geohash": geohash_encode(columns["latitude"], columns["longitude"])}
+    names = list(columns)
+    to_insert = [
+        {"device_id": device_id, **dict(zip(names, values))}
+        for values in zip(*(columns[name].tolist() for name in names))
+    ]
+    return await _store(to_insert)
@@ -0,0 +1,76 @@
+"""
+Упрощение трека для карт: Рамер-Дуглас-Пекер по точкам в метрах.
+
+Классический алгоритм рекурсивно делит ломаную в самой удалённой от хорды
+точке. Здесь отрезки обрабатываются в порядке убывания этого расстояния
+(через кучу), поэтому можно остановиться и по допуску, и по числу точек,
+а итераций столько же, сколько оставленных точек. Расстояния внутри
+отрезка считаются векторно в numpy. Первая и последняя точки остаются всегда.
+"""
+import heapq
+from typing import List, Optional, Tuple
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def project_m(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Равнопромежуточная проекция вокруг средней широты, координаты в метрах."""
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+    x = EARTH_RADIUS_M * lon_rad * np.cos(lat_rad.mean())
+    y = EARTH_RADIUS_M * lat_rad
+    return x, y
+
+
+def _farthest(x: np.ndarray, y: np.ndarray, start: int, end: int) -> Optional[Tuple[float, int]]:
+    """Самая удалённая от хорды start-end точка между ними и её расстояние."""
+    if end - start < 2:
+        return None
+
+    px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+    dx, dy = x[end] - x[start], y[end] - y[start]
+    norm = np.hypot(dx, dy)
+    if norm == 0:
+        dist = np.hypot(px, py)
+    else:
+        dist = np.abs(dy * px - dx * py) / norm
+
+    k = int(np.argmax(dist))
+    return float(dist[k]), start + 1 + k
+
+
+def simplify(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    tolerance_m: Optional[float] = None,
+    max_points: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Возвращает отсортированные индексы точек, которые нужно оставить:
+    отклонение выброшенных точек от трека не больше tolerance_m метров,
+    а всего точек не больше max_points (не меньше двух).
+    """
+    n = len(lat)
+    limit = n if max_points is None else max(2, max_points)
+    if n <= 2 or (limit >= n and tolerance_m is None):
+        return np.arange(n)
+
+    x, y = project_m(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+    tolerance = tolerance_m or 0.0
+
+    keep: List[int] = [0, n - 1]
+    heap: List[Tuple[float, int, int, int]] = []
+
+    def push(start: int, end: int) -> None:
+        found = _farthest(x, y, start, end)
+        if found is not None and found[0] > tolerance:
+            heapq.heappush(heap, (-found[0], start, found[1], end))
+
+    push(0, n - 1)
+    while heap and len(keep) < limit:
+        _, start, k, end = heapq.heappop(heap)
+        keep.append(k)
+        push(start, k)
+        push(k, end)
+
+    return np.sort(np.asarray(keep))
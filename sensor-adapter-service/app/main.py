@@ -1,15 +1,57 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+from app.adapters import adapter
 from app.api.http_endpoints import router as http_router
-from app.core.database import start_database
+from app.api.live_endpoints import router as live_router
+from app.api.metrics_endpoints import router as metrics_router
+from app.core.database import engine, start_database
+from app.core.last_fixes import load_last_fixes, run_last_fix_refresh
+from app.core.live import live_hub, run_live_listener
+from app.core.metrics import mark_worker_exited
+from app.core.partitions import run_partition_maintenance
+from app.core.rollups import load_backfill_state, refresh_dirty, run_rollup_refresh
+from app.core.response_cache import response_cache
+from app.core.services import ingest_buffer
 from app.config.settings import settings
 from app.core.logs import init_logging
 import asyncio
+from logging import getLogger
+
+logger = getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_logging()
-    await start_database()
+    if settings.DATABASE_INIT_ON_STARTUP:
+        await start_database()
+    await load_last_fixes(engine)
+    if settings.RESPONSE_CACHE_ENABLED and not response_cache.enabled:
+        logger.warning("Response cache is disabled: its backend is not shared between APP_WORKERS")
+    if settings.ROLLUPS_ENABLED and not await load_backfill_state(engine):
+        logger.warning("Rollups are not backfilled, run `python -m app.core.rollups`")
+    ingest_buffer.start()
+
+    maintenance_stop = asyncio.Event()
+    maintenance_task = asyncio.get_event_loop().create_task(
+        run_partition_maintenance(engine, maintenance_stop)
+    )
+    rollup_task = None
+    if settings.ROLLUPS_ENABLED:
+        rollup_task = asyncio.get_event_loop().create_task(
+            run_rollup_refresh(engine, maintenance_stop)
+        )
+    # Последние точки, записанные другими воркерами
+    last_fix_task = None
+    if settings.APP_WORKERS > 1:
+        last_fix_task = asyncio.get_event_loop().create_task(
+            run_last_fix_refresh(engine, maintenance_stop)
+        )
+    # Точки для подписчиков, принятые всеми воркерами
+    live_task = None
+    if live_hub.fanout:
+        live_task = asyncio.get_event_loop().create_task(
+            run_live_listener(engine, maintenance_stop)
+        )
     
     # --- TCP server -----------------------------------------------------------
     stop_event = None
@@ -19,7 +61,9 @@ async def lifespan(app: FastAPI):
 
         loop = asyncio.get_event_loop()
         stop_event = asyncio.Event()
-        tcp_task = loop.create_task(run_tcp_server(settings.APP_HOST, settings.APP_TCP_PORT, stop_event))
+        tcp_task = loop.create_task(run_tcp_server(
+            settings.APP_HOST, settings.APP_TCP_PORT, stop_event, reuse_port=settings.TCP_REUSE_PORT
+        ))
     
     yield
 
@@ -27,5 +71,23 @@ async def lifespan(app: FastAPI):
         stop_event.set()
         await tcp_task
 
+    maintenance_stop.set()
+    await maintenance_task
+    if rollup_task is not None:
+        await rollup_task
+    if last_fix_task is not None:
+        await last_fix_task
+    if live_task is not None:
+        await live_task
+
+    # Дописываем всё, что осталось в буфере, до остановки приложения
+    await ingest_buffer.stop()
+    if settings.ROLLUPS_ENABLED:
+        await refresh_dirty(engine)
+    await adapter.shutdown()
+    mark_worker_exited()
+
 app = FastAPI(title="Sensor Adapter Service", lifespan=lifespan)
 app.include_router(http_router, prefix="/api/v1")
+app.include_router(live_router, prefix="/api/v1")
+app.include_router(metrics_router)
@@ -0,0 +1,57 @@
+"""
+Точка входа для запуска адаптера в несколько процессов:
+
+    python -m app.run
+
+Родительский процесс один раз создаёт схему БД, затем запускает
+APP_WORKERS воркеров uvicorn. HTTP-сокет открывает родитель и передаёт
+воркерам, TCP-порт каждый воркер слушает сам с SO_REUSEPORT. Метрики
+воркеров сводятся через каталог PROMETHEUS_MULTIPROC_DIR (если не задан,
+создаётся временный). SIGINT/SIGTERM родитель пересылает воркерам, и каждый
+из них штатно завершает lifespan: останавливает TCP-сервер и дописывает
+буфер приёма.
+"""
+import asyncio
+import os
+import tempfile
+from logging import getLogger
+import uvicorn
+from app.config.settings import settings
+from app.core.database import engine, start_database
+from app.core.logs import init_logging
+from app.core.metrics import MULTIPROC_DIR_ENV
+
+logger = getLogger(__name__)
+
+
+async def _init_database() -> None:
+    await start_database()
+    # Соединения пула нельзя унаследовать воркерам
+    await engine.dispose()
+
+
+def main() -> None:
+    init_logging()
+
+    if settings.DATABASE_INIT_ON_STARTUP:
+        asyncio.run(_init_database())
+
+    # Воркеры запускаются через spawn и читают настройки из окружения заново
+    os.environ["DATABASE_INIT_ON_STARTUP"] = "false"
+    if settings.APP_WORKERS > 1:
+        os.environ["TCP_REUSE_PORT"] = "true"
+        # Воркеры складывают метрики в общий каталог (app/core/metrics.py)
+        if not os.environ.get(MULTIPROC_DIR_ENV):
+            os.environ[MULTIPROC_DIR_ENV] = tempfile.mkdtemp(prefix="adapter-metrics-")
+
+    logger.info(f"Starting {settings.APP_WORKERS} adapter worker(s)")
+    uvicorn.run(
+        "app.main:app",
+        host=settings.APP_HOST,
+        port=settings.APP_PORT,
+        workers=settings.APP_WORKERS,
+    )
+
+
+if __name__ == "__main__":
+    main()
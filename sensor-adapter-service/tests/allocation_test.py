@@ -0,0 +1,122 @@
+"""
+Память, которую выделяет разбор пакета (tracemalloc): сколько остаётся
+вместе с результатом и сколько занимается временно. Разбор идёт из окна
+в буфер пакета, поэтому ни тело пакета, ни отдельные записи не копируются.
+Таблица по размерам пакетов:
+
+    python -m tests.allocation_test
+"""
+import gc
+import tracemalloc
+import unittest
+from typing import Callable, List, Optional, Tuple
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.adapters.binary_protocol import BinaryProtocolParser
+from app.api.http_endpoints import read_body
+from tests.load import make_fleet
+
+
+def measure(parse: Callable, packet) -> Tuple[int, int]:
+    """(байт остаётся вместе с результатом, байт сверх этого в пике)."""
+    parse(packet)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = parse(packet)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current - base, peak - current
+
+
+class TestParseAllocations(unittest.TestCase):
+    RECORDS = 1000
+
+    def setUp(self):
+        self.parser = BinaryProtocolParser()
+        self.packet = make_fleet(1, step_s=5.0, seed=7)[0].packet(self.RECORDS)
+
+    def test_columns_view_the_packet_buffer(self):
+        retained, transient = measure(self.parser.parse_packet_columns, self.packet)
+
+        # Колонки смотрят в исходный буфер: копия тела весила бы len(packet)
+        self.assertLess(retained, len(self.packet) // 4)
+        self.assertLess(transient, len(self.packet) // 2)
+
+    def test_records_are_decoded_without_copying_the_body(self):
+        _, transient = measure(self.parser.parse_packet, self.packet)
+
+        self.assertLess(transient, len(self.packet) // 10)
+
+    def test_bytearray_and_memoryview_buffers(self):
+        expected = self.parser.parse_packet(self.packet)
+
+        for buffer in (bytearray(self.packet), memoryview(self.packet)):
+            self.assertEqual(self.parser.parse_packet(buffer), expected)
+            self.assertEqual(self.parser.parse_packet_columns(buffer)["count"], self.RECORDS)
+
+
+def _request(chunks: List[bytes], length: Optional[int]) -> Request:
+    headers = [] if length is None else [(b"content-length", str(length).encode())]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    received = []
+
+    async def receive():
+        received.append(messages[len(received)])
+        return received[-1]
+
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    request.received = received
+    return request
+
+
+class TestReadBody(unittest.IsolatedAsyncioTestCase):
+    CHUNKS = [b"abc", b"defg", b"h"]
+
+    async def test_chunks_with_and_without_length(self):
+        for length in (8, None):
+            body = await read_body(_request(self.CHUNKS, length), limit=8)
+            self.assertEqual(body, bytearray(b"abcdefgh"))
+
+    async def test_short_body_is_trimmed(self):
+        body = await read_body(_request(self.CHUNKS, 100), limit=100)
+
+        self.assertEqual(body, bytearray(b"abcdefgh"))
+
+    async def test_declared_size_over_limit_is_rejected_unread(self):
+        request = _request(self.CHUNKS, 9)
+
+        with self.assertRaises(HTTPException) as ctx:
+            await read_body(request, limit=8)
+
+        self.assertEqual(ctx.exception.status_code, 413)
+        self.assertEqual(request.received, [])
+
+    async def test_streamed_size_over_limit_is_rejected(self):
+        request = _request(self.CHUNKS, None)
+
+        with self.assertRaises(HTTPException) as ctx:
+            await read_body(request, limit=7)
+
+        self.assertEqual(ctx.exception.status_code, 413)
+
+
+def main() -> None:
+    parser = BinaryProtocolParser()
+    device = make_fleet(1, step_s=5.0, seed=7)[0]
+    print(f"{'records':>8}{'packet':>10}{'mode':>10}{'retained':>12}{'transient':>12}")
+    for records in (1, 100, 1000):
+        packet = device.packet(records)
+        for mode, parse in (("dicts", parser.parse_packet), ("columns", parser.parse_packet_columns)):
+            retained, transient = measure(parse, packet)
+            print(f"{records:>8}{len(packet):>10}{mode:>10}{retained:>12}{transient:>12}")
+
+
+if __name__ == "__main__":
+    main()
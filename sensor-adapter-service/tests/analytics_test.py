@@ -0,0 +1,82 @@
+import unittest
+from sqlalchemy.dialects import postgresql
+from app.core.analytics import DAY, HOUR, TrackChunk, compose_chunks, device_condition, haversine, split_range
+from app.core.models import SensorMessage
+
+
+def _chunk(points):
+    """Кусок трека по списку точек (ts, lat, lon), посчитанный напрямую."""
+    distance = sum(haversine(a[1], a[2], b[1], b[2]) for a, b in zip(points, points[1:]))
+    moving = sum(b[0] - a[0] for a, b in zip(points, points[1:])
+                 if haversine(a[1], a[2], b[1], b[2]) * HOUR > b[0] - a[0])
+    return TrackChunk(
+        point_count=len(points), distance_km=distance, moving_s=moving,
+        first_ts=points[0][0], first_lat=points[0][1], first_lon=points[0][2],
+        last_ts=points[-1][0], last_lat=points[-1][1], last_lon=points[-1][2],
+        min_lat=min(p[1] for p in points), max_lat=max(p[1] for p in points),
+        min_lon=min(p[2] for p in points), max_lon=max(p[2] for p in points),
+    )
+
+
+class TestComposeChunks(unittest.TestCase):
+    def test_compose_equals_whole_track(self):
+        points = [(0, 55.0, 37.0), (60, 55.01, 37.0), (4000, 55.01, 37.0),
+                  (4100, 55.02, 37.02), (9000, 55.1, 37.1)]
+        
+        composed = compose_chunks([_chunk(points[3:]), _chunk(points[:2]), _chunk(points[2:3])])
+        whole = _chunk(points)
+        
+        self.assertEqual(composed.point_count, whole.point_count)
+        self.assertAlmostEqual(composed.distance_km, whole.distance_km)
+        self.assertEqual(composed.moving_s, whole.moving_s)
+        self.assertEqual((composed.first_ts, composed.last_ts), (0, 9000))
+        self.assertEqual((composed.min_lat, composed.max_lon), (55.0, 37.1))
+
+    def test_compose_empty(self):
+        self.assertIsNone(compose_chunks([]))
+
+
+class TestSplitRange(unittest.TestCase):
+    def test_days_hours_and_raw_edges(self):
+        ts_from, ts_to = DAY - HOUR - 10, 3 * DAY + 2 * HOUR + 10
+        
+        days, hours, raw = split_range(ts_from, ts_to, cutoff=10 * DAY)
+        
+        self.assertEqual(days, (DAY, 3 * DAY))
+        self.assertEqual(hours, [(DAY - HOUR, DAY), (3 * DAY, 3 * DAY + 2 * HOUR)])
+        self.assertEqual(raw, [(ts_from, DAY - HOUR), (3 * DAY + 2 * HOUR, ts_to)])
+
+    def test_nothing_rolled_up_after_cutoff(self):
+        days, hours, raw = split_range(0, 3 * DAY, cutoff=HOUR // 2)
+        
+        self.assertIsNone(days)
+        self.assertEqual(hours, [])
+        self.assertEqual(raw, [(0, 3 * DAY)])
+
+    def test_cutoff_limits_rollups(self):
+        days, hours, raw = split_range(0, 3 * DAY, cutoff=DAY + 5 * HOUR + 7)
+        
+        self.assertEqual(days, (0, DAY))
+        self.assertEqual(hours, [(DAY, DAY + 5 * HOUR)])
+        self.assertEqual(raw, [(DAY + 5 * HOUR, 3 * DAY)])
+
+
+class TestDeviceCondition(unittest.TestCase):
+    def compile(self, device_ids):
+        return device_condition(SensorMessage.device_id, device_ids).compile(dialect=postgresql.dialect())
+
+    def test_list_is_one_array_parameter(self):
+        compiled = self.compile(["aa", "bb", "cc"])
+
+        self.assertIn("= ANY (", str(compiled))
+        self.assertEqual(list(compiled.params.values()), [["aa", "bb", "cc"]])
+
+    def test_single_device_is_plain_equality(self):
+        compiled = self.compile("aa")
+
+        self.assertNotIn("ANY", str(compiled))
+        self.assertEqual(list(compiled.params.values()), ["aa"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Микробенчмарки разбора и сохранения пакетов (pytest-benchmark).
+
+    python -m pytest tests/benchmark_test.py --benchmark-only
+
+Без установленного pytest-benchmark модуль пропускается; бенчмарк
+save_messages пропускается, если БД из DATABASE_URL недоступна.
+"""
+import asyncio
+import random
+import pytest
+from sqlalchemy import delete
+from app.adapters.binary_protocol import BinaryProtocolParser, decode_packet_columns
+from app.core import services
+from app.core.database import engine, start_database
+from app.core.models import SensorMessage
+from tests.load import make_fleet
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def device():
+    return make_fleet(1, step_s=5.0, seed=random.randrange(1 << 30))[0]
+
+
+@pytest.mark.parametrize("records", [1, 100, 1000])
+def test_parse_packet(benchmark, device, records):
+    parser = BinaryProtocolParser()
+    packet = device.packet(records)
+
+    parsed = benchmark(parser.parse_packet, packet)
+
+    assert len(parsed["messages"]) == records
+
+
+@pytest.mark.parametrize("records", [1, 100, 1000])
+def test_decode_packet_columns(benchmark, device, records):
+    packet = device.packet(records)
+
+    parsed = benchmark(decode_packet_columns, packet)
+
+    assert parsed["count"] == records
+
+
+@pytest.fixture(scope="module")
+def db_loop():
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(start_database())
+    except Exception as exc:
+        loop.run_until_complete(engine.dispose())
+        loop.close()
+        pytest.skip(f"database is not available: {exc}")
+    yield loop
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+@pytest.mark.parametrize("records", [10, 1000])
+def test_save_messages(benchmark, db_loop, device, records):
+    parser = BinaryProtocolParser()
+
+    def setup():
+        # Каждый раунд пишет новые записи: повторы отсеялись бы до БД
+        parsed = parser.parse_packet(device.packet(records))
+        return (parsed["device_id"], parsed["messages"]), {}
+
+    def save(device_id, messages):
+        return db_loop.run_until_complete(services.save_messages(device_id, messages))
+
+    saved, _ = benchmark.pedantic(save, setup=setup, rounds=20)
+
+    device_id = device.device_id.hex()
+    db_loop.run_until_complete(_cleanup(device_id))
+    assert saved == records
+
+
+async def _cleanup(device_id: str) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(delete(SensorMessage).where(SensorMessage.device_id == device_id))
@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+from tests.message_generator import MessageGenerator
+from app.adapters.binary_protocol import BinaryProtocolParser, CRC8_FUNC, crc8_maxim_rows
+
+
+def _with_record(message_generator: MessageGenerator, timestamp: int) -> MessageGenerator:
+    return message_generator.with_message_0x02(
+        timestamp, 13.5, 54.03, [234, -1232, 153], [665, 0, 4124],
+        [234, 543, 222], 0.667, 22.5)
+
+
+class TestBinaryProtocolColumns(unittest.TestCase):
+    def test_crc_table_matches_crcmod(self):
+        rows = np.random.default_rng(1).integers(0, 256, size=(64, 39), dtype=np.uint8)
+        
+        expected = [CRC8_FUNC(row.tobytes()) for row in rows]
+        
+        self.assertEqual(crc8_maxim_rows(rows).tolist(), expected)
+    
+    def test_no_raise_on_empty_packet(self):
+        parser = BinaryProtocolParser()
+        message_generator = MessageGenerator()
+        message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 0)
+        
+        result = parser.parse_packet_columns(message_generator.get_buffer())
+        
+        self.assertEqual(result["count"], 0)
+        self.assertEqual(len(result["columns"]["timestamp"]), 0)
+    
+    def test_columns_match_messages(self):
+        parser = BinaryProtocolParser()
+        message_generator = MessageGenerator()
+        message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 120)
+        for timestamp in (12, 53, 78):
+            _with_record(message_generator, timestamp)
+        
+        raw = message_generator.get_buffer()
+        messages = parser.parse_packet(raw)["messages"]
+        result = parser.parse_packet_columns(raw)
+        columns = result["columns"]
+        
+        self.assertEqual(result["count"], 3)
+        self.assertEqual(columns["timestamp"].tolist(), [12, 53, 78])
+        self.assertEqual(columns["latitude"].tolist(), [m["latitude"] for m in messages])
+        self.assertEqual(columns["acc_y"].tolist(), [m["accelerometer"]["y"] for m in messages])
+        self.assertEqual(columns["mag_z"].tolist(), [m["magnetometer"]["z"] for m in messages])
+        self.assertEqual(columns["temperature"].tolist(), [m["temperature"] for m in messages])
+    
+    def test_break_on_0xFF(self):
+        parser = BinaryProtocolParser()
+        message_generator = MessageGenerator()
+        message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 81)
+        _with_record(message_generator, 12)
+        message_generator.with_bytes(bytes([0xFF,]))
+        _with_record(message_generator, 13)
+        
+        result = parser.parse_packet_columns(message_generator.get_buffer())
+        
+        self.assertEqual(result["count"], 1)
+    
+    def test_raise_on_unknown_record_type(self):
+        parser = BinaryProtocolParser()
+        message_generator = MessageGenerator()
+        message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 44)
+        _with_record(message_generator, 12)
+        message_generator.with_bytes(bytes([10, 0, 0, 2]))
+        
+        with self.assertRaises(ValueError):
+            parser.parse_packet_columns(message_generator.get_buffer())
+    
+    def test_raise_on_incomplete_record(self):
+        parser = BinaryProtocolParser()
+        message_generator = MessageGenerator()
+        message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 4)
+        message_generator.with_bytes(bytes([0x02, 0, 0, 2]))
+        
+        with self.assertRaises(ValueError):
+            parser.parse_packet_columns(message_generator.get_buffer())
+    
+    def test_raise_on_invalid_crc(self):
+        parser = BinaryProtocolParser()
+        message_generator = MessageGenerator()
+        message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 80)
+        _with_record(message_generator, 12)
+        _with_record(message_generator, 13)
+        message_generator.with_shrink_bytes(1)
+        message_generator.with_bytes(bytes([0,]))
+        
+        with self.assertRaises(ValueError):
+            parser.parse_packet_columns(message_generator.get_buffer())
+
+
+if __name__ == '__main__':
+    unittest.main()
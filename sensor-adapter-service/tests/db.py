@@ -0,0 +1,35 @@
+"""Проверки с БД из DATABASE_URL в отдельной схеме, чтобы не трогать данные сервиса."""
+import unittest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.config.settings import settings
+
+
+class SchemaTestCase(unittest.IsolatedAsyncioTestCase):
+    """Схема SCHEMA пересоздаётся для каждой проверки; без БД проверки пропускаются."""
+
+    SCHEMA = "adapter_test"
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(
+            settings.DATABASE_URL, connect_args={"server_settings": {"search_path": self.SCHEMA}},
+        )
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {self.SCHEMA} CASCADE"))
+                await conn.execute(text(f"CREATE SCHEMA {self.SCHEMA}"))
+        except Exception as exc:
+            await self.engine.dispose()
+            self.skipTest(f"database is not available: {exc}")
+
+    async def asyncTearDown(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {self.SCHEMA} CASCADE"))
+        await self.engine.dispose()
+
+    def session(self) -> AsyncSession:
+        return AsyncSession(self.engine, expire_on_commit=False)
+
+    async def count(self, table: str, where: str = "true") -> int:
+        async with self.engine.connect() as conn:
+            return (await conn.execute(text(f"SELECT count(*) FROM {table} WHERE {where}"))).scalar()
@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from app.core import services
+from app.core.dedup import RecentKeys
+from app.core.ingest import IngestBuffer
+
+
+class TestRecentKeys(unittest.TestCase):
+    def test_unseen_returns_only_unknown_keys(self):
+        keys = RecentKeys(maxsize=10)
+        
+        first = keys.unseen([("a", 1), ("a", 2), ("a", 1)])
+        keys.add(first)
+        second = keys.unseen([("a", 2), ("a", 3)])
+        
+        self.assertEqual(first, [("a", 1), ("a", 2)])
+        self.assertEqual(second, [("a", 3)])
+
+    def test_unseen_does_not_remember_keys(self):
+        keys = RecentKeys(maxsize=10)
+        
+        keys.unseen([("a", 1)])
+        
+        self.assertEqual(keys.unseen([("a", 1)]), [("a", 1)])
+        self.assertEqual(len(keys), 0)
+
+    def test_evicts_least_recently_seen(self):
+        keys = RecentKeys(maxsize=2)
+        
+        keys.add([("a", 1), ("a", 2)])
+        keys.unseen([("a", 1)])
+        keys.add([("a", 3)])
+        
+        self.assertIn(("a", 1), keys)
+        self.assertNotIn(("a", 2), keys)
+        self.assertEqual(len(keys), 2)
+
+
+class _Table:
+    """Уникальный ключ таблицы: вставка ждёт исхода транзакции, начатой раньше."""
+
+    def __init__(self):
+        self.keys = set()
+        self.writes = 0
+        self.fail_first = asyncio.Event()
+        self._previous = None
+
+    async def write_messages(self, rows):
+        self.writes += 1
+        previous = self._previous
+        self._previous = done = asyncio.get_running_loop().create_future()
+        try:
+            if self.writes == 1:
+                await self.fail_first.wait()
+                raise RuntimeError("connection lost")
+            if previous is not None:
+                await asyncio.wait([previous])
+            inserted = {(r["device_id"], r["timestamp"]) for r in rows} - self.keys
+            self.keys |= inserted
+            return inserted
+        finally:
+            done.set_result(None)
+
+
+class TestStoreDedup(unittest.IsolatedAsyncioTestCase):
+    ROWS = [{"device_id": "a", "timestamp": t} for t in (1, 2, 3)]
+
+    async def asyncSetUp(self):
+        self.table = _Table()
+        self._patches = [
+            patch.object(services, "write_messages", self.table.write_messages),
+            patch.object(services, "recent_keys", RecentKeys(maxsize=100)),
+            patch.object(services.settings, "INGEST_DEDUP_WINDOW", 100),
+            patch.object(services.settings, "INGEST_BUFFER_ENABLED", False),
+            patch.object(services.settings, "ROLLUPS_ENABLED", False),
+        ]
+        for p in self._patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self._patches:
+            p.stop()
+
+    async def test_replay_during_failed_write_is_saved(self):
+        original = asyncio.ensure_future(services._store(self.ROWS))
+        await asyncio.sleep(0)
+        replay = asyncio.ensure_future(services._store(self.ROWS))
+        await asyncio.sleep(0)
+
+        # Повтор не подтверждается, пока исходная запись не завершилась
+        self.assertFalse(replay.done())
+        self.table.fail_first.set()
+
+        with self.assertRaises(RuntimeError):
+            await original
+        self.assertEqual(await replay, (3, 0))
+        self.assertEqual(self.table.keys, {("a", 1), ("a", 2), ("a", 3)})
+
+    async def test_keys_are_remembered_after_successful_write(self):
+        self.table.writes = 1
+
+        self.assertEqual(await services._store(self.ROWS), (3, 0))
+        self.assertEqual(await services._store(self.ROWS[1:]), (0, 2))
+        self.assertEqual(self.table.writes, 2)
+
+    async def test_failed_write_is_not_remembered(self):
+        self.table.fail_first.set()
+
+        with self.assertRaises(RuntimeError):
+            await services._store(self.ROWS)
+
+        self.assertEqual(await services._store(self.ROWS), (3, 0))
+
+    async def test_same_rows_in_one_flush_are_counted_once(self):
+        self.table.writes = 1
+        buffer = IngestBuffer(self.table.write_messages, max_rows=100, flush_interval=0.01,
+                              key=services.row_key)
+        buffer.start()
+
+        with patch.object(services, "ingest_buffer", buffer), \
+                patch.object(services.settings, "INGEST_BUFFER_ENABLED", True):
+            results = await asyncio.gather(services._store(self.ROWS), services._store(self.ROWS))
+        await buffer.stop()
+
+        self.assertEqual(sorted(results), [(0, 3), (3, 0)])
+        self.assertEqual(self.table.writes, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
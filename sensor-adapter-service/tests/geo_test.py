@@ -0,0 +1,87 @@
+import unittest
+import warnings
+import numpy as np
+from app.core.geo import cell_size, cover_bbox, geohash_encode, points_in_polygon, radius_bboxes
+
+
+class TestGeohash(unittest.TestCase):
+    def test_known_values(self):
+        hashes = geohash_encode([57.64911, -33.8688], [10.40744, 151.2093])
+        
+        self.assertEqual(hashes[0][:11], "u4pruydqqvj")
+        self.assertEqual(hashes[1][:5], "r3gx2")
+
+    def test_precision_is_prefix(self):
+        full = geohash_encode([55.75], [37.62])[0]
+        
+        self.assertEqual(geohash_encode([55.75], [37.62], precision=5).tolist(), [full[:5]])
+        self.assertEqual(full[:5], "ucfv0")
+
+    def test_cover_contains_every_point(self):
+        rng = np.random.default_rng(3)
+        bbox = (55.60, 37.40, 55.90, 37.85)
+        lat = rng.uniform(bbox[0], bbox[2], 5000)
+        lon = rng.uniform(bbox[1], bbox[3], 5000)
+        
+        prefixes = cover_bbox(bbox)
+        hashes = geohash_encode(lat, lon)
+        
+        self.assertLessEqual(len(prefixes), 32)
+        self.assertTrue(all(any(h.startswith(p) for p in prefixes) for h in hashes.tolist()))
+
+    def test_cover_at_poles_and_antimeridian(self):
+        for bbox in ((89.0, 0.0, 90.0, 1.0), (0.0, 179.0, 1.0, 180.0), (-90.0, -180.0, -89.0, -179.0),
+                     (-90.0, -180.0, 90.0, 180.0)):
+            prefixes = cover_bbox(bbox)
+            corners = geohash_encode([bbox[0], bbox[0], bbox[2], bbox[2]], [bbox[1], bbox[3], bbox[1], bbox[3]])
+
+            self.assertTrue(prefixes)
+            self.assertLessEqual(len(prefixes), 32)
+            self.assertTrue(all(any(h.startswith(p) for p in prefixes) for h in corners.tolist()), bbox)
+
+    def test_invalid_coordinates_have_no_geohash(self):
+        lat = [55.75, np.nan, 91.0, 10.0, np.inf]
+        lon = [37.62, 37.62, 37.62, -181.0, 0.0]
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            hashes = geohash_encode(lat, lon).tolist()
+        
+        self.assertEqual(hashes[0], geohash_encode([55.75], [37.62])[0])
+        self.assertEqual(hashes[1:], [None] * 4)
+
+    def test_cell_size(self):
+        self.assertEqual(cell_size(1), (45.0, 45.0))
+
+
+class TestShapes(unittest.TestCase):
+    def test_radius_bbox_contains_circle(self):
+        [(min_lat, min_lon, max_lat, max_lon)] = radius_bboxes(60.0, 30.0, 10.0)
+        
+        self.assertAlmostEqual(max_lat - 60.0, 10.0 / 111.32)
+        self.assertGreater(max_lon - 30.0, max_lat - 60.0)
+
+    def test_radius_bbox_splits_at_antimeridian(self):
+        d_lon = 50.0 / 111.32
+        east, west = radius_bboxes(0.0, 179.9, 50.0)
+        
+        self.assertEqual(east[1:4:2], (179.9 - d_lon, 180.0))
+        self.assertEqual(west[1], -180.0)
+        self.assertAlmostEqual(west[3], 179.9 + d_lon - 360.0)
+        self.assertEqual(len(radius_bboxes(0.0, -179.9, 50.0)), 2)
+
+    def test_radius_bbox_over_pole_spans_all_longitudes(self):
+        [(min_lat, min_lon, max_lat, max_lon)] = radius_bboxes(89.9, 10.0, 50.0)
+        
+        self.assertEqual((min_lon, max_lat, max_lon), (-180.0, 90.0, 180.0))
+
+    def test_points_in_polygon(self):
+        square = [(0.0, 0.0), (0.0, 2.0), (2.0, 2.0), (2.0, 0.0)]
+        lat = np.array([1.0, 3.0, 1.0, -0.5])
+        lon = np.array([1.0, 1.0, 2.5, 1.0])
+        
+        self.assertEqual(points_in_polygon(lat, lon, square).tolist(), [True, False, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from collections import namedtuple
+from app.api.http_endpoints import _replace_endpoints
+
+Point = namedtuple("Point", "latitude longitude timestamp")
+
+
+class TestReplaceEndpoints(unittest.TestCase):
+    # Средние по интервалам в 100 с: время усреднено и не совпадает с крайними точками
+    BUCKETS = [Point(1.5, 1.5, 50), Point(2.5, 2.5, 150), Point(3.5, 3.5, 250)]
+    FIRST, LAST = Point(1.0, 1.0, 10), Point(4.0, 4.0, 290)
+
+    def test_outer_buckets_are_replaced(self):
+        records = _replace_endpoints(self.BUCKETS, self.FIRST, self.LAST, "asc")
+
+        self.assertEqual(records, [self.FIRST, self.BUCKETS[1], self.LAST])
+
+    def test_descending_order(self):
+        records = _replace_endpoints(self.BUCKETS[::-1], self.FIRST, self.LAST, "desc")
+
+        self.assertEqual(records, [self.LAST, self.BUCKETS[1], self.FIRST])
+
+    def test_single_bucket(self):
+        records = _replace_endpoints(self.BUCKETS[:1], self.FIRST, Point(1.2, 1.2, 90), "asc")
+
+        self.assertEqual(records, [self.FIRST, Point(1.2, 1.2, 90)])
+
+    def test_single_point(self):
+        self.assertEqual(_replace_endpoints(self.BUCKETS[:1], self.FIRST, self.FIRST, "asc"), [self.FIRST])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from app.core.ingest import IngestBuffer
+
+
+class _Recorder:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, rows):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("db is down")
+        self.batches.append(list(rows))
+        return len(rows)
+
+
+class TestIngestBuffer(unittest.IsolatedAsyncioTestCase):
+    async def test_writes_directly_when_not_started(self):
+        recorder = _Recorder()
+        buffer = IngestBuffer(recorder, max_rows=10, flush_interval=10)
+        
+        await buffer.submit([{"n": 1}])
+        
+        self.assertEqual(recorder.batches, [[{"n": 1}]])
+
+    async def test_coalesces_concurrent_submits(self):
+        recorder = _Recorder()
+        buffer = IngestBuffer(recorder, max_rows=1000, flush_interval=0.01)
+        buffer.start()
+        
+        await asyncio.gather(*(buffer.submit([{"n": n}]) for n in range(50)))
+        await buffer.stop()
+        
+        self.assertEqual(len(recorder.batches), 1)
+        self.assertEqual(len(recorder.batches[0]), 50)
+
+    async def test_flushes_on_size_threshold(self):
+        recorder = _Recorder()
+        buffer = IngestBuffer(recorder, max_rows=4, flush_interval=60)
+        buffer.start()
+        
+        await asyncio.wait_for(buffer.submit([{"n": n} for n in range(4)]), timeout=1)
+        await buffer.stop()
+        
+        self.assertEqual(recorder.batches, [[{"n": n} for n in range(4)]])
+
+    async def test_stop_drains_pending_rows(self):
+        recorder = _Recorder()
+        buffer = IngestBuffer(recorder, max_rows=1000, flush_interval=60)
+        buffer.start()
+        
+        waiter = asyncio.ensure_future(buffer.submit([{"n": 1}]))
+        await asyncio.sleep(0)
+        await buffer.stop()
+        await waiter
+        
+        self.assertEqual(recorder.batches, [[{"n": 1}]])
+
+    async def test_callers_receive_batch_result(self):
+        recorder = _Recorder()
+        buffer = IngestBuffer(recorder, max_rows=1000, flush_interval=0.01)
+        buffer.start()
+        
+        results = await asyncio.gather(buffer.submit([{"n": 1}]), buffer.submit([{"n": 2}, {"n": 3}]))
+        await buffer.stop()
+        
+        self.assertEqual(results, [3, 3])
+
+    async def test_write_error_reaches_every_caller(self):
+        buffer = IngestBuffer(_Recorder(fail=True), max_rows=1000, flush_interval=0.01)
+        buffer.start()
+        
+        results = await asyncio.gather(buffer.submit([{"n": 1}]), buffer.submit([{"n": 2}]),
+                                       return_exceptions=True)
+        await buffer.stop()
+        
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    async def test_same_key_belongs_to_first_submitter(self):
+        written = []
+
+        async def write(rows):
+            await asyncio.sleep(0)
+            written.append([r["n"] for r in rows])
+            return {r["n"] for r in rows}
+
+        buffer = IngestBuffer(write, max_rows=1000, flush_interval=0.01, key=lambda row: row["n"])
+        buffer.start()
+        
+        first, retry = await asyncio.gather(
+            buffer.submit([{"n": 1}, {"n": 2}]), buffer.submit([{"n": 2}, {"n": 3}])
+        )
+        await buffer.stop()
+        
+        self.assertEqual(written, [[1, 2, 3]])
+        self.assertEqual((first, retry), ({1, 2}, {3}))
+
+
+if __name__ == '__main__':
+    unittest.main()
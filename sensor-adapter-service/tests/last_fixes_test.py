@@ -0,0 +1,50 @@
+import json
+import unittest
+from app.core.last_fixes import LastFixes
+
+
+def _row(device_id, timestamp, latitude=55.0, longitude=37.0, light=0.5):
+    return {
+        "device_id": device_id, "timestamp": timestamp,
+        "latitude": latitude, "longitude": longitude, "light": light, "temperature": 20.0,
+    }
+
+
+class TestLastFixes(unittest.TestCase):
+    def setUp(self):
+        self.fixes = LastFixes()
+
+    def test_newer_keeps_latest_row_per_device(self):
+        rows = [_row("aa", 200), _row("aa", 300, latitude=56.0), _row("aa", 100), _row("bb", 50)]
+
+        newer = {r["device_id"]: r for r in self.fixes.newer(rows)}
+
+        self.assertEqual(
+            newer["aa"], {"device_id": "aa", "timestamp": 300, "latitude": 56.0, "longitude": 37.0, "light": 0.5}
+        )
+        self.assertEqual(newer["bb"]["timestamp"], 50)
+
+    def test_older_points_are_filtered_before_the_database(self):
+        self.fixes.update([_row("aa", 300)])
+
+        self.assertEqual(self.fixes.newer([_row("aa", 100), _row("aa", 300)]), [])
+        self.assertEqual([r["timestamp"] for r in self.fixes.newer([_row("aa", 301)])], [301])
+
+    def test_update_never_goes_back_in_time(self):
+        self.fixes.update([_row("aa", 300, latitude=56.0)])
+        self.fixes.update([_row("aa", 200, latitude=54.0)])
+
+        [fix] = self.fixes.get(["aa"])
+        self.assertEqual(fix.timestamp, 300)
+        self.assertEqual(json.loads(fix.payload)["latitude"], 56.0)
+
+    def test_get_all_or_selected_devices(self):
+        self.fixes.update([_row("aa", 1), _row("bb", 2), _row("cc", 3)])
+
+        self.assertEqual(len(self.fixes.get()), 3)
+        self.assertEqual([f.device_id for f in self.fixes.get(["cc", "zz", "aa", "cc"])], ["cc", "aa"])
+        self.assertEqual(len(self.fixes), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+from app.core import live
+from prometheus_client import REGISTRY
+from app.core.live import LiveHub, make_fix
+from tests.db import SchemaTestCase
+
+
+class TestLiveHub(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.hub = LiveHub(maxsize=2)
+
+    async def test_pending_fix_is_replaced_by_newer_one(self):
+        subscription = self.hub.subscribe(frozenset({"aa"}))
+
+        self.hub.publish(make_fix("aa", 100, 55.0, 37.0, 0.5))
+        self.hub.publish(make_fix("aa", 300, 55.2, 37.2, 0.5))
+        self.hub.publish(make_fix("aa", 200, 55.1, 37.1, 0.5))
+
+        fixes = await subscription.get()
+        self.assertEqual([f.timestamp for f in fixes], [300])
+        payload = json.loads(fixes[0].payload)
+        self.assertEqual(payload["device_id"], "aa")
+        self.assertEqual(payload["timestamp"], "1970-01-01T00:05:00Z")
+
+    async def test_full_queue_evicts_oldest_device(self):
+        subscription = self.hub.subscribe()
+        dropped = REGISTRY.get_sample_value("adapter_live_dropped_total")
+
+        for device_id in ("aa", "bb", "cc"):
+            self.hub.publish(make_fix(device_id, 100, 55.0, 37.0, None))
+
+        fixes = await subscription.get()
+        self.assertEqual([f.device_id for f in fixes], ["bb", "cc"])
+        self.assertEqual(REGISTRY.get_sample_value("adapter_live_dropped_total"), dropped + 1)
+
+    async def test_device_and_bbox_filters(self):
+        by_device = self.hub.subscribe(frozenset({"aa"}), (50.0, 30.0, 60.0, 40.0))
+        by_area = self.hub.subscribe(bbox=(50.0, 30.0, 60.0, 40.0))
+
+        self.hub.publish(make_fix("aa", 100, 70.0, 37.0, None))
+        self.hub.publish(make_fix("bb", 100, 55.0, 37.0, None))
+        self.hub.publish(make_fix("cc", 100, 55.0, 50.0, None))
+
+        self.assertEqual([f.device_id for f in await by_area.get()], ["bb"])
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(by_device.get(), 0.05)
+
+    async def test_get_waits_for_publish(self):
+        subscription = self.hub.subscribe()
+        waiter = asyncio.ensure_future(subscription.get())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        self.hub.publish(make_fix("aa", 100, 55.0, 37.0, None))
+
+        self.assertEqual(len(await waiter), 1)
+
+    def test_has_subscribers_and_unsubscribe(self):
+        self.assertFalse(self.hub.has_subscribers("aa"))
+
+        by_device = self.hub.subscribe(frozenset({"aa"}))
+        self.assertTrue(self.hub.has_subscribers("aa"))
+        self.assertFalse(self.hub.has_subscribers("bb"))
+
+        by_area = self.hub.subscribe(bbox=(50.0, 30.0, 60.0, 40.0))
+        self.assertTrue(self.hub.has_subscribers("bb"))
+
+        self.hub.unsubscribe(by_device)
+        self.hub.unsubscribe(by_area)
+        self.assertFalse(self.hub.has_subscribers("aa"))
+        self.assertFalse(self.hub.has_subscribers("bb"))
+
+
+class TestLiveFanout(SchemaTestCase):
+    FIX = {"device_id": "aa", "timestamp": 100, "latitude": 55.0, "longitude": 37.0, "light": 0.5}
+
+    async def test_notified_fix_reaches_listening_worker_after_commit(self):
+        hub = LiveHub(maxsize=10, fanout=True)
+        subscription = hub.subscribe(frozenset({"aa"}))
+        stop = asyncio.Event()
+
+        with patch.object(live, "live_hub", hub):
+            listener = asyncio.ensure_future(live.run_live_listener(self.engine, stop))
+            # Слушатель подписывается на канал в своём соединении
+            await asyncio.sleep(0.2)
+            try:
+                async with self.engine.begin() as conn:
+                    await live.notify_fixes(conn, [self.FIX])
+                    with self.assertRaises(asyncio.TimeoutError):
+                        await asyncio.wait_for(subscription.get(), 0.1)
+
+                fixes = await asyncio.wait_for(subscription.get(), 1)
+            finally:
+                stop.set()
+                await listener
+
+        self.assertEqual(fixes[0].payload, make_fix("aa", 100, 55.0, 37.0, 0.5).payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+"""
+Нагрузочный прогон приёма пакетов: парк устройств шлёт пакеты 0x02 через
+HTTP и/или TCP, в конце печатаются пакеты/с, строки/с и перцентили задержки.
+
+    python -m tests.load --http http://127.0.0.1:8002 --tcp 127.0.0.1:9999 \\
+        --devices 200 --records 10 --period 1 --duration 30
+
+Каждое устройство - отдельная корутина со своим TCP-соединением (или общим
+HTTP-клиентом), пакеты уходят раз в --period секунд со случайным разбросом
+(--period 0 - без пауз, на пропускную способность). Устройства делятся между
+транспортами поровну, если заданы оба.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+from tests.message_generator import MessageGenerator
+
+RECORD_SIZE = 40
+
+
+@dataclass
+class Device:
+    """Устройство со случайным блужданием координат и монотонным временем."""
+    device_id: bytes
+    timestamp: int
+    latitude: float
+    longitude: float
+    step_s: float
+    rng: random.Random
+
+    def packet(self, records: int) -> bytes:
+        generator = MessageGenerator().with_header(self.device_id, RECORD_SIZE * records)
+        for _ in range(records):
+            # Разброс интервала ±50%, но время строго растёт - иначе записи будут дублями
+            self.timestamp += max(1, round(self.step_s * self.rng.uniform(0.5, 1.5)))
+            self.latitude = min(max(self.latitude + self.rng.gauss(0, 0.001), -89.0), 89.0)
+            self.longitude = (self.longitude + self.rng.gauss(0, 0.001) + 180.0) % 360.0 - 180.0
+            generator.with_message_0x02(
+                self.timestamp, self.latitude, self.longitude,
+                [self.rng.randint(-2000, 2000) for _ in range(3)],
+                [self.rng.randint(-500, 500) for _ in range(3)],
+                [self.rng.randint(-300, 300) for _ in range(3)],
+                self.rng.random(), self.rng.uniform(-10.0, 35.0),
+            )
+        return generator.get_buffer()
+
+
+def make_fleet(count: int, step_s: float, seed: int) -> List[Device]:
+    rng = random.Random(seed)
+    start = int(time.time()) - 86400
+    return [
+        Device(
+            device_id=rng.randbytes(12),
+            timestamp=start + rng.randint(0, 3600),
+            latitude=rng.uniform(40.0, 65.0),
+            longitude=rng.uniform(20.0, 60.0),
+            step_s=step_s,
+            rng=random.Random(rng.random()),
+        )
+        for _ in range(count)
+    ]
+
+
+@dataclass
+class Stats:
+    packets: int = 0
+    rows: int = 0
+    errors: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def record(self, started: float, rows: int, ok: bool) -> None:
+        self.latencies.append(time.perf_counter() - started)
+        if ok:
+            self.packets += 1
+            self.rows += rows
+        else:
+            self.errors += 1
+
+
+class HttpSender:
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+
+    async def send(self, packet: bytes) -> bool:
+        resp = await self._client.post(
+            "/api/v1/sensors/binary", content=packet, headers={"Content-Type": "application/octet-stream"}
+        )
+        return resp.is_success
+
+    async def close(self) -> None:
+        pass
+
+
+class TcpSender:
+    """Постоянное соединение: пакет за пакетом, ответ "OK n" или "ERR ..." строкой."""
+
+    def __init__(self, host: str, port: int):
+        self._host = host
+        self._port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def send(self, packet: bytes) -> bool:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+        try:
+            self._writer.write(packet)
+            await self._writer.drain()
+            reply = await self._reader.readline()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            return False
+        if not reply:
+            await self.close()
+            return False
+        return reply.startswith(b"OK")
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def run_device(device: Device, sender, stats: Stats, records: int, period: float, deadline: float, packets: int):
+    # Устройства просыпаются вразнобой, а не все разом
+    if period > 0:
+        await asyncio.sleep(random.uniform(0, period))
+
+    sent = 0
+    while time.monotonic() < deadline and (packets <= 0 or sent < packets):
+        packet = device.packet(records)
+        started = time.perf_counter()
+        try:
+            ok = await sender.send(packet)
+        except (httpx.HTTPError, OSError):
+            ok = False
+        stats.record(started, records, ok)
+        sent += 1
+        if period > 0:
+            await asyncio.sleep(random.expovariate(1.0 / period))
+
+    await sender.close()
+
+
+def report(stats: Dict[str, Stats], elapsed: float) -> str:
+    lines = [f"{'transport':<10}{'packets':>10}{'errors':>8}{'rows':>10}{'packets/s':>12}{'rows/s':>12}"
+             f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, s in stats.items():
+        if s.latencies:
+            p50, p95, p99 = np.percentile(np.asarray(s.latencies) * 1000, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = math.nan
+        lines.append(
+            f"{name:<10}{s.packets:>10}{s.errors:>8}{s.rows:>10}{s.packets / elapsed:>12.1f}{s.rows / elapsed:>12.1f}"
+            f"{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+async def run(args) -> Dict[str, Stats]:
+    transports = [name for name, target in (("http", args.http), ("tcp", args.tcp)) if target]
+    if not transports:
+        raise SystemExit("Нужно указать --http и/или --tcp")
+
+    fleet = make_fleet(args.devices, args.step, args.seed)
+    stats = {name: Stats() for name in transports}
+    client = None
+    if args.http:
+        client = httpx.AsyncClient(
+            base_url=args.http,
+            limits=httpx.Limits(max_connections=args.http_connections),
+            timeout=args.timeout,
+        )
+    if args.tcp:
+        tcp_host, tcp_port = args.tcp.rsplit(":", 1)
+
+    deadline = time.monotonic() + args.duration
+    tasks = []
+    for i, device in enumerate(fleet):
+        name = transports[i % len(transports)]
+        sender = HttpSender(client) if name == "http" else TcpSender(tcp_host, int(tcp_port))
+        tasks.append(run_device(device, sender, stats[name], args.records, args.period, deadline, args.packets))
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if client is not None:
+            await client.aclose()
+    elapsed = time.monotonic() - started
+
+    print(f"{args.devices} devices, {args.records} records per packet, {elapsed:.1f} s")
+    print(report(stats, elapsed))
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--http", default=os.getenv("LOAD_HTTP_URL"), help="адрес HTTP API адаптера")
+    parser.add_argument("--tcp", default=os.getenv("LOAD_TCP_ADDR"), help="host:port TCP-сервера")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--records", type=int, default=10, help="записей 0x02 в пакете")
+    parser.add_argument("--period", type=float, default=1.0, help="средний интервал между пакетами устройства, с")
+    parser.add_argument("--step", type=float, default=5.0, help="средний шаг времени между записями, с")
+    parser.add_argument("--duration", type=float, default=30.0, help="длительность прогона, с")
+    parser.add_argument("--packets", type=int, default=0, help="пакетов на устройство, 0 - без ограничения")
+    parser.add_argument("--http-connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
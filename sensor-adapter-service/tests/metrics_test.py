@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+from prometheus_client import CollectorRegistry, Counter
+from app.api.metrics_endpoints import _SAMPLED
+from app.core.logs import LogSampler
+from app.core.metrics import MULTIPROC_DIR_ENV, render
+
+# Воркер: считает пакеты в общий каталог метрик и завершается
+_WORKER = """
+from prometheus_client import Counter
+Counter("worker_packets_total", "Packets", ["result"]).labels("ok").inc({})
+"""
+
+
+class TestMetrics(unittest.TestCase):
+    def test_sampled_values_are_read_on_render(self):
+        text = render(_SAMPLED).decode()
+
+        self.assertIn("# TYPE adapter_ingest_buffer_rows gauge", text)
+        self.assertIn('adapter_db_pool_connections{state="checked_out"}', text)
+        self.assertIn('adapter_response_cache_requests_total{result="hit"}', text)
+        self.assertIn("adapter_packets_total", text)
+
+    def test_workers_are_summed_in_multiprocess_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, MULTIPROC_DIR_ENV: directory}
+            for amount in (2, 3):
+                subprocess.run([sys.executable, "-c", _WORKER.format(amount)], env=env, check=True)
+
+            local = CollectorRegistry()
+            Counter("local_total", "Local", registry=local).inc()
+            with patch.dict(os.environ, {MULTIPROC_DIR_ENV: directory}):
+                text = render(local).decode()
+
+        self.assertIn('worker_packets_total{result="ok"} 5.0', text)
+        self.assertIn("local_total 1.0", text)
+
+
+class TestLogSampler(unittest.TestCase):
+    def test_every_nth_event(self):
+        sampled = LogSampler(3)
+
+        self.assertEqual([sampled() for _ in range(7)], [True, False, False, True, False, False, True])
+
+    def test_disabled_and_always(self):
+        never, always = LogSampler(0), LogSampler(1)
+
+        self.assertFalse(any(never() for _ in range(5)))
+        self.assertTrue(all(always() for _ in range(5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from fastapi import HTTPException
+from sqlalchemy import text
+from app.api.http_endpoints import get_coordinates_page
+from app.core.models import SensorMessage
+from app.core.pagination import decode_cursor, encode_cursor
+from tests.db import SchemaTestCase
+
+
+class TestCursor(unittest.TestCase):
+    def test_round_trip(self):
+        cursor = encode_cursor(1_700_000_000, 42, "a:asc")
+
+        self.assertEqual(decode_cursor(cursor, "a:asc"), (1_700_000_000, 42))
+
+    def test_malformed_cursor_is_rejected(self):
+        cursor = encode_cursor(1, 2, "a:asc")
+
+        for bad in ("", "not a cursor!", cursor[:-3], cursor + "AAAA"):
+            with self.assertRaises(ValueError):
+                decode_cursor(bad, "a:asc")
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = encode_cursor(1, 2, "a:asc")
+        tampered = ("B" if cursor[0] == "A" else "A") + cursor[1:]
+
+        with self.assertRaises(ValueError):
+            decode_cursor(tampered, "a:asc")
+
+    def test_cursor_of_another_query_is_rejected(self):
+        cursor = encode_cursor(1, 2, "a:asc")
+
+        for scope in ("b:asc", "a:desc"):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, scope)
+
+
+async def _page(db, cursor=None, order="asc", page_size=2):
+    return await get_coordinates_page(
+        internal_id="d", date_from=None, date_to=None, cursor=cursor,
+        page_size=page_size, order=order, db=db,
+    )
+
+
+class TestCoordinatesPage(SchemaTestCase):
+    # Время повторяется, в том числе на границах страниц по 2 записи
+    TIMESTAMPS = [100, 100, 100, 200, 200, 300, 300, 300, 400]
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        # Без уникального ключа (device_id, timestamp), чтобы время могло совпадать
+        async with self.engine.begin() as conn:
+            await conn.execute(text(
+                f"CREATE TABLE {SensorMessage.__tablename__} (id bigserial PRIMARY KEY, "
+                f"device_id varchar(24), timestamp bigint, latitude float, longitude float, light real)"
+            ))
+            await conn.execute(
+                text(
+                    f"INSERT INTO {SensorMessage.__tablename__} (device_id, timestamp, latitude, longitude) "
+                    f"VALUES ('d', :ts, :n, 0)"
+                ),
+                [{"ts": ts, "n": n} for n, ts in enumerate(self.TIMESTAMPS)],
+            )
+
+    async def _collect(self, order: str):
+        seen, cursor = [], None
+        async with self.session() as db:
+            while True:
+                page = await _page(db, cursor, order)
+                seen.extend(int(item.latitude) for item in page.items)
+                if page.next_cursor is None:
+                    return seen
+                cursor = page.next_cursor
+
+    async def test_ties_across_pages_are_neither_skipped_nor_repeated(self):
+        self.assertEqual(await self._collect("asc"), list(range(len(self.TIMESTAMPS))))
+        self.assertEqual(await self._collect("desc"), list(range(len(self.TIMESTAMPS)))[::-1])
+
+    async def test_bad_cursor_is_400(self):
+        async with self.session() as db:
+            cursor = (await _page(db)).next_cursor
+            for bad in ("garbage", cursor[:-1] + ("A" if cursor[-1] != "A" else "B")):
+                with self.assertRaises(HTTPException) as ctx:
+                    await _page(db, bad)
+                self.assertEqual(ctx.exception.status_code, 400)
+
+            # Курсор возрастающей выдачи не подходит к убывающей
+            with self.assertRaises(HTTPException):
+                await _page(db, cursor, order="desc")
+
+
+if __name__ == "__main__":
+    unittest.main()
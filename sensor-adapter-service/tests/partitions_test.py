@@ -0,0 +1,114 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from sqlalchemy import text
+from app.core import migrations
+from app.core.database import Base
+from app.core.models import SensorMessage
+from app.core.partitions import DEFAULT, TABLE, ensure_partitions, month_ranges
+from tests.db import SchemaTestCase
+
+
+def _ts(year: int, month: int, day: int = 1) -> int:
+    return int(datetime(year, month, day, tzinfo=timezone.utc).timestamp())
+
+
+class TestMonthRanges(unittest.TestCase):
+    def test_ranges_cover_interval_across_new_year(self):
+        ranges = list(month_ranges(_ts(2024, 11, 15), _ts(2025, 1, 10)))
+
+        self.assertEqual([r[0] for r in ranges], ["202411", "202412", "202501"])
+        self.assertEqual(ranges[0][1], _ts(2024, 11))
+        self.assertEqual(ranges[-1][2], _ts(2025, 2))
+        for (_, _, end), (_, start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+
+    def test_month_start_is_inclusive(self):
+        self.assertEqual([r[0] for r in month_ranges(_ts(2024, 3), _ts(2024, 3))], ["202403"])
+
+
+_SENSORS = {
+    f"{sensor}_{axis}": 0 for sensor in ("acc", "gyr", "mag") for axis in "xyz"
+}
+
+
+def _row(timestamp: int, **extra) -> dict:
+    return {
+        "device_id": "d", "timestamp": timestamp, "latitude": 55.0, "longitude": 37.0,
+        "light": 0.5, "temperature": 20.0, **_SENSORS, **extra,
+    }
+
+
+class TestDefaultPartition(SchemaTestCase):
+    async def test_new_partition_takes_rows_from_default(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[SensorMessage.__table__])
+            await ensure_partitions(conn, _ts(2030, 1), _ts(2030, 1))
+            # Часы устройства ушли вперёд: записи попадают в секцию по умолчанию
+            await conn.execute(SensorMessage.__table__.insert(), [
+                _row(_ts(2030, 3, 5)), _row(_ts(2030, 3, 20)), _row(_ts(2031, 7, 1)),
+            ])
+
+        async with self.engine.begin() as conn:
+            await ensure_partitions(conn, _ts(2030, 1), _ts(2030, 4))
+
+        self.assertEqual(await self.count(f"{TABLE}_p203003"), 2)
+        self.assertEqual(await self.count(DEFAULT), 1)
+        self.assertEqual(await self.count(TABLE), 3)
+
+        # Секция по умолчанию снова присоединена
+        async with self.engine.begin() as conn:
+            await conn.execute(SensorMessage.__table__.insert(), [_row(_ts(2032, 1, 1))])
+        self.assertEqual(await self.count(DEFAULT), 2)
+
+
+_LEGACY_DDL = (
+    f"CREATE TABLE {TABLE} (id bigserial PRIMARY KEY, device_id varchar(24), "
+    f"timestamp bigint, latitude float, longitude float, data jsonb)"
+)
+_LEGACY_DATA = (
+    '{"accelerometer": {"x": 1, "y": 2, "z": 3}, "gyroscope": {"x": 1, "y": 2, "z": 3}, '
+    '"magnetometer": {"x": 1, "y": 2, "z": 3}, "light": 0.5, "temperature": 20.0}'
+)
+
+
+class TestLegacyMigration(SchemaTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        async with self.engine.begin() as conn:
+            await conn.execute(text(_LEGACY_DDL))
+            await conn.execute(
+                text(
+                    f"INSERT INTO {TABLE} (device_id, timestamp, latitude, longitude, data) "
+                    f"VALUES ('d', :ts, 55.0, 37.0, CAST(:data AS jsonb))"
+                ),
+                [{"ts": _ts(2024, 5, 1) + i * 60, "data": _LEGACY_DATA} for i in range(5)],
+            )
+        self._patch = patch.object(migrations, "engine", self.engine)
+        self._patch.start()
+
+    async def asyncTearDown(self):
+        self._patch.stop()
+        await super().asyncTearDown()
+
+    async def test_resume_after_service_writes(self):
+        await migrations.migrate(batch_size=2, drop_legacy=False)
+        self.assertEqual(await self.count(TABLE), 5)
+
+        # Сервис пишет во время переноса, а два последних id как будто не успели
+        # перенестись до обрыва
+        async with self.engine.begin() as conn:
+            service_id = (await conn.execute(
+                SensorMessage.__table__.insert().returning(SensorMessage.id), _row(_ts(2024, 6, 1)),
+            )).scalar()
+            await conn.execute(text(f"DELETE FROM {TABLE} WHERE id IN (4, 5)"))
+
+        await migrations.migrate(batch_size=2, drop_legacy=True)
+
+        self.assertGreater(service_id, 5)
+        self.assertEqual(await self.count(TABLE), 6)
+        self.assertEqual(await self.count(TABLE, "id IN (4, 5)"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
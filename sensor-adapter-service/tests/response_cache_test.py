@@ -0,0 +1,92 @@
+import unittest
+from app.core.response_cache import (
+    CachedResponse, MemoryBackend, ResponseCache, etag_matches, load_backend, make_etag,
+)
+
+
+def _response(body: bytes) -> CachedResponse:
+    return CachedResponse(body, "application/json", make_etag(body))
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(MemoryBackend(maxsize=10, ttl=60))
+
+    def test_key_ignores_parameter_order(self):
+        a = ResponseCache.make_key("data", internal_id="a", range=(0, 10), limit=None)
+        b = ResponseCache.make_key("data", limit=None, range=(0, 10), internal_id="a")
+        c = ResponseCache.make_key("data", internal_id="a", range=(0, 11), limit=None)
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_new_data_inside_window_invalidates(self):
+        self.cache.set("k1", _response(b"1"), "a", (100, 200))
+        self.cache.set("k2", _response(b"2"), "a", (300, 400))
+        self.cache.set("k3", _response(b"3"), "b", (100, 200))
+
+        removed = self.cache.invalidate([("a", 150), ("a", 250), ("c", 150)])
+
+        self.assertEqual(removed, 1)
+        self.assertIsNone(self.cache.get("k1"))
+        self.assertIsNotNone(self.cache.get("k2"))
+        self.assertIsNotNone(self.cache.get("k3"))
+
+    def test_window_bounds_are_inclusive(self):
+        self.cache.set("k1", _response(b"1"), "a", (100, 200))
+        self.cache.set("k2", _response(b"2"), "a", (201, 300))
+
+        self.cache.invalidate([("a", 200)])
+
+        self.assertIsNone(self.cache.get("k1"))
+        self.assertIsNotNone(self.cache.get("k2"))
+
+    def test_lru_eviction_drops_windows(self):
+        backend = MemoryBackend(maxsize=2, ttl=60)
+        cache = ResponseCache(backend)
+        for i in range(10):
+            cache.set(f"k{i}", _response(b"x"), "a" if i % 2 else "b", (i, i))
+
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(sum(len(w) for w in backend._windows.values()), 2)
+        self.assertIsNotNone(cache.get("k9"))
+
+    def test_index_is_kept_by_shared_backend(self):
+        # Два воркера с общим хранилищем: запись, принятая вторым, сбрасывает ответ первого
+        backend = MemoryBackend(maxsize=10, ttl=60)
+        first, second = ResponseCache(backend), ResponseCache(backend)
+        first.set("k", _response(b"1"), "a", (100, 200))
+
+        self.assertEqual(second.invalidate([("a", 150)]), 1)
+        self.assertIsNone(first.get("k"))
+
+    def test_disabled_cache_does_not_invalidate(self):
+        cache = ResponseCache(MemoryBackend(maxsize=10, ttl=60), enabled=False)
+
+        self.assertEqual(cache.invalidate([("a", 1)]), 0)
+
+    def test_expired_entries_are_misses(self):
+        cache = ResponseCache(MemoryBackend(maxsize=10, ttl=-1))
+        cache.set("k", _response(b"x"), "a", (0, 1))
+
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_etag_matching(self):
+        etag = make_etag(b"body")
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+    def test_load_backend(self):
+        self.assertIsInstance(load_backend("memory", 10, 60), MemoryBackend)
+        self.assertIsInstance(load_backend("app.core.response_cache:MemoryBackend", 10, 60), MemoryBackend)
+        with self.assertRaises(ValueError):
+            load_backend("redis", 10, 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+import unittest
+from tests.message_generator import MessageGenerator
+from app.adapters.sensor_adapter import SensorProtocolAdapter
+
+
+def _packet(records: int) -> bytes:
+    message_generator = MessageGenerator()
+    message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 40 * records)
+    for timestamp in range(records):
+        message_generator.with_message_0x02(timestamp, 12.2, 22.5, [12, -12, 12],
+                                            [34, 34, 43], [45, 64, 32],
+                                            1.0, 30.0)
+    return message_generator.get_buffer()
+
+
+class TestSensorAdapterDecode(unittest.IsolatedAsyncioTestCase):
+    async def _decode(self, mode: str, raw: bytes):
+        adapter = SensorProtocolAdapter(executor_mode=mode, offload_min_size=0, workers=2)
+        try:
+            return await adapter.decode(raw)
+        finally:
+            await adapter.shutdown()
+
+    async def test_executor_modes_agree(self):
+        raw = _packet(16)
+        
+        results = [await self._decode(mode, raw) for mode in ("inline", "thread", "process")]
+        
+        for result in results:
+            self.assertEqual(result["device_id"], results[0]["device_id"])
+            self.assertEqual(result["count"], 16)
+            for name, column in results[0]["columns"].items():
+                self.assertEqual(result["columns"][name].tolist(), column.tolist())
+
+    async def test_errors_propagate_from_pool(self):
+        raw = bytearray(_packet(2))
+        raw[-1] ^= 0xFF
+        
+        with self.assertRaises(ValueError):
+            await self._decode("process", bytes(raw))
+
+    async def test_shutdown_does_not_block_event_loop(self):
+        adapter = SensorProtocolAdapter(executor_mode="thread", offload_min_size=0, workers=1)
+        running = asyncio.get_running_loop().run_in_executor(adapter._get_executor(), time.sleep, 0.3)
+        
+        shutdown = asyncio.ensure_future(adapter.shutdown())
+        await asyncio.sleep(0.05)
+        
+        # Пока пул дожидается разбора, цикл событий продолжает работать
+        self.assertFalse(shutdown.done())
+        await shutdown
+        self.assertTrue(running.done())
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            SensorProtocolAdapter(executor_mode="gpu")
+
+
+if __name__ == '__main__':
+    unittest.main()
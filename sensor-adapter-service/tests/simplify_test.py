@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from app.core.simplify import project_m, simplify
+
+
+def _reference_rdp(x, y, tolerance):
+    """Классический рекурсивный алгоритм для сравнения."""
+    def rdp(start, end):
+        if end - start < 2:
+            return [start, end]
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        norm = np.hypot(dx, dy)
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        dist = np.abs(dy * px - dx * py) / norm if norm else np.hypot(px, py)
+        k = int(np.argmax(dist))
+        if dist[k] <= tolerance:
+            return [start, end]
+        mid = start + 1 + k
+        return rdp(start, mid)[:-1] + rdp(mid, end)
+    return rdp(0, len(x) - 1)
+
+
+class TestSimplify(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.lat = 55.0 + np.cumsum(rng.normal(0, 0.001, 2000))
+        self.lon = 37.0 + np.cumsum(rng.normal(0, 0.001, 2000))
+
+    def test_tolerance_matches_classic_rdp(self):
+        x, y = project_m(self.lat, self.lon)
+        
+        keep = simplify(self.lat, self.lon, tolerance_m=150.0)
+        
+        self.assertEqual(keep.tolist(), _reference_rdp(x, y, 150.0))
+
+    def test_max_points_keeps_endpoints(self):
+        keep = simplify(self.lat, self.lon, max_points=25)
+        
+        self.assertEqual(len(keep), 25)
+        self.assertEqual((keep[0], keep[-1]), (0, 1999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_straight_line_collapses_to_endpoints(self):
+        lat = np.linspace(55.0, 56.0, 100)
+        lon = np.full(100, 37.0)
+        
+        self.assertEqual(simplify(lat, lon, tolerance_m=1.0).tolist(), [0, 99])
+
+    def test_short_track_untouched(self):
+        self.assertEqual(simplify(np.array([1.0, 2.0]), np.array([1.0, 2.0]), max_points=2).tolist(), [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
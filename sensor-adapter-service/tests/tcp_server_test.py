@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from tests.message_generator import MessageGenerator
+from app.adapters.binary_protocol import BinaryProtocolParser
+from app.api import tcp_server
+
+
+class _ParsingAdapter:
+    def __init__(self):
+        self._parser = BinaryProtocolParser()
+        self.packets = []
+
+    async def process_packet(self, raw: bytearray):
+        self.packets.append(raw)
+        parsed = self._parser.parse_packet(raw)
+        return {"device_id": parsed["device_id"], "saved_messages": len(parsed["messages"])}
+
+
+def _packet(records: int) -> bytes:
+    message_generator = MessageGenerator()
+    message_generator.with_header(bytes("FFFFFFFFFFFF", "ascii"), 40 * records)
+    for timestamp in range(records):
+        message_generator.with_message_0x02(timestamp, 12.2, 22.5, [12, 12, 12],
+                                            [34, 34, 43], [45, 64, 32],
+                                            1.0, 30.0)
+    return message_generator.get_buffer()
+
+
+class TestTcpServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.adapter = _ParsingAdapter()
+        self._patch = patch.object(tcp_server, "adapter", self.adapter)
+        self._patch.start()
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(tcp_server.ClientConnection, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self._patch.stop()
+
+    async def test_multiple_packets_on_one_connection(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        
+        # Второй пакет приходит одним куском с первым, третий - побайтово
+        writer.write(_packet(1) + _packet(2))
+        for byte in _packet(3):
+            writer.write(bytes([byte]))
+        await writer.drain()
+        
+        replies = [await reader.readline() for _ in range(3)]
+        writer.close()
+        
+        self.assertEqual(replies, [b"OK 1\n", b"OK 2\n", b"OK 3\n"])
+        # Пакет читается целиком в свой буфер, без склейки заголовка и тела
+        self.assertEqual(self.adapter.packets, [bytearray(_packet(n)) for n in (1, 2, 3)])
+        self.assertTrue(all(type(p) is bytearray for p in self.adapter.packets))
+
+    async def test_packet_larger_than_read_stash(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        packet = _packet(300)
+        
+        # Тело крупнее запаса соединения читается прямо в буфер пакета
+        writer.write(packet[:100])
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        writer.write(packet[100:] + _packet(1))
+        await writer.drain()
+        
+        replies = [await reader.readline() for _ in range(2)]
+        writer.close()
+        
+        self.assertGreater(len(packet), tcp_server._STASH_SIZE)
+        self.assertEqual(replies, [b"OK 300\n", b"OK 1\n"])
+        self.assertEqual(self.adapter.packets[0], packet)
+
+    async def test_error_does_not_close_connection(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        
+        broken = bytearray(_packet(1))
+        broken[-1] ^= 0xFF
+        writer.write(bytes(broken) + _packet(1))
+        await writer.drain()
+        
+        first = await reader.readline()
+        second = await reader.readline()
+        writer.close()
+        
+        self.assertTrue(first.startswith(b"ERR"))
+        self.assertEqual(second, b"OK 1\n")
+
+    async def test_oversized_packet_is_rejected(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        
+        with patch.object(tcp_server.settings, "TCP_MAX_PACKET_SIZE", 40):
+            writer.write(_packet(2))
+            await writer.drain()
+            reply = await reader.readline()
+            tail = await reader.read()
+        writer.close()
+        
+        self.assertTrue(reply.startswith(b"ERR"))
+        self.assertEqual(tail, b"")
+
+    async def test_stalled_body_closes_connection(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        
+        with patch.object(tcp_server.settings, "TCP_IDLE_TIMEOUT", 0.2):
+            # Заголовок и половина тела, дальше клиент молчит
+            writer.write(_packet(2)[:40])
+            await writer.drain()
+            tail = await asyncio.wait_for(reader.read(), timeout=2)
+        writer.close()
+        
+        self.assertEqual(tail, b"")
+
+    async def test_half_closed_client_gets_reply(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        
+        writer.write(_packet(1))
+        writer.write_eof()
+        
+        self.assertEqual(await reader.read(), b"OK 1\n")
+        writer.close()
+
+    async def test_truncated_header_is_rejected(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        
+        writer.write(_packet(1)[:5])
+        writer.write_eof()
+        
+        self.assertTrue((await reader.read()).startswith(b"ERR"))
+        writer.close()
+
+    async def test_single_packet_mode_closes_after_reply(self):
+        with patch.object(tcp_server.settings, "TCP_PERSISTENT_CONNECTIONS", False):
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+            writer.write(_packet(1) + _packet(2))
+            await writer.drain()
+            tail = await asyncio.wait_for(reader.read(), timeout=2)
+        writer.close()
+        
+        self.assertEqual(tail, b"OK 1\n")
+
+
+if __name__ == '__main__':
+    unittest.main()